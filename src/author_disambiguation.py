@@ -0,0 +1,285 @@
+import argparse
+import os
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from construct_network import PUBLICATIONS_CSV, PUBLICATIONS_STORE, parse_json_field, store_is_current
+from openalex_ids import strip_openalex_ids
+
+AUTHOR_REMAP_CSV = "../data/csv/openalex/author_id_remap.csv"
+
+# Name particles dropped before comparing names ("Maria da Silva" ~ "Maria Silva")
+NAME_PARTICLES = {"da", "de", "do", "das", "dos", "e", "del", "van", "von"}
+
+# Blocks with more authors than this are too ambiguous to score and are skipped
+MAX_BLOCK_SIZE = 200
+
+# Shared co-authors counted towards a merge score at most
+MAX_COAUTHOR_POINTS = 2
+
+# Every candidate shares an institution (see build_blocks), so a merge also needs a
+# matching full first name or middle name, another shared institution or a shared co-author
+MERGE_THRESHOLD = 2
+
+
+def normalize_name(name: Optional[str]) -> List[str]:
+    """
+    Returns the lower-cased, accent-free tokens of an author name, without
+    punctuation and name particles.
+    """
+    if not isinstance(name, str):
+        return []
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char)).lower()
+    return [token for token in re.split(r"[^a-z0-9]+", name) if token and token not in NAME_PARTICLES]
+
+
+def given_names_compatible(tokens1: List[str], tokens2: List[str]) -> bool:
+    """
+    True when the given names (all tokens but the surname) of the shorter name
+    match, in order, given names of the longer one. A single letter matches
+    any name with that initial, so 'j carlos silva' ~ 'joao carlos silva'.
+    """
+    given1, given2 = tokens1[:-1], tokens2[:-1]
+    if len(given1) > len(given2):
+        given1, given2 = given2, given1
+    position = 0
+    for token in given1:
+        while position < len(given2):
+            other = given2[position]
+            position += 1
+            if token == other or (len(token) == 1 and other[0] == token) or (len(other) == 1 and token[0] == other):
+                break
+        else:
+            return False
+    return True
+
+
+class _AuthorProfile:
+    __slots__ = ("author_id", "tokens", "institutions", "works")
+
+    def __init__(self, author_id: str):
+        self.author_id = author_id
+        self.tokens: List[str] = []
+        self.institutions = set()
+        self.works: List[int] = []
+
+
+def collect_profiles(publications: Iterable[List[Dict]]) -> Tuple[List[_AuthorProfile], List[List[int]]]:
+    """
+    Builds one profile per author id (first non-empty name, institution ids
+    and the indices of their works) from author lists in the authorships
+    JSON layout, in first-seen order. Also returns the profile indices of
+    the authors of every work, to look up co-authors.
+    """
+    profiles: Dict[str, _AuthorProfile] = {}
+    indices: Dict[str, int] = {}
+    work_authors = []
+    for pub, authors in enumerate(publications):
+        members = []
+        for author in authors:
+            author_id = author.get("id")
+            if not author_id:
+                continue
+            profile = profiles.get(author_id)
+            if profile is None:
+                profile = profiles[author_id] = _AuthorProfile(author_id)
+                indices[author_id] = len(indices)
+            if not profile.tokens:
+                profile.tokens = normalize_name(author.get("name"))
+            profile.institutions.update(inst.get("id") for inst in author.get("institutions", []) if inst.get("id"))
+            profile.works.append(pub)
+            members.append(indices[author_id])
+        work_authors.append(members)
+    return list(profiles.values()), work_authors
+
+
+def build_blocks(profiles: List[_AuthorProfile]) -> Dict[Tuple[str, str, str], List[int]]:
+    """
+    Inverted index from (surname, first initial, institution id) to the
+    profiles carrying that key. Only authors in the same block are compared,
+    so the work is linear in the number of authorships plus the (small)
+    squared block sizes, instead of all pairs of authors.
+    """
+    blocks = defaultdict(list)
+    for index, profile in enumerate(profiles):
+        if len(profile.tokens) < 2:
+            continue
+        surname, initial = profile.tokens[-1], profile.tokens[0][0]
+        for institution in profile.institutions:
+            blocks[(surname, initial, institution)].append(index)
+    return blocks
+
+
+def score_pair(profile1: _AuthorProfile, profile2: _AuthorProfile, coauthors1: set, coauthors2: set) -> int:
+    """
+    Scores a candidate merge: one point per shared institution, one when the
+    full first names agree, one when the names share another full token
+    than the surname (a middle name or second surname) and one per shared
+    co-author (up to MAX_COAUTHOR_POINTS). Incompatible given names score 0.
+    """
+    if not given_names_compatible(profile1.tokens, profile2.tokens):
+        return 0
+    score = len(profile1.institutions & profile2.institutions)
+    first1, first2 = profile1.tokens[0], profile2.tokens[0]
+    if first1 == first2 and len(first1) > 1:
+        score += 1
+    full1 = {token for token in profile1.tokens[1:] if len(token) > 1}
+    full2 = {token for token in profile2.tokens[1:] if len(token) > 1}
+    if len(full1 & full2) >= 2:
+        score += 1
+    return score + min(len(coauthors1 & coauthors2), MAX_COAUTHOR_POINTS)
+
+
+def disambiguate(publications: Iterable[List[Dict]], threshold: int = MERGE_THRESHOLD) -> pd.DataFrame:
+    """
+    Finds author ids that belong to the same person and returns the id-remap
+    table (author_id, canonical_id), one row per id that is merged away.
+
+    Candidate pairs come from build_blocks and are merged best score first
+    with union-find. Two ids that appear on the same work are never merged
+    (co-authors are different people), also transitively. Each cluster is
+    represented by its id with the most works, the first seen on ties.
+    """
+    start = time.perf_counter()
+    profiles, work_authors = collect_profiles(publications)
+    blocks = build_blocks(profiles)
+
+    coauthor_sets = {}
+
+    def coauthors(index: int) -> set:
+        # Only built for authors that are candidates of some merge
+        found = coauthor_sets.get(index)
+        if found is None:
+            found = coauthor_sets[index] = {
+                other for pub in profiles[index].works for other in work_authors[pub] if other != index
+            }
+        return found
+
+    candidates = {}
+    skipped = 0
+    for members in blocks.values():
+        if len(members) > MAX_BLOCK_SIZE:
+            skipped += 1
+            continue
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                pair = (first, second) if first < second else (second, first)
+                if pair not in candidates:
+                    candidates[pair] = score_pair(
+                        profiles[first], profiles[second], coauthors(first), coauthors(second)
+                    )
+
+    parent = list(range(len(profiles)))
+    cluster_works = {}
+
+    def find(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    merges = sorted(
+        ((score, pair) for pair, score in candidates.items() if score >= threshold),
+        key=lambda item: (-item[0], item[1]),
+    )
+    for _, (first, second) in merges:
+        root1, root2 = find(first), find(second)
+        if root1 == root2:
+            continue
+        works1 = cluster_works.get(root1) or set(profiles[root1].works)
+        works2 = cluster_works.get(root2) or set(profiles[root2].works)
+        if not works1.isdisjoint(works2):
+            continue
+        root, other = min(root1, root2), max(root1, root2)
+        parent[other] = root
+        cluster_works[root] = works1 | works2
+        cluster_works.pop(other, None)
+
+    clusters = defaultdict(list)
+    for index in range(len(profiles)):
+        clusters[find(index)].append(index)
+    rows = []
+    for members in clusters.values():
+        if len(members) < 2:
+            continue
+        canonical = max(members, key=lambda index: (len(profiles[index].works), -index))
+        rows.extend(
+            (profiles[index].author_id, profiles[canonical].author_id) for index in members if index != canonical
+        )
+
+    remap = pd.DataFrame(rows, columns=["author_id", "canonical_id"])
+    print(
+        f"Disambiguated {len(profiles)} author ids in {time.perf_counter() - start:.1f}s: "
+        f"{len(blocks)} blocks ({skipped} too large), {len(candidates)} candidate pairs, "
+        f"{len(remap)} ids merged into {remap['canonical_id'].nunique()} authors"
+    )
+    return remap
+
+
+def iter_csv_authors(df: pd.DataFrame) -> Iterable[List[Dict]]:
+    """
+    Yields the decoded authorships of every row of a publications dataframe.
+    """
+    for authorships in df["authorships"]:
+        yield (parse_json_field(authorships) if isinstance(authorships, str) else None) or []
+
+
+def iter_store_authors(works: pd.DataFrame, authorships: pd.DataFrame) -> Iterable[List[Dict]]:
+    """
+    Yields the authors of every work of the Parquet publications store, in
+    the authorships JSON layout.
+    """
+    ordered = authorships.sort_values("position", kind="stable")
+    authors_by_work = defaultdict(list)
+    for work_id, author_id, name, institution_ids in zip(
+        ordered["work_id"], ordered["author_id"], ordered["author_name"], ordered["institution_ids"]
+    ):
+        authors_by_work[work_id].append({
+            "id": author_id,
+            "name": name,
+            "institutions": [{"id": institution} for institution in (institution_ids if institution_ids is not None else [])],
+        })
+    for work_id in works["id"]:
+        yield authors_by_work.get(work_id, [])
+
+
+def load_author_remap(path: str = AUTHOR_REMAP_CSV) -> Dict[str, str]:
+    """
+    Loads an id-remap table written by this module as {author_id: canonical_id}.
+    Ids given as full OpenAlex URLs are reduced to the short ids of the corpus.
+    """
+    remap = pd.read_csv(path, dtype=str)
+    return dict(zip(strip_openalex_ids(remap["author_id"]), strip_openalex_ids(remap["canonical_id"])))
+
+
+def main(csv_file: Optional[str], output_file: str = AUTHOR_REMAP_CSV):
+    """
+    Builds the id-remap table from the given CSV, or from the Parquet
+    publications store when it is current (falling back to the full corpus
+    CSV) by default.
+    """
+    if csv_file is None and store_is_current():
+        from publications_store import load_publications
+
+        works, authorships = load_publications(PUBLICATIONS_STORE)
+        publications = iter_store_authors(works, authorships)
+    else:
+        csv_file = csv_file or PUBLICATIONS_CSV
+        publications = iter_csv_authors(pd.read_csv(csv_file, usecols=["authorships"]))
+    remap = disambiguate(publications)
+    remap.to_csv(output_file, index=False)
+    print(f"Saved {len(remap)} id remaps to {output_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge duplicate OpenAlex author ids into an id-remap table.")
+    parser.add_argument("csv_file", nargs="?", help="publications CSV (default: the Parquet store, else br_publications.csv)")
+    parser.add_argument("--output", default=AUTHOR_REMAP_CSV, help="id-remap CSV to write")
+    args = parser.parse_args()
+    main(args.csv_file, args.output)
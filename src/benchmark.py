@@ -0,0 +1,402 @@
+import filecmp
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Iterator, List
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from collect_publications_open_alex import (
+    iter_processed_works,
+    process_work,
+    process_works,
+    write_works_csv,
+)
+from construct_network import (
+    SUBFIELDS,
+    YEARS,
+    build_collaboration_network,
+    build_network_from_publications,
+    filter_publications_by_year,
+    filter_subfielf_publications,
+    iter_csv_publications,
+    iter_subfield_year_arrays,
+)
+from edge_builder import NetworkArrays, explode_publications, network_arrays_to_graph
+from gexf_stream import read_gexf_stream, write_network_arrays_gexf
+import run_report
+from synthetic_corpus import SyntheticCorpus
+
+PAGE_SIZE = 200
+
+BR_PUBLICATIONS_CSV = "../data/csv/openalex/br_publications.csv"
+COLLABNET_GEXF = "../data/graphs/collabnet.gexf"
+
+# Stored results of the benchmark suite, compared against by later runs
+SUITE_BASELINE = "../data/benchmarks/baseline.json"
+
+SUITE_SCALES = "10000,100000,1000000,5000000"
+
+SUITE_STAGES = [
+    "process_work",
+    "csv_write",
+    "load_csv",
+    "build_collaboration_network",
+    "filter_subfield_year",
+    "partition_networks",
+    "gexf_export",
+]
+
+
+def synthetic_pages(num_works: int, seed: int = 0) -> Iterator[List[Dict]]:
+    """
+    Yields pages of synthetic works with the BR corpus distributions (see
+    synthetic_corpus), like iter_work_pages does for the API.
+    """
+    return SyntheticCorpus(num_works, seed).pages(PAGE_SIZE)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _write_materialized(num_works: int, output_file: str, queue) -> None:
+    start = time.perf_counter()
+    all_works = [work for page in synthetic_pages(num_works) for work in page]
+    processed_works = [process_work(work) for work in all_works]
+    pd.DataFrame(processed_works).to_csv(output_file, index=False)
+    queue.put((time.perf_counter() - start, _peak_rss_mb()))
+
+
+def _write_streaming(num_works: int, output_file: str, queue) -> None:
+    start = time.perf_counter()
+    write_works_csv(iter_processed_works(synthetic_pages(num_works)), output_file)
+    queue.put((time.perf_counter() - start, _peak_rss_mb()))
+
+
+def _run_isolated(target, *args):
+    """
+    Runs target in a fresh process so each measurement gets its own peak RSS.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=target, args=(*args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def bench_streaming_csv(num_works: int = 1_000_000) -> None:
+    """
+    Compares peak RSS of the materialized (list + DataFrame) CSV export
+    against the streaming writer, and checks both outputs are identical.
+    """
+    num_works = int(num_works)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        before_file = os.path.join(tmp_dir, "materialized.csv")
+        after_file = os.path.join(tmp_dir, "streaming.csv")
+        before_time, before_rss = _run_isolated(_write_materialized, num_works, before_file)
+        after_time, after_rss = _run_isolated(_write_streaming, num_works, after_file)
+        identical = filecmp.cmp(before_file, after_file, shallow=False)
+
+    print(f"Synthetic feed: {num_works} works")
+    print(f"  materialized: {before_time:.1f}s, peak RSS {before_rss:.0f} MB")
+    print(f"  streaming:    {after_time:.1f}s, peak RSS {after_rss:.0f} MB")
+    print(f"  identical output: {identical}")
+
+
+def load_corpus(csv_file: str = BR_PUBLICATIONS_CSV, num_works: int = 100_000) -> pd.DataFrame:
+    """
+    Loads the publications CSV, or a synthetic corpus of processed works when
+    the CSV is not available.
+    """
+    if os.path.exists(csv_file):
+        return pd.read_csv(csv_file)
+    print(f"{csv_file} not found, using {num_works} synthetic works")
+    return pd.DataFrame(iter_processed_works(synthetic_pages(num_works)))
+
+
+def _same_graph(G1, G2) -> bool:
+    return (
+        list(G1.nodes(data=True)) == list(G2.nodes(data=True))
+        and list(G1.edges(data=True)) == list(G2.edges(data=True))
+    )
+
+
+def bench_network_build(csv_file: str = BR_PUBLICATIONS_CSV) -> None:
+    """
+    Times the dict/combinations network builder against the vectorized
+    edge builder on the full corpus and checks the graphs are identical.
+    """
+    df = load_corpus(csv_file)
+
+    start = time.perf_counter()
+    reference = build_network_from_publications(iter_csv_publications(df))
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = build_collaboration_network(df)
+    vectorized_time = time.perf_counter() - start
+
+    print(f"Corpus: {len(df)} works, {reference.number_of_nodes()} authors, "
+          f"{reference.number_of_edges()} edges")
+    print(f"  combinations builder: {reference_time:.2f}s")
+    print(f"  vectorized builder:   {vectorized_time:.2f}s")
+    print(f"  identical graph: {_same_graph(reference, vectorized)}")
+
+
+def _traced(func, *args):
+    """
+    Calls func and returns (result, seconds, peak traced memory in MB).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 * 1024)
+
+
+def graph_to_arrays(G: nx.Graph) -> NetworkArrays:
+    """
+    Converts a collaboration graph into network arrays, keeping node and edge order.
+    """
+    node_ids = np.array(list(G.nodes), dtype=object)
+    index = {node: i for i, node in enumerate(node_ids)}
+    edges = list(G.edges(data="weight", default=1))
+    return NetworkArrays(
+        node_ids,
+        np.array([G.nodes[node].get("label1") for node in node_ids], dtype=object),
+        np.array([G.nodes[node].get("label2") for node in node_ids], dtype=object),
+        np.array([index[u] for u, _, _ in edges], dtype=np.int64),
+        np.array([index[v] for _, v, _ in edges], dtype=np.int64),
+        np.array([int(w) for _, _, w in edges], dtype=np.int64),
+    )
+
+
+def bench_gexf_io(gexf_file: str = COLLABNET_GEXF) -> None:
+    """
+    Compares write/read time and peak traced memory of nx.write_gexf and
+    nx.read_gexf against the streaming GEXF writer and iterparse reader.
+    """
+    G = nx.read_gexf(gexf_file)
+    arrays = graph_to_arrays(G)
+    G = network_arrays_to_graph(arrays)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nx_file = os.path.join(tmp_dir, "networkx.gexf")
+        stream_file = os.path.join(tmp_dir, "stream.gexf")
+        _, nx_write, nx_write_mem = _traced(nx.write_gexf, G, nx_file)
+        _, stream_write, stream_write_mem = _traced(write_network_arrays_gexf, arrays, stream_file)
+        nx_graph, nx_read, nx_read_mem = _traced(nx.read_gexf, nx_file)
+        stream_graph, stream_read, stream_read_mem = _traced(read_gexf_stream, stream_file)
+
+    print(f"{gexf_file}: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
+    print(f"  write  networkx: {nx_write:.2f}s, peak {nx_write_mem:.1f} MB")
+    print(f"  write  stream:   {stream_write:.2f}s, peak {stream_write_mem:.1f} MB")
+    print(f"  read   networkx: {nx_read:.2f}s, peak {nx_read_mem:.1f} MB")
+    print(f"  read   stream:   {stream_read:.2f}s, peak {stream_read_mem:.1f} MB")
+    print(f"  identical graph: {_same_graph(nx_graph, stream_graph)}")
+
+
+def _explode_unpooled(publications) -> pd.DataFrame:
+    """
+    The exploded-table builder before string pooling: one string object per
+    authorship, as produced by json.loads.
+    """
+    pubs, author_ids, countries, subfields = [], [], [], []
+    for pub, (authors, subfield_name) in enumerate(publications):
+        for author in authors:
+            if not author.get("id"):
+                continue
+            author_countries = author.get("countries", [])
+            pubs.append(pub)
+            author_ids.append(author["id"])
+            countries.append(author_countries[0] if author_countries else "Unknown")
+            subfields.append(subfield_name)
+    return pd.DataFrame({
+        "pub": np.array(pubs, dtype=np.int64),
+        "author_id": pd.Series(author_ids, dtype=object),
+        "country": pd.Series(countries, dtype=object),
+        "subfield": pd.Series(subfields, dtype=object),
+    })
+
+
+def _retained(func, *args):
+    """
+    Calls func and returns (result, seconds, traced memory still held by the
+    result in MB).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current / (1024 * 1024)
+
+
+def bench_compact_records(csv_file: str = BR_PUBLICATIONS_CSV, num_works: int = 200_000) -> None:
+    """
+    Compares the memory held by the exploded authorship table with and
+    without string pooling (CompactCorpus, see explode_publications) for
+    the corpus, or `num_works` synthetic works when it is not available.
+    """
+    df = load_corpus(csv_file, int(num_works))
+    unpooled, unpooled_time, unpooled_mem = _retained(_explode_unpooled, iter_csv_publications(df))
+    pooled, pooled_time, pooled_mem = _retained(explode_publications, iter_csv_publications(df))
+    print(f"Corpus: {len(df)} works, {len(pooled)} authorships")
+    print(f"  exploded table:        {unpooled_time:.1f}s, {unpooled_mem:.0f} MB")
+    print(f"  pooled exploded table: {pooled_time:.1f}s, {pooled_mem:.0f} MB")
+    print(f"  identical table: {unpooled.equals(pooled)}")
+
+
+def _suite_scale(num_works: int, seed: int, tmp_dir: str, queue) -> None:
+    """
+    Runs every pipeline stage of the suite on one synthetic corpus and puts
+    the run report (stage timings, counters, peak RSS) on the queue.
+    """
+    report = run_report.start_run(f"suite_{num_works}")
+    csv_file = os.path.join(tmp_dir, f"synthetic_{num_works}.csv")
+    write_works_csv(iter_processed_works(SyntheticCorpus(num_works, seed).pages(PAGE_SIZE)), csv_file)
+
+    with report.stage("load_csv"):
+        df = pd.read_csv(csv_file)
+    report.count("works", len(df))
+
+    with report.stage("build_collaboration_network"):
+        G = build_collaboration_network(df)
+    report.count("nodes", G.number_of_nodes())
+    report.count("edges", G.number_of_edges())
+    del G
+
+    # The per-partition filtering the networks were originally built from
+    with report.stage("filter_subfield_year"):
+        for subfield in SUBFIELDS:
+            subfield_df = filter_subfielf_publications(df, subfield)
+            for year in YEARS:
+                filter_publications_by_year(subfield_df, year)
+
+    with report.stage("partition_networks"):
+        exploded = explode_publications(iter_csv_publications(df))
+        networks = list(iter_subfield_year_arrays(exploded, df["publication_year"].to_numpy()))
+    report.count("authorships", len(exploded))
+    del df, exploded
+
+    with report.stage("gexf_export"):
+        for (subfield, year), network in networks:
+            write_network_arrays_gexf(network, os.path.join(tmp_dir, f"{subfield}_{year}.gexf"))
+    queue.put(report.to_dict())
+
+
+def _machine() -> Dict:
+    return {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "networkx": nx.__version__,
+    }
+
+
+def bench_suite(scales: str = SUITE_SCALES, action: str = "compare", seed: int = 0) -> None:
+    """
+    Times process_work, the CSV export, build_collaboration_network, the
+    subfield/year filtering, the partition network build and the GEXF export
+    on synthetic corpora of each size in `scales` (comma separated), every
+    size in a fresh process.
+
+    action 'compare' prints the timings next to the stored baseline
+    (SUITE_BASELINE); 'save' also records them as the new baseline for
+    those sizes.
+    """
+    baseline = {}
+    if os.path.exists(SUITE_BASELINE):
+        with open(SUITE_BASELINE) as f:
+            baseline = json.load(f)
+    saved = baseline.get("results", {})
+
+    results = {}
+    for num_works in (int(scale) for scale in scales.split(",")):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report = _run_isolated(_suite_scale, num_works, int(seed), tmp_dir)
+        result = {
+            "stages": {stage: report["stages"][stage]["seconds"] for stage in SUITE_STAGES},
+            "counters": report["counters"],
+            "wall_seconds": report["wall_seconds"],
+            "peak_rss_mb": report["peak_rss_mb"],
+        }
+        results[str(num_works)] = result
+
+        before = saved.get(str(num_works))
+        counters = result["counters"]
+        print(f"{num_works} works: {counters['authorships']} authorships, "
+              f"{counters['nodes']} authors, {counters['edges']} edges, peak RSS {result['peak_rss_mb']:.0f} MB")
+        if before is None:
+            print(f"  no baseline for {num_works} works (run with 'save' to record one)")
+        for stage in SUITE_STAGES + ["wall_seconds"]:
+            seconds = result["stages"][stage] if stage in result["stages"] else result[stage]
+            line = f"  {stage:<28} {seconds:8.2f}s"
+            if before is not None:
+                baseline_seconds = before["stages"][stage] if stage in before["stages"] else before[stage]
+                line += f"  baseline {baseline_seconds:8.2f}s  x{seconds / baseline_seconds:.2f}"
+            print(line)
+
+    if action == "save":
+        os.makedirs(os.path.dirname(SUITE_BASELINE), exist_ok=True)
+        baseline = {"machine": _machine(), "seed": int(seed), "results": {**saved, **results}}
+        with open(SUITE_BASELINE, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline saved to {SUITE_BASELINE}")
+
+
+def bench_process_pool(num_works: int = 200_000, workers: str = "1,2,4,8", executor: str = "process") -> None:
+    """
+    Times process_works over a synthetic corpus with 1, 2, 4 and 8 workers
+    and checks every run matches the serial output.
+    """
+    num_works = int(num_works)
+    works = [work for page in synthetic_pages(num_works) for work in page]
+    start = time.perf_counter()
+    serial = [process_work(work) for work in works]
+    serial_time = time.perf_counter() - start
+
+    print(f"Synthetic corpus: {num_works} works, {os.cpu_count()} CPUs, {executor} pool")
+    print(f"  serial:    {serial_time:.2f}s")
+    for count in (int(value) for value in workers.split(",")):
+        start = time.perf_counter()
+        pooled = process_works(works, count, executor)
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {count} worker{'s' if count > 1 else ' '}: {elapsed:.2f}s "
+            f"({serial_time / elapsed:.2f}x, identical: {pooled == serial})"
+        )
+
+
+BENCHMARKS = {
+    "streaming-csv": bench_streaming_csv,
+    "network-build": bench_network_build,
+    "gexf-io": bench_gexf_io,
+    "compact-records": bench_compact_records,
+    "suite": bench_suite,
+    "process-pool": bench_process_pool,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python benchmark.py {{{'|'.join(BENCHMARKS)}}} [args...]")
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
@@ -1,12 +1,39 @@
-import requests
+import argparse
 import pandas as pd
 import json
 import logging
+import os
 import time
-from typing import Dict, List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dedup_index import WorkIndex, iter_unique_pages
+import json_codec
+from openalex_client import OpenAlexClient
+from openalex_ids import process_doi, process_openalex_id
+from openalex_fetcher import MAX_IN_FLIGHT, OPENALEX_WORKS_URL, PER_PAGE, TokenBucket, iter_work_pages
+from page_journal import JOURNAL_DIR, PageJournal
+import run_report
 
 COUNTRY_CODE = "ID" # Indonesia
 
+# Number of processed works buffered before each append to the output CSV
+CSV_CHUNK_SIZE = 1000
+
+# Integer columns of the works CSV; missing values must not turn a chunk to floats
+CSV_INT_COLUMNS = ("publication_year", "cited_by_count")
+
+# Raw works per task when process_work runs in a pool
+PROCESS_CHUNK_SIZE = 500
+
+# Pools process_work can run in: processes for CPU-bound batches, threads
+# when works arrive from the network and pickling them would cost more
+PROCESS_EXECUTORS = {
+    "process": ProcessPoolExecutor,
+    "thread": ThreadPoolExecutor,
+}
+
 PUBLICATION_YEAR = [
     "2024",
     "2023",
@@ -58,59 +85,23 @@ def setup_logging(log_file: str = "open_alex_publications.log") -> None:
     logger.addHandler(console_handler)
 
 
-def process_doi(doi: str) -> str:
-    """
-    Removes the 'https://doi.org/' prefix from a DOI string.
-    """
-    if doi and doi.startswith("https://doi.org/"):
-        return doi.replace("https://doi.org/", "")
-    return doi
-
-
-def process_openalex_id(openalex_id: str) -> str:
-    """
-    Removes the 'https://openalex.org/' prefix from an OpenAlex ID string.
-    """
-    if openalex_id and openalex_id.startswith("https://openalex.org/"):
-        return openalex_id.replace("https://openalex.org/", "")
-    return openalex_id
-
-
-def fetch_all_works(params: Dict, logger: logging.Logger) -> List[Dict]:
+def fetch_all_works(
+    params: Dict,
+    logger: logging.Logger,
+    rate_limiter: Optional[TokenBucket] = None,
+    journal: Optional[PageJournal] = None,
+) -> List[Dict]:
     """
     Fetches all works from OpenAlex API using pagination.
+
+    Pages are requested concurrently under a shared token-bucket rate limit
+    and retried with backoff on 429/5xx responses (see openalex_fetcher).
+    If a journal is given, pages are checkpointed to disk as they arrive.
     """
     all_works = []
-    url = "https://api.openalex.org/works"
-
-    # Fetch first page
     logger.info("Fetching first page...")
-    params["page"] = 1
-    full_url = f"{url}?{'&'.join([f'{k}={v}' for k, v in params.items()])}"
-    response = requests.get(full_url)
-    response.raise_for_status()
-    data = response.json()
-    all_works.extend(data.get("results", []))
-
-    total_count = data["meta"]["count"]
-    per_page = params["per_page"]
-    total_pages = (total_count + per_page - 1) // per_page  # Ceiling division
-    logger.info(f"Total publications found: {total_count}")
-    logger.info(f"Total pages to fetch: {total_pages}")
-
-    # Fetch remaining pages
-    for page in range(2, total_pages + 1):
-        logger.info(f"Fetching page {page}/{total_pages}...")
-        params["page"] = page
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            page_data = response.json()
-            all_works.extend(page_data.get("results", []))
-            time.sleep(5)  # Respectful delay between requests
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to fetch page {page}: {e}")
-            raise
+    for results in iter_work_pages(params, logger, rate_limiter=rate_limiter, journal=journal):
+        all_works.extend(results)
 
     logger.info(f"Successfully retrieved {len(all_works)} works.")
     return all_works
@@ -183,20 +174,219 @@ def process_work(work: Dict) -> Dict:
                 key = f"{offset}_year"
                 offset_citations[key] = item["cited_by_count"]
             # If offset is negative, skip the entry as it is likely a data error.
-    processed["counts_by_year"] = json.dumps(offset_citations)
+    processed["counts_by_year"] = json_codec.dumps(offset_citations)
 
     # Convert complex fields to JSON strings
-    processed["authorships"] = json.dumps(processed["authorships"])
-    processed["subfield"] = json.dumps(processed["subfield"])
+    processed["authorships"] = json_codec.dumps(processed["authorships"])
+    processed["subfield"] = json_codec.dumps(processed["subfield"])
     return processed
 
 
-def main():
+def process_chunk(works: List[Dict]) -> Tuple[float, List[Dict]]:
+    """
+    Applies process_work to a chunk of raw works and returns the time it
+    took with the results. Module-level so process pools can pickle it.
+    """
+    start = time.perf_counter()
+    processed = [process_work(work) for work in works]
+    return time.perf_counter() - start, processed
+
+
+def iter_work_chunks(pages: Iterable[List[Dict]], chunk_size: int = PROCESS_CHUNK_SIZE) -> Iterator[List[Dict]]:
+    """
+    Regroups pages of works into chunks of `chunk_size` works, in order.
+    """
+    chunk = []
+    for results in pages:
+        for work in results:
+            chunk.append(work)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_processed_works(
+    pages: Iterable[List[Dict]],
+    workers: Optional[int] = None,
+    executor: str = "process",
+    chunk_size: int = PROCESS_CHUNK_SIZE,
+) -> Iterator[Dict]:
+    """
+    Lazily applies process_work to every work of every page. The time spent
+    in process_work is recorded in the run report, page by page.
+
+    With `workers` > 1, the works are regrouped into chunks of `chunk_size`
+    and processed by a pool of that many processes (or threads, see
+    PROCESS_EXECUTORS). At most two chunks per worker are in flight, so
+    memory stays bounded, and results are yielded in input order.
+    """
+    report = run_report.current()
+    if not workers or workers <= 1:
+        for results in pages:
+            seconds, processed = process_chunk(results)
+            report.add_time("process_work", seconds, calls=len(processed))
+            report.count("works_processed", len(processed))
+            yield from processed
+        return
+
+    with PROCESS_EXECUTORS[executor](max_workers=workers) as pool:
+        pending = deque()
+        chunks = iter_work_chunks(pages, chunk_size)
+        while True:
+            for chunk in chunks:
+                pending.append(pool.submit(process_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                return
+            seconds, processed = pending.popleft().result()
+            report.add_time("process_work", seconds, calls=len(processed))
+            report.count("works_processed", len(processed))
+            yield from processed
+
+
+def process_works(
+    works: List[Dict],
+    workers: Optional[int] = None,
+    executor: str = "process",
+    chunk_size: int = PROCESS_CHUNK_SIZE,
+) -> List[Dict]:
+    """
+    Applies process_work to a list of raw works, in a pool of `workers`
+    when given (see iter_processed_works). The result is in input order
+    and identical to [process_work(work) for work in works].
+    """
+    return list(iter_processed_works([works], workers, executor, chunk_size))
+
+
+def works_frame(processed_works: List[Dict]) -> pd.DataFrame:
+    """
+    Builds the DataFrame of processed works written to the CSV, with the
+    integer columns as nullable Int64 whether or not values are missing.
+    """
+    df = pd.DataFrame(processed_works)
+    for column in CSV_INT_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype("Int64")
+    return df
+
+
+def write_works_csv(
+    processed_works: Iterable[Dict], output_file: str, chunk_size: int = CSV_CHUNK_SIZE
+) -> int:
+    """
+    Writes processed works to a CSV file in chunks of `chunk_size` rows and
+    returns the number of rows written.
+
+    Only one chunk is held in memory at a time. Integer columns are pinned
+    per chunk (see works_frame), so the bytes written are the same as
+    calling to_csv on works_frame of all works.
+    """
+    total = 0
+    chunk = []
+    with open(output_file, "w", newline="") as f:
+        for work in processed_works:
+            chunk.append(work)
+            if len(chunk) >= chunk_size:
+                with run_report.stage("csv_write"):
+                    works_frame(chunk).to_csv(f, index=False, header=total == 0)
+                total += len(chunk)
+                chunk = []
+        if chunk or total == 0:
+            with run_report.stage("csv_write"):
+                works_frame(chunk).to_csv(f, index=False, header=total == 0)
+            total += len(chunk)
+    return total
+
+
+def build_params(country_code: str, year: str, email: Optional[str] = None) -> Dict:
+    """
+    Builds the works query of one country and publication year.
+    """
+    params = {
+        "select": "id,doi,title,authorships,publication_year,primary_topic,cited_by_count,counts_by_year",
+        "filter": "type:article,institutions.country_code:{},primary_topic.field.id:17,publication_year:{}".format(
+            country_code, year
+        ),
+        "per_page": PER_PAGE,
+    }
+    if email:
+        params["mailto"] = email  # Uncomment email to be respectful
+    return params
+
+
+def harvest(
+    country_code: str,
+    year: str,
+    output_file: str,
+    logger: logging.Logger,
+    email: Optional[str] = None,
+    rate_limiter: Optional[TokenBucket] = None,
+    session=None,
+    max_workers: int = MAX_IN_FLIGHT,
+    url: str = OPENALEX_WORKS_URL,
+    journal_root: str = JOURNAL_DIR,
+    index: Optional[WorkIndex] = None,
+    process_workers: Optional[int] = None,
+    process_executor: str = "thread",
+) -> Optional[int]:
+    """
+    Fetches, processes and saves the works of one country and year page by
+    page, journaling pages so an interrupted harvest resumes where it stopped.
+    With a dedup index, works already ingested by another partition (for
+    example a co-authored paper harvested for another country) are dropped
+    as the pages stream in. With `process_workers`, pages are processed in
+    a pool while the next ones are fetched (see iter_processed_works).
+    The CSV is written to a temporary file and renamed over `output_file`
+    once complete, and only then is the journal marked complete, so an
+    interrupted harvest never leaves a partial CSV that looks finished.
+    Returns the number of works written, or None if a previous run already
+    finished this harvest.
+    """
+    params = build_params(country_code, year, email)
+
+    # Skip harvests finished by a previous run; resume partial ones from the journal
+    journal = PageJournal(country_code, year, params["filter"], root=journal_root)
+    if journal.is_complete and os.path.exists(output_file):
+        logger.info(f"{country_code} {year} already harvested, skipping.")
+        return None
+
+    pages = iter_work_pages(
+        params,
+        logger,
+        url=url,
+        rate_limiter=rate_limiter,
+        max_workers=max_workers,
+        session=session,
+        journal=journal,
+    )
+    if index is not None:
+        pages = iter_unique_pages(pages, index, os.path.normpath(output_file))
+    tmp_file = f"{output_file}.tmp"
+    num_works = write_works_csv(
+        iter_processed_works(pages, process_workers, process_executor), tmp_file
+    )
+    os.replace(tmp_file, output_file)
+    journal.mark_complete()
+    if index is not None:
+        index.flush()
+    return num_works
+
+
+def main(dedup: bool = False, use_cache: bool = False):
     """
     Main function to execute the data retrieval and processing pipeline.
+    With `dedup`, works already ingested by an earlier harvest are skipped.
+    The page journal already keeps every fetched page, so the response
+    cache is off unless `use_cache` is set.
     """
     setup_logging()
     logger = logging.getLogger(__name__)
+    run_report.start_run("collect_publications")
+    client = OpenAlexClient(use_cache=use_cache)
+    index = WorkIndex() if dedup else None
 
     try:
         email = read_email_from_json()
@@ -205,35 +395,30 @@ def main():
         for year in PUBLICATION_YEAR:
             logger.info(f"Starting data retrieval for year {year}...")
 
-            # Configure API parameters
-            params = {
-                "select": "id,doi,title,authorships,publication_year,primary_topic,cited_by_count,counts_by_year",
-                "filter": "type:article,institutions.country_code:{},primary_topic.field.id:17,publication_year:{}".format(
-                    COUNTRY_CODE, year
-                ),
-                "per_page": 25,
-                "mailto": email,  # Uncomment email to be respectful
-            }
-
-            # Fetch all works
+            # Fetch, process and save works page by page
             logger.info("Starting data retrieval from OpenAlex API...")
-            all_works = fetch_all_works(params, logger)
-
-            # Process works
-            logger.info("Processing retrieved works...")
-            processed_works = [process_work(work) for work in all_works]
-
-            # Create and save DataFrame
-            df = pd.DataFrame(processed_works)
-            df.to_csv(f"open_alex_publications_{year}.csv", index=False)
-            logger.info(
-                f"Data saved to 'open_alex_publications_{year}_{COUNTRY_CODE}.csv' with {len(df)} entries."
-            )
+            output_file = f"open_alex_publications_{year}.csv"
+            num_works = harvest(COUNTRY_CODE, year, output_file, logger, email=email, session=client, index=index)
+            if num_works is not None:
+                logger.info(
+                    f"Data saved to 'open_alex_publications_{year}_{COUNTRY_CODE}.csv' with {num_works} entries."
+                )
 
     except Exception as e:
         logger.error(f"Script failed: {e}")
         raise
+    finally:
+        if index is not None:
+            logger.info(f"Dedup index: {len(index)} works, {index.duplicates} duplicates dropped")
+            index.close()
+        client.log_stats(logger)
+        client.close()
+        logger.info(f"Run report written to {run_report.finish_run()}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Collect the OpenAlex works of COUNTRY_CODE for PUBLICATION_YEAR.")
+    parser.add_argument("--dedup", action="store_true", help="skip works already ingested by an earlier harvest")
+    parser.add_argument("--cache", action="store_true", help="also keep responses in the on-disk response cache")
+    args = parser.parse_args()
+    main(args.dedup, args.cache)
@@ -0,0 +1,106 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+UNKNOWN_COUNTRY = "Unknown"
+
+
+class StringPool:
+    """
+    Dictionary encoder for repeated strings (author ids, country codes
+    and subfield names). Each distinct string is stored once
+    and referred to by a dense integer code.
+    """
+
+    __slots__ = ("_codes", "values")
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def decode_all(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Decodes an array of codes (-1 for missing) into an object array of
+        None and pooled strings; equal values share one string object.
+        """
+        values = np.empty(len(self.values) + 1, dtype=object)
+        values[:-1] = self.values
+        return values[codes]
+
+
+class CompactCorpus:
+    """
+    Array-backed, dictionary-encoded store of the authorships of a stream
+    of works, from which edge_builder.explode_publications builds its table.
+
+    Strings live once in the pools; works and authorships are parallel
+    typed arrays of integer codes. Authorships without an author id are not
+    stored, since they never take part in the collaboration network.
+    """
+
+    def __init__(self):
+        self.authors = StringPool()
+        self.countries = StringPool()
+        self.subfields = StringPool()
+
+        # One entry per work
+        self.work_subfield = array("i")
+
+        # One entry per authorship
+        self.row_work = array("q")
+        self.row_author = array("q")
+        self.row_country = array("i")
+
+    def __len__(self) -> int:
+        return len(self.work_subfield)
+
+    def add_work(
+        self,
+        subfield_name: Optional[str],
+        authors: Iterable[Tuple[Optional[str], Sequence[str]]],
+    ) -> None:
+        """
+        Appends a work. `authors` yields (author id, countries); the first
+        country is kept as the authorship's country.
+        """
+        work = len(self.work_subfield)
+        self.work_subfield.append(
+            self.subfields.encode(subfield_name) if subfield_name is not None else -1
+        )
+        for author_id, countries in authors:
+            if not author_id:
+                continue
+            self.row_work.append(work)
+            self.row_author.append(self.authors.encode(author_id))
+            self.row_country.append(
+                self.countries.encode(countries[0] if countries else UNKNOWN_COUNTRY)
+            )
+
+    def to_exploded(self) -> pd.DataFrame:
+        """
+        Returns the exploded authorship table used by edge_builder (one row per
+        stored authorship, in insertion order).
+        """
+        pub = np.frombuffer(self.row_work, dtype=np.int64).copy()
+        author = np.frombuffer(self.row_author, dtype=np.int64)
+        country = np.frombuffer(self.row_country, dtype=np.int32)
+        subfield = np.frombuffer(self.work_subfield, dtype=np.int32)[pub]
+        return pd.DataFrame({
+            "pub": pub,
+            "author_id": pd.Series(self.authors.decode_all(author), dtype=object),
+            "country": pd.Series(self.countries.decode_all(country), dtype=object),
+            "subfield": pd.Series(self.subfields.decode_all(subfield), dtype=object),
+        })
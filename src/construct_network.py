@@ -1,8 +1,30 @@
-import json
+import argparse
+import os
+import numpy as np
 import pandas as pd
 import networkx as nx
 from itertools import combinations
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from edge_builder import (
+    build_network_arrays,
+    build_network_from_exploded,
+    explode_publications,
+    explode_tables,
+    network_arrays_to_graph,
+    remap_authors,
+)
+from gexf_stream import write_network_arrays_gexf
+from graph_cache import csr_cache_path, write_csr_cache
+import json_codec
+import run_report
+
+# Full corpus CSV written by collect_publications_open_alex.py
+PUBLICATIONS_CSV = "../data/csv/openalex/br_publications.csv"
+
+# Parquet store written by publications_store.py
+PUBLICATIONS_STORE = "../data/parquet/br_publications"
 
 
 SUBFIELDS = [
@@ -19,6 +41,8 @@ SUBFIELDS = [
     "Computer Graphics and Computer-Aided Design"
 ]
 
+YEARS = list(range(2019, 2025))
+
 
 def parse_json_field(field_str):
     """
@@ -27,8 +51,8 @@ def parse_json_field(field_str):
     otherwise returns None.
     """
     try:
-        return json.loads(field_str)
-    except json.JSONDecodeError as e:
+        return json_codec.loads(field_str)
+    except json_codec.JSONDecodeError as e:
         print(f"Error parsing JSON: {e}")
         return None
 
@@ -69,12 +93,65 @@ def determine_primary_subfield(subfield_count):
     return max(subfield_count.items(), key=lambda x: x[1])[0]
 
 
-def build_collaboration_network(df):
+# Column that carries the decoded subfield names of a publications dataframe
+SUBFIELD_NAME_COLUMN = "subfield_name"
+
+
+def subfield_names(df):
     """
-    Processes the publications dataframe to create a collaboration network.
+    Returns the subfield display name of every row of a dataframe whose
+    'subfield' column holds JSON strings ('Unknown' when missing or invalid).
+
+    If the dataframe has a SUBFIELD_NAME_COLUMN (see with_subfield_names),
+    its values are returned without decoding anything.
+    """
+    if SUBFIELD_NAME_COLUMN in df.columns:
+        return df[SUBFIELD_NAME_COLUMN].tolist()
+    interned = {}
+    names = []
+    for subfield in df["subfield"]:
+        # Parse the subfield information (assumed to be a JSON dict)
+        subfield_data = parse_json_field(subfield)
+        name = subfield_data.get("display_name", "Unknown") if subfield_data else "Unknown"
+        names.append(interned.setdefault(name, name))
+    return names
+
+
+def with_subfield_names(df):
+    """
+    Returns the dataframe with its decoded subfield names in a
+    SUBFIELD_NAME_COLUMN, so filtering by subfield, then year, then building
+    the network decodes every subfield once. The input is not modified.
+    """
+    if SUBFIELD_NAME_COLUMN in df.columns:
+        return df
+    return df.assign(**{SUBFIELD_NAME_COLUMN: subfield_names(df)})
+
+
+def iter_csv_publications(df):
+    """
+    Yields (authors, subfield_name) for every publication of a dataframe
+    whose 'authorships' and 'subfield' columns hold JSON strings.
+    Publications whose authorships cannot be parsed are yielded with no
+    authors, so they add nothing to the network but the n-th item still
+    corresponds to the n-th row of the dataframe.
+    """
+    # Iterating the column directly avoids building a Series per row
+    for authorships, subfield_name in zip(df["authorships"], subfield_names(df)):
+        # Parse the authorship field into a list of author dictionaries
+        authors = parse_json_field(authorships)
+        if authors is None:
+            yield [], None
+            continue
+        yield authors, subfield_name
+
+
+def build_network_from_publications(publications):
+    """
+    Builds the collaboration network from an iterable of (authors, subfield_name)
+    pairs, where authors is a list of author dictionaries with 'id' and 'countries'.
 
     For each publication:
-      - Parses the authorship and subfield fields.
       - Updates the subfield counts per author.
       - Adds an edge (or updates its weight) between every pair of co-authors.
 
@@ -89,18 +166,7 @@ def build_collaboration_network(df):
     # Dictionary to store collaboration edges with their weights (tuple(author1, author2) -> count)
     collaboration_edges = defaultdict(int)
 
-    for idx, row in df.iterrows():
-        # Parse the authorship field into a list of author dictionaries
-        authors = parse_json_field(row["authorships"])
-        if authors is None:
-            continue
-
-        # Parse the subfield information (assumed to be a JSON dict)
-        subfield_data = parse_json_field(row["subfield"])
-        subfield_name = (
-            subfield_data.get("display_name", "Unknown") if subfield_data else "Unknown"
-        )
-
+    for authors, subfield_name in publications:
         # Update author subfield counts and store basic country info
         for author in authors:
             author_id = author.get("id")
@@ -136,18 +202,56 @@ def build_collaboration_network(df):
     return G
 
 
+def build_collaboration_network(df, author_remap=None, max_memory_mb=None):
+    """
+    Processes the publications dataframe to create a collaboration network.
+
+    For each publication:
+      - Parses the authorship and subfield fields.
+      - Updates the subfield counts per author.
+      - Adds an edge (or updates its weight) between every pair of co-authors.
+
+    The JSON columns are parsed once into an exploded authorship table and the
+    edges are aggregated on integer author codes (see edge_builder). The graph
+    is identical to build_network_from_publications(iter_csv_publications(df)).
+    With an `author_remap` ({author id: canonical id}, see author_disambiguation),
+    duplicate author profiles are collapsed into one node first. With
+    `max_memory_mb`, co-author pairs are aggregated on disk within that
+    memory budget instead (see external_network); the graph is the same.
+
+    Returns:
+      - A NetworkX graph with nodes having attributes 'label1' (country)
+        and 'label2' (primary subfield), and edges weighted by collaboration count.
+    """
+    if max_memory_mb is not None:
+        # Imported here: external_network imports this module
+        from external_network import build_network_arrays_external
+
+        return network_arrays_to_graph(
+            build_network_arrays_external(iter_csv_publications(df), max_memory_mb, author_remap=author_remap)
+        )
+    exploded = explode_publications(iter_csv_publications(df))
+    return build_network_from_exploded(remap_authors(exploded, author_remap))
+
+
+def build_collaboration_network_from_tables(works, authorships):
+    """
+    Builds the same graph as build_collaboration_network from the works and
+    authorships tables of the Parquet publications store.
+    """
+    return build_network_from_exploded(explode_tables(works, authorships))
+
+
 def filter_subfielf_publications(df: pd.DataFrame, subfiled: str) -> pd.DataFrame:
     """
     Filters the DataFrame to include only publications where the
     subfield's display_name is 'Artificial Intelligence'.
 
-    The function assumes that the 'subfield' column contains a JSON string.
+    The function assumes that the 'subfield' column contains a JSON string;
+    the decoded names are kept as a column of the result (see with_subfield_names).
     """
-    # Use a lambda to parse the JSON and check the display_name
-    filtered_df = df[
-        df["subfield"].apply(lambda x: json.loads(x).get("display_name") == subfiled)
-    ]
-    return filtered_df
+    df = with_subfield_names(df)
+    return df[df[SUBFIELD_NAME_COLUMN] == subfiled]
 
 
 def filter_publications_by_citation_count(
@@ -156,8 +260,7 @@ def filter_publications_by_citation_count(
     """
     Filters the DataFrame to include only publications with more than the specified number of citations.
     """
-    filtered_df = df[df["cited_by_count"] > num_citations]
-    return filtered_df
+    return df[df["cited_by_count"] > num_citations]
 
 
 def filter_publications_by_year(
@@ -166,42 +269,174 @@ def filter_publications_by_year(
     """
     Filters the DataFrame to include only publications for a specific year.
     """
-    filtered_df = df[df["publication_year"] == year]
-    return filtered_df
+    return df[df["publication_year"] == year]
 
 
 
-def main():
+def write_network(network, subfield, year):
     """
-    Main function that loads the publications data, builds the collaboration network,
-    and saves the network as a GEXF file.
+    Writes a subfield/year network (edge_builder.NetworkArrays) to a GEXF file
+    for visualization (e.g., in Gephi), streaming it straight from the arrays,
+    and to the binary CSR cache used by the analyses (see graph_cache).
     """
-    # Load the CSV file into a pandas DataFrame.
-    # Adjust the file name/path as needed.
+    output_file = str(f"../data/graphs/subfields/{subfield}_{year}.gexf")
+    try:
+        with run_report.stage("gexf_write"):
+            write_network_arrays_gexf(network, output_file)
+        print(f"Graph successfully written to {output_file}")
+    except Exception as e:
+        print(f"Error writing GEXF file: {e}")
+
+    cache_dir = csr_cache_path(subfield, year)
     try:
-        full_df = pd.read_csv("../data/csv/openalex/br_publications.csv")
+        with run_report.stage("csr_write"):
+            write_csr_cache(network, cache_dir)
     except Exception as e:
-        print(f"Error reading CSV file: {e}")
-        return
+        print(f"Error writing CSR cache {cache_dir}: {e}")
 
-    for subfield in SUBFIELDS:
-        # Filter the DataFrame to include only a subfield of interest
-        subfielf_df = filter_subfielf_publications(full_df, subfield)
 
-        for year in range(2019, 2025):
-            df = filter_publications_by_year(subfielf_df, year)
+def iter_subfield_year_arrays(exploded, pub_years, subfields=SUBFIELDS, years=YEARS, workers=None):
+    """
+    Builds the collaboration network of every (subfield, year) partition from
+    a single exploded authorship table (see edge_builder), instead of
+    re-filtering and re-parsing the corpus once per partition.
+
+    Parameters:
+      exploded: exploded authorship table of the whole corpus.
+      pub_years: publication year of each publication, indexed by the 'pub' column.
+      workers: if set, partitions are built in parallel across a process pool
+        of that size.
+
+    Yields ((subfield, year), NetworkArrays) in subfields-then-years order.
+    """
+    exploded = exploded.assign(year=np.asarray(pub_years)[exploded["pub"].to_numpy()])
+    # groupby keeps the original row order inside each group
+    partitions = dict(iter(exploded.groupby(["subfield", "year"], sort=False)))
+    empty = exploded.iloc[:0]
 
-            # Build the collaboration network graph
-            G = build_collaboration_network(df)
+    keys = [(subfield, year) for subfield in subfields for year in years]
+    parts = (partitions.get(key, empty) for key in keys)
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from zip(keys, executor.map(build_network_arrays, parts))
+    else:
+        yield from zip(keys, map(build_network_arrays, parts))
 
-            # Write the graph to a GEXF file for visualization (e.g., in Gephi)
-            output_file = str(f"../data/graphs/subfields/{subfield}_{year}.gexf")
-            try:
-                nx.write_gexf(G, output_file)
-                print(f"Graph successfully written to {output_file}")
-            except Exception as e:
-                print(f"Error writing GEXF file: {e}")
+
+def iter_subfield_year_networks(exploded, pub_years, subfields=SUBFIELDS, years=YEARS, workers=None):
+    """
+    Same as iter_subfield_year_arrays, but yields NetworkX graphs. Each graph is
+    identical to build_collaboration_network on the filtered dataframe.
+    """
+    for key, arrays in iter_subfield_year_arrays(exploded, pub_years, subfields, years, workers):
+        yield key, network_arrays_to_graph(arrays)
+
+
+def store_is_current(store_dir=PUBLICATIONS_STORE, csv_file=PUBLICATIONS_CSV):
+    """
+    True if the Parquet publications store exists and none of its files is
+    older than the corpus CSV, i.e. it was converted from the current CSV.
+    """
+    if not os.path.isdir(store_dir):
+        return False
+    files = [os.path.join(store_dir, name) for name in os.listdir(store_dir)]
+    if not files:
+        return False
+    if not os.path.exists(csv_file):
+        return True
+    return min(os.path.getmtime(path) for path in files) >= os.path.getmtime(csv_file)
+
+
+def load_exploded_corpus():
+    """
+    Loads the publications corpus as an exploded authorship table plus the
+    publication year of each publication.
+
+    The Parquet publications store is used when it is current (see
+    store_is_current); otherwise the CSV is loaded and its JSON columns are
+    parsed once.
+    """
+    if store_is_current():
+        # Imported here so the CSV pipeline does not require pyarrow
+        from publications_store import load_publications
+
+        works, authorships = load_publications(PUBLICATIONS_STORE, subfields=SUBFIELDS)
+        return explode_tables(works, authorships), works["publication_year"].to_numpy()
+
+    # Adjust the file name/path as needed.
+    if os.path.isdir(PUBLICATIONS_STORE):
+        print(f"{PUBLICATIONS_STORE} is older than {PUBLICATIONS_CSV}; reading the CSV")
+    full_df = pd.read_csv(PUBLICATIONS_CSV)
+    # Timed as a whole: a timer per parsed field would cost more than the parse
+    with run_report.stage("json_parse"):
+        exploded = explode_publications(iter_csv_publications(full_df))
+    return exploded, full_df["publication_year"].to_numpy()
+
+
+def main(workers=None, profile=None, author_remap_file=None, projection=None):
+    """
+    Main function that loads the publications data, builds the collaboration network
+    of every subfield and year in one pass, and saves each network as a GEXF file.
+    Stage timings are written to a run report (see run_report). With an id-remap
+    table (see author_disambiguation), duplicate author ids are merged first.
+    With a projection ('country' or 'institution'), the corpus-wide network of
+    that entity is built instead (see network_projections).
+    """
+    report = run_report.start_run("construct_network", profile)
+    try:
+        if projection:
+            # Imported here: network_projections imports this module
+            from network_projections import main as build_projection
+
+            build_projection(projection)
+            return
+        try:
+            with report.stage("load_corpus"):
+                exploded, pub_years = load_exploded_corpus()
+        except Exception as e:
+            print(f"Error reading publications data: {e}")
+            return
+        if author_remap_file:
+            # Imported here: author_disambiguation imports this module
+            from author_disambiguation import load_author_remap
+
+            remap = load_author_remap(author_remap_file)
+            with report.stage("author_remap"):
+                exploded = remap_authors(exploded, remap)
+            print(f"Applied {len(remap)} author id remaps from {author_remap_file}")
+        report.count("authorship_rows", len(exploded))
+
+        # Partitions are built lazily, so the time to produce each one is the edge-building time
+        partitions = iter_subfield_year_arrays(exploded, pub_years, workers=workers)
+        for (subfield, year), network in run_report.timed_iter(partitions, "edge_building"):
+            report.count("nodes", len(network.node_ids))
+            report.count("edges", len(network.weight))
+            write_network(network, subfield, year)
+    finally:
+        print(f"Run report written to {run_report.finish_run()}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build the subfield/year collaboration networks.")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="build partitions in a process pool of this size"
+    )
+    parser.add_argument("--profile", choices=run_report.PROFILERS, help="profile the run into the run report")
+    parser.add_argument(
+        "--author-remap",
+        nargs="?",
+        const="../data/csv/openalex/author_id_remap.csv",
+        help="merge duplicate author ids with this id-remap table (see author_disambiguation)",
+    )
+    parser.add_argument(
+        "--projection",
+        choices=["country", "institution"],
+        help="build the corpus-wide country or institution network instead (see network_projections)",
+    )
+    args = parser.parse_args()
+    main(
+        workers=args.workers,
+        profile=args.profile,
+        author_remap_file=args.author_remap,
+        projection=args.projection,
+    )
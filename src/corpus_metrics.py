@@ -0,0 +1,317 @@
+import argparse
+import os
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from construct_network import get_author_country, parse_json_field
+
+HOME_COUNTRY = "BR"
+
+SUBFIELDS_CSV = "../data/csv/openalex/unique_subfields.csv"
+
+PUBLICATION_YEARS = [2024, 2023, 2022, 2021, 2020, 2019]
+
+# Checked-in copy of each table, used by --compare and never overwritten
+METRICS_TABLES = {
+    "authors_metrics": "../data/csv/openalex/authors_metrics.csv",
+    "countries_collabs": "../data/csv/countries_collabs.csv",
+    "summary_dom_int": "../data/csv/openalex/summary_dom_int.csv",
+    "countries_subfields": "../data/csv/openalex/countries_subfields.csv",
+}
+
+# Where recomputed tables are written by default
+OUTPUT_DIR = "../data/csv/computed"
+
+# Collaborating countries listed in countries_collabs.csv
+TOP_COUNTRIES = 10
+
+# Rows read from the corpus CSV at a time
+CHUNK_SIZE = 20000
+
+ALL_SUBFIELDS = "All Subfields"
+
+
+class CountHistogram:
+    """
+    Histogram of small non-negative integers (authors per work).
+
+    Holds one counter per distinct value instead of every observation, so
+    memory stays bounded by the largest author count whatever the corpus
+    size, and the mean, sample standard deviation and median it returns are
+    exact (the same as pandas mean, std and median over the raw values).
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def add(self, value: int) -> None:
+        self.counts[value] += 1
+
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+
+    def _arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        values = np.array(sorted(self.counts), dtype=float)
+        return values, np.array([self.counts[v] for v in sorted(self.counts)], dtype=float)
+
+    def mean(self) -> float:
+        values, weights = self._arrays()
+        return float((values * weights).sum() / weights.sum())
+
+    def std(self) -> float:
+        values, weights = self._arrays()
+        n = weights.sum()
+        if n < 2:
+            return float("nan")
+        mean = (values * weights).sum() / n
+        return float(np.sqrt((weights * (values - mean) ** 2).sum() / (n - 1)))
+
+    def median(self) -> float:
+        values, weights = self._arrays()
+        cumulative = np.cumsum(weights)
+        n = cumulative[-1]
+        # Average of the two middle observations (one when n is odd)
+        lower = values[np.searchsorted(cumulative, (n - 1) // 2, side="right")]
+        upper = values[np.searchsorted(cumulative, n // 2, side="right")]
+        return float((lower + upper) / 2)
+
+
+class CorpusMetrics:
+    """
+    Accumulates the corpus summary tables in one pass over the works:
+
+      authors_metrics      mean, median and standard deviation of authors per
+                           work per subfield and over all subfields
+      countries_collabs    collaborating authors per foreign country, each
+                           author counted once with their first-seen country
+      summary_dom_int      domestic vs international works per subfield (a
+                           work is international when any authorship lists
+                           a country other than the home country)
+      countries_subfields  works and citations per year, subfield and country
+
+    Memory is bounded by the number of distinct authors (the set of authors
+    already counted) plus small per-subfield counters; no work is kept.
+    """
+
+    def __init__(
+        self,
+        subfields: pd.DataFrame,
+        home_country: str = HOME_COUNTRY,
+        count_countries: Optional[List[str]] = None,
+    ):
+        # Per-subfield rows are limited to the subfields of unique_subfields.csv
+        self.subfields = subfields
+        self.home_country = home_country
+        self.count_countries = set(count_countries or [home_country])
+        self.works = 0
+        self.authors_per_work: Dict[str, CountHistogram] = defaultdict(CountHistogram)
+        self.seen_authors = set()
+        self.author_countries = Counter()
+        self.domestic = Counter()
+        self.international = Counter()
+        self.cell_counts = Counter()
+        self.cell_citations = Counter()
+
+    def add(self, year: Optional[int], subfield: Optional[Dict], authors: List[Dict], cited_by_count) -> None:
+        """
+        Adds one work: its publication year, subfield dict, authorships and
+        citation count, as decoded from the corpus CSV.
+        """
+        self.works += 1
+        subfield = subfield or {}
+        subfield_name = subfield.get("display_name", "Unknown")
+
+        self.authors_per_work[subfield_name].add(len(authors))
+        self.authors_per_work[ALL_SUBFIELDS].add(len(authors))
+
+        countries = set()
+        for author in authors:
+            countries.update(author.get("countries", []))
+            author_id = author.get("id")
+            if author_id and author_id not in self.seen_authors:
+                self.seen_authors.add(author_id)
+                self.author_countries[get_author_country(author)] += 1
+
+        if countries - {self.home_country}:
+            self.international[subfield_name] += 1
+        else:
+            self.domestic[subfield_name] += 1
+
+        if year is not None and not pd.isna(year):
+            citations = 0 if pd.isna(cited_by_count) else int(cited_by_count)
+            for country in countries & self.count_countries:
+                key = (int(year), subfield_name, country)
+                self.cell_counts[key] += 1
+                self.cell_citations[key] += citations
+
+    def authors_metrics(self) -> pd.DataFrame:
+        """
+        authors_metrics.csv: subfields by descending mean authors per work;
+        position is the alphabetical rank of the subfield, All Subfields last.
+        """
+        names = sorted(
+            name for name in self.subfields["subfield_display_name"] if name in self.authors_per_work
+        ) + [ALL_SUBFIELDS]
+        df = pd.DataFrame([
+            {
+                "subfield": name,
+                "avg_authors": self.authors_per_work[name].mean(),
+                "median_authors": self.authors_per_work[name].median(),
+                "stdv_authors": self.authors_per_work[name].std(),
+                "position": position,
+            }
+            for position, name in enumerate(names, start=1)
+        ])
+        return df.sort_values("avg_authors", ascending=False, kind="stable").reset_index(drop=True)
+
+    def countries_collabs(self, top: int = TOP_COUNTRIES) -> pd.DataFrame:
+        """
+        countries_collabs.csv: the `top` foreign countries by number of
+        authors, with their share of all foreign authors.
+        """
+        foreign = {
+            country: count
+            for country, count in self.author_countries.items()
+            if country not in (self.home_country, "Unknown")
+        }
+        total = sum(foreign.values())
+        ranked = sorted(foreign.items(), key=lambda item: item[1], reverse=True)[:top]
+        return pd.DataFrame(
+            [
+                {"authors_country": country, "count": count, "percentage": count / total * 100, "position": position}
+                for position, (country, count) in enumerate(ranked, start=1)
+            ],
+            columns=["authors_country", "count", "percentage", "position"],
+        )
+
+    def summary_dom_int(self) -> pd.DataFrame:
+        """
+        summary_dom_int.csv: domestic and international works per subfield,
+        by descending international share.
+        """
+        rows = []
+        for name in self.subfields["subfield_display_name"]:
+            total = self.domestic[name] + self.international[name]
+            if total == 0:
+                continue
+            rows.append({
+                "subfield_display": name,
+                "international_percentage": self.international[name] / total * 100,
+                "international_publications": self.international[name],
+                "domestic_percentage": self.domestic[name] / total * 100,
+                "domestic_publications": self.domestic[name],
+                "total_publications": total,
+            })
+        df = pd.DataFrame(rows).sort_values(
+            ["international_percentage", "subfield_display"], ascending=[False, True]
+        )
+        return df.reset_index(drop=True)
+
+    def countries_subfields(self, years: Iterable[int] = PUBLICATION_YEARS) -> pd.DataFrame:
+        """
+        countries_subfields.csv: works and citation sums per year, subfield
+        (in unique_subfields.csv order) and country, zeros included.
+        """
+        rows = []
+        for country in sorted(self.count_countries):
+            for year in years:
+                for subfield_id, name in zip(self.subfields["subfield_id"], self.subfields["subfield_display_name"]):
+                    key = (year, name, country)
+                    rows.append({
+                        "publication_year": year,
+                        "subfield_id": subfield_id,
+                        "subfield_display_name": name,
+                        "count": self.cell_counts[key],
+                        "citation_count": self.cell_citations[key],
+                        "country_code": country,
+                    })
+        return pd.DataFrame(rows)
+
+
+def iter_csv_works(csv_file: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple]:
+    """
+    Streams (publication_year, subfield, authors, cited_by_count) from the
+    corpus CSV chunk by chunk, decoding each JSON cell once.
+    """
+    columns = ["publication_year", "authorships", "subfield", "cited_by_count"]
+    for chunk in pd.read_csv(csv_file, usecols=columns, chunksize=chunk_size):
+        for year, authorships, subfield, cited_by_count in zip(
+            chunk["publication_year"], chunk["authorships"], chunk["subfield"], chunk["cited_by_count"]
+        ):
+            authors = parse_json_field(authorships) if isinstance(authorships, str) else None
+            subfield = parse_json_field(subfield) if isinstance(subfield, str) else None
+            yield year, subfield, authors or [], cited_by_count
+
+
+def compute_metrics(
+    csv_file: str,
+    home_country: str = HOME_COUNTRY,
+    count_countries: Optional[List[str]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Computes every table of METRICS_TABLES in one streaming pass over the corpus.
+    """
+    metrics = CorpusMetrics(pd.read_csv(SUBFIELDS_CSV), home_country, count_countries)
+    for work in iter_csv_works(csv_file, chunk_size):
+        metrics.add(*work)
+    print(f"Aggregated {metrics.works} works, {len(metrics.seen_authors)} authors")
+    return {
+        "authors_metrics": metrics.authors_metrics(),
+        "countries_collabs": metrics.countries_collabs(),
+        "summary_dom_int": metrics.summary_dom_int(),
+        "countries_subfields": metrics.countries_subfields(),
+    }
+
+
+def compare_tables(tables: Dict[str, pd.DataFrame]) -> None:
+    """
+    Prints whether each computed table matches its checked-in CSV.
+    """
+    for name, df in tables.items():
+        expected = pd.read_csv(METRICS_TABLES[name])
+        if name == "countries_subfields":
+            expected = expected[expected["country_code"].isin(df["country_code"].unique())]
+        try:
+            pd.testing.assert_frame_equal(
+                df.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False
+            )
+            print(f"{name}: matches {METRICS_TABLES[name]}")
+        except AssertionError as e:
+            print(f"{name}: differs from {METRICS_TABLES[name]}\n{e}")
+
+
+def main(csv_file: str, output_dir: str = OUTPUT_DIR, compare: bool = False, count_countries=None):
+    """
+    Computes the tables and compares them with the checked-in CSVs, or writes
+    them to `output_dir`. The checked-in tables are never overwritten: some
+    (e.g. countries_subfields.csv, built from API counts for several
+    countries) cannot be reproduced from the corpus.
+    """
+    paths = {name: os.path.join(output_dir, os.path.basename(table)) for name, table in METRICS_TABLES.items()}
+    checked_in = {os.path.abspath(table) for table in METRICS_TABLES.values()}
+    overwritten = [path for path in paths.values() if os.path.abspath(path) in checked_in]
+    if overwritten and not compare:
+        raise ValueError(f"Refusing to overwrite checked-in tables {overwritten}; choose another --output-dir")
+    tables = compute_metrics(csv_file, count_countries=count_countries)
+    if compare:
+        compare_tables(tables)
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    for name, df in tables.items():
+        path = paths[name]
+        df.to_csv(path, index=False)
+        print(f"Saved {name} to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the corpus summary tables in one pass.")
+    parser.add_argument("csv_file", nargs="?", default="../data/csv/openalex/br_publications.csv")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="directory of the recomputed tables")
+    parser.add_argument("--compare", action="store_true", help="only compare against the checked-in CSVs")
+    parser.add_argument("--countries", nargs="+", help="country codes of countries_subfields (default: BR)")
+    args = parser.parse_args()
+    main(args.csv_file, args.output_dir, args.compare, args.countries)
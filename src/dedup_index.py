@@ -0,0 +1,221 @@
+import argparse
+import os
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from openalex_ids import process_openalex_id, strip_openalex_ids, strip_prefix
+
+DEDUP_INDEX = "../data/journal/works_index.tsv"
+
+# Rows read per chunk when merging partitions
+MERGE_CHUNK_SIZE = 50000
+
+DOI_PREFIXES = ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/", "doi:")
+
+
+def normalize_doi(doi: Optional[str]) -> Optional[str]:
+    """
+    Returns a DOI without resolver prefixes, lower-cased (DOIs are case
+    insensitive), or None when empty.
+    """
+    if not isinstance(doi, str):
+        return None
+    doi = doi.strip().lower()
+    for prefix in DOI_PREFIXES:
+        if doi.startswith(prefix):
+            doi = doi[len(prefix):]
+            break
+    return doi or None
+
+
+def normalize_work_id(work_id: Optional[str]) -> Optional[str]:
+    """
+    Returns an OpenAlex work id without the 'https://openalex.org/' prefix,
+    or None when empty.
+    """
+    if not isinstance(work_id, str):
+        return None
+    return process_openalex_id(work_id) or None
+
+
+def normalize_work_id_column(work_ids: pd.Series) -> pd.Series:
+    """
+    normalize_work_id over a whole column (see openalex_ids.strip_openalex_ids).
+    """
+    work_ids = strip_openalex_ids(work_ids)
+    return work_ids.where(work_ids.str.len() > 0, None)
+
+
+def normalize_doi_column(dois: pd.Series) -> pd.Series:
+    """
+    normalize_doi over a whole column (see openalex_ids.strip_prefix).
+    """
+    dois = strip_prefix(dois.astype(object).str.strip().str.lower(), DOI_PREFIXES)
+    return dois.where(dois.str.len() > 0, None)
+
+
+class WorkIndex:
+    """
+    Persistent hash index of the works already ingested, keyed on OpenAlex
+    work id and on normalized DOI.
+
+    Each key maps to the partition (the normalized path of the output CSV)
+    that ingested the work first. The index lives in memory as two dicts and is persisted as an
+    append-only TSV of 'partition, id, doi' lines, so lookups are O(1) and
+    every accepted work costs one appended line.
+    """
+
+    def __init__(self, path: Optional[str] = DEDUP_INDEX):
+        self.path = path
+        self.by_id: Dict[str, str] = {}
+        self.by_doi: Dict[str, str] = {}
+        self.duplicates = 0
+        self._lock = threading.Lock()
+        self._file = None
+        if path is None:
+            return
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    partition, work_id, doi = line.rstrip("\n").split("\t")
+                    self._remember(partition, work_id or None, doi or None)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _remember(self, partition: str, work_id: Optional[str], doi: Optional[str]) -> None:
+        if work_id:
+            self.by_id.setdefault(work_id, partition)
+        if doi:
+            self.by_doi.setdefault(doi, partition)
+
+    def owner(self, work_id: Optional[str], doi: Optional[str] = None) -> Optional[str]:
+        """
+        Returns the partition that ingested the work, matching by id or DOI.
+        """
+        work_id = normalize_work_id(work_id)
+        doi = normalize_doi(doi)
+        return (work_id and self.by_id.get(work_id)) or (doi and self.by_doi.get(doi)) or None
+
+    def claim(self, work_id: Optional[str], doi: Optional[str], partition: str) -> bool:
+        """
+        Records the work as ingested by `partition` and returns True, or
+        returns False if another partition already ingested it. Works already
+        owned by the same partition are accepted again, so a resumed harvest
+        rewrites its own rows.
+        """
+        work_id = normalize_work_id(work_id)
+        doi = normalize_doi(doi)
+        with self._lock:
+            owner = (work_id and self.by_id.get(work_id)) or (doi and self.by_doi.get(doi))
+            if owner is not None and owner != partition:
+                self.duplicates += 1
+                return False
+            if owner is None:
+                self._remember(partition, work_id, doi)
+                if self._file is not None:
+                    self._file.write(f"{partition}\t{work_id or ''}\t{doi or ''}\n")
+            return True
+
+    def record_duplicate(self) -> None:
+        with self._lock:
+            self.duplicates += 1
+
+    def flush(self) -> None:
+        if self._file is not None:
+            with self._lock:
+                self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+
+def iter_unique_pages(pages: Iterable[List[Dict]], index: WorkIndex, partition: str) -> Iterator[List[Dict]]:
+    """
+    Filters pages of raw OpenAlex works as they stream in, dropping works
+    another partition has ingested and works repeated within this stream.
+    """
+    seen = set()
+    for results in pages:
+        unique = []
+        for work in results:
+            work_id = normalize_work_id(work.get("id"))
+            key = work_id or normalize_doi(work.get("doi"))
+            if key is not None and key in seen:
+                index.record_duplicate()
+                continue
+            if not index.claim(work_id, work.get("doi"), partition):
+                continue
+            if key is not None:
+                seen.add(key)
+            unique.append(work)
+        yield unique
+
+
+def merge_partitions(input_files: List[str], output_file: str, chunk_size: int = MERGE_CHUNK_SIZE) -> int:
+    """
+    Unions partition CSVs written by the collector into one CSV, dropping
+    works whose id or normalized DOI appeared in an earlier row. Files are
+    streamed in chunks of `chunk_size` rows and values are copied verbatim,
+    so only the seen keys are held in memory. Returns the rows written.
+    """
+    seen_ids, seen_dois = set(), set()
+    total = 0
+    duplicates = 0
+    with open(output_file, "w", newline="") as out:
+        for input_file in input_files:
+            for chunk in pd.read_csv(input_file, dtype=str, keep_default_na=False, chunksize=chunk_size):
+                keep = []
+                for work_id, doi in zip(normalize_work_id_column(chunk["id"]), normalize_doi_column(chunk["doi"])):
+                    if (work_id and work_id in seen_ids) or (doi and doi in seen_dois):
+                        keep.append(False)
+                        continue
+                    if work_id:
+                        seen_ids.add(work_id)
+                    if doi:
+                        seen_dois.add(doi)
+                    keep.append(True)
+                kept = chunk[keep]
+                duplicates += len(chunk) - len(kept)
+                kept.to_csv(out, index=False, header=total == 0)
+                total += len(kept)
+    print(f"Merged {len(input_files)} partitions into {output_file}: {total} works, {duplicates} duplicates dropped")
+    return total
+
+
+def index_partitions(input_files: List[str], path: str = DEDUP_INDEX, chunk_size: int = MERGE_CHUNK_SIZE) -> WorkIndex:
+    """
+    Seeds the index from partition CSVs harvested before it existed. Each
+    file's partition name is its normalized path, as in the collector.
+    """
+    index = WorkIndex(path)
+    for input_file in input_files:
+        for chunk in pd.read_csv(input_file, usecols=["id", "doi"], dtype=str, keep_default_na=False, chunksize=chunk_size):
+            for work_id, doi in zip(chunk["id"], chunk["doi"]):
+                index.claim(work_id, doi, os.path.normpath(input_file))
+    index.close()
+    print(f"Indexed {len(index)} works from {len(input_files)} partitions into {path} ({index.duplicates} duplicates)")
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deduplicate harvested works.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    merge_parser = subparsers.add_parser("merge", help="union partition CSVs without duplicates")
+    merge_parser.add_argument("output_file")
+    merge_parser.add_argument("input_files", nargs="+")
+    index_parser = subparsers.add_parser("index", help="seed the dedup index from existing partitions")
+    index_parser.add_argument("input_files", nargs="+")
+    index_parser.add_argument("--index", default=DEDUP_INDEX, help="index file")
+    args = parser.parse_args()
+    if args.command == "merge":
+        merge_partitions(args.input_files, args.output_file)
+    else:
+        index_partitions(args.input_files, args.index)
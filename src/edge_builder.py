@@ -0,0 +1,233 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from compact_records import CompactCorpus
+
+
+def explode_publications(publications: Iterable[Tuple[List[dict], Optional[str]]]) -> pd.DataFrame:
+    """
+    Flattens an iterable of (authors, subfield_name) pairs (as yielded by
+    construct_network.iter_csv_publications) into one row per authorship:
+
+      pub        : index of the publication in iteration order
+      author_id  : OpenAlex author id (authorships without an id are dropped)
+      country    : the authorship's first country, or 'Unknown'
+      subfield   : the publication's subfield name
+
+    Rows are in publication order, then author order. Strings are pooled
+    through a CompactCorpus, so every distinct author id, country and subfield
+    is held once however many authorships repeat it.
+    """
+    corpus = CompactCorpus()
+    for authors, subfield_name in publications:
+        corpus.add_work(
+            subfield_name, ((author.get("id"), author.get("countries", [])) for author in authors)
+        )
+    return corpus.to_exploded()
+
+
+def explode_tables(works: pd.DataFrame, authorships: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds the same exploded table as explode_publications directly from the
+    works and authorships tables of the Parquet publications store.
+    """
+    # A work id can repeat (the same work harvested twice); like the CSV path,
+    # every row counts. The n-th row of an id owns the n-th run of its
+    # authorships, a run starting at position 0.
+    work_ids = works["id"].astype(object)
+    pubs = pd.DataFrame({
+        "work_id": work_ids.values,
+        "occurrence": work_ids.groupby(work_ids, sort=False, dropna=False).cumcount().values,
+        "pub": np.arange(len(works), dtype=np.int64),
+    })
+    starts = authorships["position"] == 0
+    occurrence = starts.groupby(authorships["work_id"].astype(object), sort=False, dropna=False).cumsum() - 1
+    exploded = pd.DataFrame({
+        "work_id": authorships["work_id"].astype(object).values,
+        "occurrence": occurrence.values,
+        "position": authorships["position"].values,
+        "author_id": authorships["author_id"].astype(object).values,
+        "country": authorships["country"].astype(object).fillna("Unknown").values,
+    })
+    exploded = exploded[exploded["author_id"].notna() & (exploded["author_id"] != "")]
+    exploded = exploded.merge(pubs, on=["work_id", "occurrence"], how="inner")
+    exploded = exploded.drop(columns=["work_id", "occurrence"])
+    subfield_names = works["subfield_name"].astype(object)
+    subfield_names = subfield_names.where(subfield_names.notna(), None).values
+    exploded["subfield"] = subfield_names[exploded["pub"].values]
+    exploded = exploded.sort_values(["pub", "position"], kind="stable")
+    return exploded.drop(columns="position").reset_index(drop=True)
+
+
+def remap_authors(exploded: pd.DataFrame, remap: Dict[str, str]) -> pd.DataFrame:
+    """
+    Replaces merged author ids by their canonical id (see author_disambiguation)
+    in an exploded authorship table. Row order is kept, and if a publication
+    ends up listing the same author twice only the first authorship remains.
+    """
+    if not remap:
+        return exploded
+    author_ids = exploded["author_id"]
+    canonical = author_ids.map(remap)
+    remapped = exploded.assign(
+        author_id=pd.Series(canonical.where(canonical.notna(), author_ids).values, dtype=object, index=exploded.index)
+    )
+    remapped = remapped[~remapped.duplicated(["pub", "author_id"])]
+    return remapped.reset_index(drop=True)
+
+
+def build_edge_arrays(pub: np.ndarray, author: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Computes weighted co-authorship edges from parallel arrays of publication
+    indices and integer author codes, sorted by publication.
+
+    Every pair of authorship rows within a publication contributes 1 to the
+    weight of edge (min(u, v), max(u, v)). Edges are returned in order of
+    their first occurrence, i.e. the order itertools.combinations over each
+    publication's author list would first produce them.
+
+    Returns (u, v, weight) arrays.
+    """
+    if len(pub) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    starts = np.flatnonzero(np.r_[True, pub[1:] != pub[:-1]])
+    sizes = np.diff(np.r_[starts, len(pub)])
+    num_pairs = sizes * (sizes - 1) // 2
+    pair_offsets = np.r_[0, np.cumsum(num_pairs)[:-1]]
+
+    us, vs, orders = [], [], []
+    # Publications with the same number of authors are paired as one matrix
+    for k in np.unique(sizes[sizes >= 2]):
+        selected = np.flatnonzero(sizes == k)
+        rows = starts[selected][:, None] + np.arange(k)
+        codes = author[rows]
+        i, j = np.triu_indices(k, 1)
+        us.append(codes[:, i].ravel())
+        vs.append(codes[:, j].ravel())
+        orders.append((pair_offsets[selected][:, None] + np.arange(len(i))).ravel())
+
+    if not us:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    u = np.concatenate(us)
+    v = np.concatenate(vs)
+    order = np.argsort(np.concatenate(orders), kind="stable")
+    lo = np.minimum(u, v)[order]
+    hi = np.maximum(u, v)[order]
+
+    keys = lo * (int(author.max()) + 1) + hi
+    _, first, weight = np.unique(keys, return_index=True, return_counts=True)
+    by_first = np.argsort(first, kind="stable")
+    first = first[by_first]
+    return lo[first], hi[first], weight[by_first]
+
+
+def primary_subfields(author: np.ndarray, subfield: np.ndarray, num_authors: int) -> np.ndarray:
+    """
+    Returns, for every author code, the code of the subfield they appear in
+    most often. Ties go to the subfield the author was first seen in, which is
+    what determine_primary_subfield does on an insertion-ordered dict.
+    """
+    result = np.empty(num_authors, dtype=np.int64)
+    if len(author) == 0:
+        return result
+    num_subfields = int(subfield.max()) + 1
+    keys = author * num_subfields + subfield
+    unique_keys, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    key_author = unique_keys // num_subfields
+    key_subfield = unique_keys % num_subfields
+    # Per author: highest count first, then earliest first appearance
+    order = np.lexsort((first, -counts, key_author))
+    best = np.r_[True, key_author[order][1:] != key_author[order][:-1]]
+    result[key_author[order][best]] = key_subfield[order][best]
+    return result
+
+
+class NetworkArrays(NamedTuple):
+    """
+    Array form of a collaboration network.
+
+    Nodes are in insertion order: node_ids, label1 (country) and label2
+    (primary subfield) are parallel object arrays. Edges are parallel arrays of
+    source/target node indices and weights, also in insertion order.
+    """
+    node_ids: np.ndarray
+    label1: np.ndarray
+    label2: np.ndarray
+    source: np.ndarray
+    target: np.ndarray
+    weight: np.ndarray
+
+
+def build_network_arrays(exploded: pd.DataFrame) -> NetworkArrays:
+    """
+    Computes the nodes and weighted edges of the collaboration network from
+    an exploded authorship table (see explode_publications), without
+    building a NetworkX graph.
+    """
+    # Sorted factorization keeps code order equal to author id string order,
+    # so (min, max) on codes matches tuple(sorted([id1, id2])) on ids
+    author, author_ids = pd.factorize(exploded["author_id"], sort=True)
+    subfield, subfield_names = pd.factorize(exploded["subfield"], use_na_sentinel=False)
+    author = author.astype(np.int64)
+    subfield = subfield.astype(np.int64)
+    pub = exploded["pub"].to_numpy(dtype=np.int64)
+    author_ids = np.asarray(author_ids, dtype=object)
+    subfield_names = np.asarray(subfield_names, dtype=object)
+    # use_na_sentinel=False keeps a missing subfield as NaN; the baseline labels it None
+    subfield_names[pd.isna(subfield_names)] = None
+
+    # Nodes in order of first appearance, with the country of that appearance
+    _, first_rows = np.unique(author, return_index=True)
+    first_rows = np.sort(first_rows)
+    node_codes = author[first_rows]
+    countries = exploded["country"].to_numpy(dtype=object)[first_rows]
+    primary = subfield_names[primary_subfields(author, subfield, len(author_ids))[node_codes]]
+
+    # Re-index edges from author codes to node positions
+    node_index = np.empty(len(author_ids), dtype=np.int64)
+    node_index[node_codes] = np.arange(len(node_codes))
+    u, v, weight = build_edge_arrays(pub, author)
+    return NetworkArrays(
+        author_ids[node_codes], countries, primary, node_index[u], node_index[v], weight
+    )
+
+
+def network_arrays_to_graph(arrays: NetworkArrays) -> nx.Graph:
+    """
+    Builds a NetworkX graph with 'label1'/'label2' node attributes and
+    'weight' edge attributes from network arrays.
+    """
+    node_ids = arrays.node_ids
+    G = nx.Graph()
+    G.add_nodes_from(
+        (author_id, {"label1": country, "label2": label2})
+        for author_id, country, label2 in zip(
+            node_ids.tolist(), arrays.label1.tolist(), arrays.label2.tolist()
+        )
+    )
+    G.add_edges_from(
+        (id1, id2, {"weight": w})
+        for id1, id2, w in zip(
+            node_ids[arrays.source].tolist(),
+            node_ids[arrays.target].tolist(),
+            arrays.weight.tolist(),
+        )
+    )
+    return G
+
+
+def build_network_from_exploded(exploded: pd.DataFrame) -> nx.Graph:
+    """
+    Builds the collaboration network from an exploded authorship table
+    (see explode_publications). Produces the same graph as
+    construct_network.build_network_from_publications, including node and
+    edge insertion order.
+    """
+    return network_arrays_to_graph(build_network_arrays(exploded))
@@ -0,0 +1,344 @@
+import argparse
+import os
+import shutil
+import tempfile
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import run_report
+from construct_network import iter_csv_publications
+from edge_builder import NetworkArrays
+from gexf_stream import write_network_arrays_gexf
+
+UNKNOWN_COUNTRY = "Unknown"
+
+# Default peak memory of the pair buffers and of the merge, in MB
+MAX_MEMORY_MB = 512
+
+# Bytes per buffered pair: key, first occurrence and count (int64 each) plus
+# the workspace np.unique needs to sort and aggregate them
+PAIR_BYTES = 64
+
+# Author codes are packed into one int64 sort key as (low << 32) | high
+KEY_SHIFT = 32
+
+# Rows read from the corpus CSV at a time
+CHUNK_SIZE = 20000
+
+
+def _aggregate(keys: np.ndarray, first: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sums the counts of equal keys, keeping their earliest first occurrence.
+    Returns (keys, first, counts) sorted by key.
+    """
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    summed = np.bincount(inverse, weights=counts, minlength=len(unique_keys)).astype(np.int64)
+    earliest = np.full(len(unique_keys), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(earliest, inverse, first)
+    return unique_keys, earliest, summed
+
+
+class SortedRuns:
+    """
+    External aggregation of (key, first occurrence, count) records.
+
+    Records are buffered until `capacity`, then aggregated, sorted by key
+    and spilled to disk as a run of .npy files. merge() k-way merges the
+    runs: it reads every run in blocks and, at each step, aggregates all
+    records up to the smallest last key of the current blocks (no later
+    block of any run can hold a smaller key), so only one block per run is
+    in memory at a time.
+    """
+
+    def __init__(self, directory: str, name: str, capacity: int):
+        self.directory = directory
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.runs: List[str] = []
+        self._parts: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._buffered = 0
+
+    def add(self, keys: np.ndarray, first: np.ndarray, counts: np.ndarray) -> None:
+        self._parts.append((keys, first, counts))
+        self._buffered += len(keys)
+        if self._buffered >= self.capacity:
+            self.spill()
+
+    def spill(self) -> None:
+        if not self._parts:
+            return
+        keys, first, counts = (np.concatenate(columns) for columns in zip(*self._parts))
+        self._parts = []
+        self._buffered = 0
+        path = os.path.join(self.directory, f"{self.name}_{len(self.runs):05d}")
+        os.makedirs(path)
+        for column, values in zip(("keys", "first", "counts"), _aggregate(keys, first, counts)):
+            np.save(os.path.join(path, f"{column}.npy"), values)
+        self.runs.append(path)
+        run_report.current().count(f"{self.name}_runs")
+
+    def merge(self, block_size: int) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Yields the aggregated records of all runs as (keys, first, counts)
+        blocks, in ascending key order.
+        """
+        self.spill()
+        runs = [
+            tuple(np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r") for column in ("keys", "first", "counts"))
+            for path in self.runs
+        ]
+        runs = [run for run in runs if len(run[0])]
+        positions = [0] * len(runs)
+        block_size = max(1, block_size)
+        while runs:
+            ends = [min(position + block_size, len(run[0])) for run, position in zip(runs, positions)]
+            bound = min(run[0][end - 1] for run, end in zip(runs, ends))
+            parts = []
+            for i, (run, position, end) in enumerate(zip(runs, positions, ends)):
+                # Records of this block up to the bound; the rest waits for the next step
+                stop = position + int(np.searchsorted(run[0][position:end], bound, side="right"))
+                parts.append(tuple(np.asarray(column[position:stop]) for column in run))
+                positions[i] = stop
+            yield _aggregate(*(np.concatenate(columns) for columns in zip(*parts)))
+            kept = [i for i, run in enumerate(runs) if positions[i] < len(run[0])]
+            runs = [runs[i] for i in kept]
+            positions = [positions[i] for i in kept]
+
+
+class ExternalNetworkBuilder:
+    """
+    Builds the collaboration network of a stream of publications with the
+    co-author pairs aggregated on disk instead of in a dictionary.
+
+    While the stream is read, only the author id pool, one country and the
+    node order per author are held in memory. The co-author pairs and the
+    (author, subfield) counts behind the primary subfields are buffered as
+    integer records and spilled as sorted runs (see SortedRuns) whenever
+    the buffers reach `max_memory_mb`; the runs are merged once the stream
+    ends, and the merged edges are sorted back into order of first
+    occurrence through a second set of runs. A single publication whose
+    pairs exceed the budget is still buffered whole.
+
+    The result is a NetworkArrays, so its edge list (source, target and
+    weight, three int64 arrays) must fit in memory; nothing else scales
+    with the number of edges.
+
+    The result equals edge_builder.build_network_arrays on the exploded
+    table of the same publications: same nodes, labels, edges, weights
+    and order.
+    """
+
+    def __init__(self, max_memory_mb: float = MAX_MEMORY_MB, tmp_dir: Optional[str] = None):
+        self.max_memory_mb = max_memory_mb
+        self.capacity = int(max_memory_mb * 1024 * 1024 / PAIR_BYTES)
+        self.directory = tempfile.mkdtemp(prefix="external_network_", dir=tmp_dir)
+        self.pairs = SortedRuns(self.directory, "pairs", self.capacity)
+        self.author_subfields = SortedRuns(self.directory, "author_subfields", self.capacity)
+        self.author_codes: Dict[str, int] = {}
+        self.author_countries = array("i")
+        self.countries: Dict[str, int] = {}
+        self.subfields: Dict[Optional[str], int] = {}
+        self.rows = 0
+        self.pair_ordinal = 0
+        self._batch_pub: List[int] = []
+        self._batch_authors: List[int] = []
+        self._batch_subfields: List[int] = []
+        self._batch_pairs = 0
+        self._pubs = 0
+
+    def add(self, authors: List[Dict], subfield_name: Optional[str]) -> None:
+        """
+        Adds one publication (an author list and its subfield name).
+        """
+        subfield = self.subfields.setdefault(subfield_name, len(self.subfields))
+        codes = []
+        for author in authors:
+            author_id = author.get("id")
+            if not author_id:
+                continue
+            code = self.author_codes.get(author_id)
+            if code is None:
+                code = self.author_codes[author_id] = len(self.author_codes)
+                countries = author.get("countries", [])
+                country = countries[0] if countries else UNKNOWN_COUNTRY
+                self.author_countries.append(self.countries.setdefault(country, len(self.countries)))
+            codes.append(code)
+        self._batch_pub.extend([self._pubs] * len(codes))
+        self._batch_authors.extend(codes)
+        self._batch_subfields.extend([subfield] * len(codes))
+        self._batch_pairs += len(codes) * (len(codes) - 1) // 2
+        self._pubs += 1
+        if self._batch_pairs + len(self._batch_authors) >= self.capacity:
+            self._flush()
+
+    def _flush(self) -> None:
+        """
+        Hands the buffered authorships to the (author, subfield) runs and
+        expands them into co-author pairs, numbered in the order
+        itertools.combinations produces them, for the pair runs.
+        """
+        if not self._batch_authors:
+            return
+        pub = np.asarray(self._batch_pub, dtype=np.int64)
+        author = np.asarray(self._batch_authors, dtype=np.int64)
+        self.author_subfields.add(
+            (author << KEY_SHIFT) | np.asarray(self._batch_subfields, dtype=np.int64),
+            np.arange(self.rows, self.rows + len(author), dtype=np.int64),
+            np.ones(len(author), dtype=np.int64),
+        )
+        self.rows += len(author)
+
+        starts = np.flatnonzero(np.r_[True, pub[1:] != pub[:-1]])
+        sizes = np.diff(np.r_[starts, len(pub)])
+        num_pairs = sizes * (sizes - 1) // 2
+        pair_offsets = self.pair_ordinal + np.r_[0, np.cumsum(num_pairs)[:-1]]
+        for k in np.unique(sizes[sizes >= 2]):
+            selected = np.flatnonzero(sizes == k)
+            codes = author[starts[selected][:, None] + np.arange(k)]
+            i, j = np.triu_indices(k, 1)
+            u, v = codes[:, i].ravel(), codes[:, j].ravel()
+            self.pairs.add(
+                (np.minimum(u, v) << KEY_SHIFT) | np.maximum(u, v),
+                (pair_offsets[selected][:, None] + np.arange(len(i))).ravel(),
+                np.ones(len(u), dtype=np.int64),
+            )
+        self.pair_ordinal += int(num_pairs.sum())
+        self._batch_pub, self._batch_authors, self._batch_subfields = [], [], []
+        self._batch_pairs = 0
+
+    def _primary_subfields(self, block_size: int) -> np.ndarray:
+        """
+        Returns the primary subfield code of every author: highest count,
+        then the subfield the author was first seen in.
+        """
+        num_authors = len(self.author_codes)
+        best = np.full(num_authors, -1, dtype=np.int64)
+        best_count = np.zeros(num_authors, dtype=np.int64)
+        best_first = np.full(num_authors, np.iinfo(np.int64).max, dtype=np.int64)
+        mask = (1 << KEY_SHIFT) - 1
+        for keys, first, counts in self.author_subfields.merge(block_size):
+            authors = keys >> KEY_SHIFT
+            subfields = keys & mask
+            # An author's keys are contiguous but may span blocks, so compare with the best so far
+            order = np.lexsort((first, -counts, authors))
+            authors, subfields, first, counts = authors[order], subfields[order], first[order], counts[order]
+            head = np.r_[True, authors[1:] != authors[:-1]]
+            authors, subfields, first, counts = authors[head], subfields[head], first[head], counts[head]
+            better = (counts > best_count[authors]) | ((counts == best_count[authors]) & (first < best_first[authors]))
+            authors, subfields, first, counts = authors[better], subfields[better], first[better], counts[better]
+            best[authors] = subfields
+            best_count[authors] = counts
+            best_first[authors] = first
+        return best
+
+    def finish(self) -> NetworkArrays:
+        """
+        Merges the spilled runs and returns the network. Temporary files are
+        removed.
+        """
+        try:
+            self._flush()
+            num_runs = max(1, len(self.pairs.runs) + 1, len(self.author_subfields.runs) + 1)
+            block_size = self.capacity // num_runs
+            node_ids = np.array(list(self.author_codes), dtype=object)
+            country_names = np.array(list(self.countries), dtype=object)
+            subfield_names = np.array(list(self.subfields), dtype=object)
+            labels1 = country_names[np.frombuffer(self.author_countries, dtype=np.int32)] if len(node_ids) else np.empty(0, dtype=object)
+            labels2 = subfield_names[self._primary_subfields(block_size)] if len(node_ids) else np.empty(0, dtype=object)
+
+            # Merged edges are re-spilled keyed by first occurrence (unique per edge)
+            edges = SortedRuns(self.directory, "edges", self.capacity)
+            num_edges = 0
+            with run_report.stage("pair_merge"):
+                for keys, first, counts in self.pairs.merge(block_size):
+                    edges.add(first, keys, counts)
+                    num_edges += len(keys)
+
+            # Edges in order of first occurrence, the source being the smaller author id
+            source = np.empty(num_edges, dtype=np.int64)
+            target = np.empty(num_edges, dtype=np.int64)
+            weight = np.empty(num_edges, dtype=np.int64)
+            mask = (1 << KEY_SHIFT) - 1
+            position = 0
+            with run_report.stage("edge_order"):
+                for _, keys, counts in edges.merge(self.capacity // (len(edges.runs) + 2)):
+                    end = position + len(keys)
+                    low, high = keys >> KEY_SHIFT, keys & mask
+                    swap = node_ids[low] > node_ids[high]
+                    source[position:end] = np.where(swap, high, low)
+                    target[position:end] = np.where(swap, low, high)
+                    weight[position:end] = counts
+                    position = end
+            return NetworkArrays(node_ids, labels1, labels2, source, target, weight)
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def build_network_arrays_external(
+    publications: Iterable[Tuple[List[Dict], Optional[str]]],
+    max_memory_mb: float = MAX_MEMORY_MB,
+    tmp_dir: Optional[str] = None,
+    author_remap: Optional[Dict[str, str]] = None,
+) -> NetworkArrays:
+    """
+    Builds the collaboration network of (authors, subfield_name) pairs
+    (see construct_network.iter_csv_publications) out of core, with about
+    `max_memory_mb` of pair buffers. With an `author_remap` (see
+    author_disambiguation), merged ids are replaced by their canonical id
+    and an author listed twice on a work after the remap is kept once.
+    """
+    builder = ExternalNetworkBuilder(max_memory_mb, tmp_dir)
+    for authors, subfield_name in publications:
+        if author_remap:
+            authors = _remap_authors(authors, author_remap)
+        builder.add(authors, subfield_name)
+    return builder.finish()
+
+
+def _remap_authors(authors: List[Dict], remap: Dict[str, str]) -> List[Dict]:
+    remapped, seen = [], set()
+    for author in authors:
+        author_id = author.get("id")
+        if author_id:
+            author_id = remap.get(author_id, author_id)
+            if author_id in seen:
+                continue
+            seen.add(author_id)
+            author = {**author, "id": author_id}
+        remapped.append(author)
+    return remapped
+
+
+def iter_csv_chunks(csv_file: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[List[Dict], Optional[str]]]:
+    """
+    Streams (authors, subfield_name) from the corpus CSV chunk by chunk.
+    """
+    for chunk in pd.read_csv(csv_file, usecols=["authorships", "subfield"], chunksize=chunk_size):
+        yield from iter_csv_publications(chunk)
+
+
+def main(csv_file: str, output_file: str, max_memory_mb: float, tmp_dir: Optional[str] = None):
+    report = run_report.start_run("external_network")
+    try:
+        with report.stage("edge_building"):
+            network = build_network_arrays_external(iter_csv_chunks(csv_file), max_memory_mb, tmp_dir)
+        report.count("nodes", len(network.node_ids))
+        report.count("edges", len(network.weight))
+        with report.stage("gexf_write"):
+            write_network_arrays_gexf(network, output_file)
+        print(f"Graph successfully written to {output_file}: {len(network.node_ids)} nodes, {len(network.weight)} edges")
+    finally:
+        print(f"Run report written to {run_report.finish_run()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the collaboration network of a corpus larger than RAM.")
+    parser.add_argument("csv_file", nargs="?", default="../data/csv/openalex/br_publications.csv")
+    parser.add_argument("--output", default="../data/graphs/collabnet.gexf", help="GEXF file to write")
+    parser.add_argument("--max-memory-mb", type=float, default=MAX_MEMORY_MB, help="peak memory of the pair buffers")
+    parser.add_argument("--tmp-dir", help="directory for the spilled runs (default: the system temp dir)")
+    args = parser.parse_args()
+    main(args.csv_file, args.output, args.max_memory_mb, args.tmp_dir)
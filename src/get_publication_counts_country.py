@@ -1,6 +1,11 @@
-import requests
+import argparse
+import logging
 import csv
-from time import sleep
+
+from openalex_client import OpenAlexClient
+from openalex_counts import collect_counts
+from openalex_fetcher import OPENALEX_WORKS_URL
+import run_report
 
 COUNTRY_CODES = [
     "CN",
@@ -20,50 +25,57 @@ COUNTRY_CODES = [
     "AU",
 ]
 
+WORKS_FILTER = (
+    "primary_topic.field.id:fields/17,publication_year:2019 - 2024,type:types/article|types/book-chapter"
+)
 
-def get_count(url):
-    """Makes a GET request to the given URL and returns the count from the response metadata."""
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
 
-        total_publications = data.get("meta", {}).get("count", 0)
-        citations_count = data.get("meta", {}).get("cited_by_count_sum", 0)
+def make_row(rank, country, total_publications, citations_count):
+    return {
+        "rank": rank,
+        "country": country,
+        "total_publications": total_publications,
+        "citation_count": citations_count,
+        # ration two decimal places
+        "ratio": round(citations_count / total_publications, 2) if total_publications > 0 else 0,
+    }
 
-        return total_publications, citations_count
-    except Exception as e:
-        print(f"Error fetching data from {url}: {e}")
-        return 0
 
+def collect_country_counts(url=OPENALEX_WORKS_URL, session=None):
+    """
+    Requests the counts of every country in COUNTRY_CODES, one query per
+    country, run concurrently under a shared rate limiter (see
+    openalex_counts.collect_counts). Raises if any country's count failed.
+    """
+    logger = logging.getLogger(__name__)
+    cell_params = {
+        country: {"filter": f"{WORKS_FILTER},authorships.countries:{country}"}
+        for country in COUNTRY_CODES
+    }
+    counts = collect_counts(cell_params, logger, url=url, session=session)
 
-def main():
-    results = []
-    rank = 1
+    failed = [country for country in COUNTRY_CODES if country not in counts]
+    if failed:
+        raise RuntimeError(f"Could not fetch the counts of {', '.join(failed)}")
 
-    for country in COUNTRY_CODES:
-        # Build the API endpoint using the country code
-        works_url = (
-            f"https://api.openalex.org/works?page=1&"
-            f"filter=primary_topic.field.id:fields/17,publication_year:2019+-+2024,type:types/article|types/book-chapter,"
-            f"authorships.countries:{country}&cited_by_count_sum=true&per_page=1"
-        )
-
-        total_publications, citations_count = get_count(works_url)
+    results = []
+    for rank, country in enumerate(COUNTRY_CODES, start=1):
+        total_publications, citations_count = counts[country]
+        results.append(make_row(rank, country, total_publications, citations_count))
+    return results
 
-        results.append(
-            {
-                "rank": rank,
-                "country": country,
-                "total_publications": total_publications,
-                "citation_count": citations_count,
-                # ration two decimal places
-                "ratio": round(citations_count / total_publications, 2) if total_publications > 0 else 0,
-            }
-        )
 
-        rank += 1
-        sleep(1)
+def main(use_cache=True, profile=None):
+    run_report.start_run("publication_counts_country", profile)
+    client = OpenAlexClient(use_cache=use_cache)
+    try:
+        with run_report.stage("collect_counts"):
+            results = collect_country_counts(session=client)
+    finally:
+        hits, misses = client.stats()
+        print(f"HTTP cache: {hits} hits, {misses} misses")
+        client.close()
+        print(f"Run report written to {run_report.finish_run()}")
 
     # Sort the results by total publications (descending order)
     results.sort(key=lambda x: x["total_publications"], reverse=True)
@@ -83,4 +95,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Fetch publication counts per country.")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the on-disk response cache")
+    parser.add_argument("--profile", choices=run_report.PROFILERS, help="profile the run into the run report")
+    args = parser.parse_args()
+    main(use_cache=not args.no_cache, profile=args.profile)
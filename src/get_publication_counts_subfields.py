@@ -1,9 +1,13 @@
-import requests
+import argparse
 import pandas as pd
 import json
 import logging
-import time
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from openalex_client import OpenAlexClient
+from openalex_counts import collect_counts
+from openalex_fetcher import OPENALEX_WORKS_URL
+import run_report
 
 COUNTRY_CODE = "IN"  
 
@@ -55,26 +59,77 @@ def setup_logging(log_file: str = "open_alex_publications.log") -> None:
     console_handler.setFormatter(console_formatter)
     logger.addHandler(console_handler)
 
-def fetch_publication_count(params: Dict, logger: logging.Logger) -> int:
+def build_filter_query(year: str, subfield_id: Optional[str] = None, country_code: str = COUNTRY_CODE) -> str:
+    """
+    Builds the works filter of one year, restricted to one subfield when given.
     """
-    Sends a query to the OpenAlex API with minimal data (per_page=1) and returns the total count
-    of works from the meta section of the response.
+    # Adjust the filter as needed. Here, we assume primary_topic.field.id is 17.
+    filter_query = (
+        f"type:types/article|types/book-chapter,"
+        f"institutions.country_code:{country_code},"
+        f"primary_topic.field.id:17,"
+    )
+    if subfield_id is not None:
+        filter_query += f"primary_topic.subfield.id:{subfield_id},"
+    return filter_query + f"publication_year:{year}"
+
+def collect_counts_per_cell(
+    subfields_df: pd.DataFrame,
+    email: str,
+    logger: logging.Logger,
+    url: str = OPENALEX_WORKS_URL,
+    session=None,
+    country_code: str = COUNTRY_CODE,
+) -> List[Dict]:
     """
-    url = "https://api.openalex.org/works"
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
-    count = data.get("meta", {}).get("count", 0)
-    citation_count = data.get("meta", {}).get("cited_by_count_sum", 0)
-    return count, citation_count
-
-def main():
+    Requests the count and citation sum of every year x subfield cell, one
+    query per cell, run concurrently under a shared rate limiter (see
+    openalex_counts.collect_counts). Cells whose count failed are logged
+    and left out.
     """
-    Main function to fetch publication counts per subfield and year for a specific country,
-    and save the results to a CSV.
+    subfield_ids = subfields_df["subfield_id"].tolist()
+    cell_params = {
+        (year, subfield_id): {
+            "select": "id",  # Only need the id field
+            "filter": build_filter_query(year, subfield_id, country_code),
+            "mailto": email,
+        }
+        for year in PUBLICATION_YEAR
+        for subfield_id in subfield_ids
+    }
+    counts = collect_counts(cell_params, logger, url=url, session=session)
+
+    results_list = []
+    for year in PUBLICATION_YEAR:
+        for _, row in subfields_df.iterrows():
+            subfield_id = row["subfield_id"]
+            if (year, subfield_id) not in counts:
+                logger.error(f"No count for year {year}, subfield {subfield_id}; leaving it out")
+                continue
+            count, citation_count = counts[(year, subfield_id)]
+            logger.info(f"Year {year}, subfield {subfield_id} ({row['subfield_display_name']}): count = {count}, citation_count = {citation_count}")
+            results_list.append({
+                "publication_year": year,
+                "subfield_id": subfield_id,
+                "subfield_display_name": row["subfield_display_name"],
+                "count": count,
+                "citation_count": citation_count,
+            })
+    return results_list
+
+def main(
+    use_cache: bool = True,
+    country_codes: Optional[List[str]] = None,
+    profile: Optional[str] = None,
+):
+    """
+    Main function to fetch publication counts per subfield and year for each
+    country (COUNTRY_CODE by default), saving one CSV per country.
     """
     setup_logging()
     logger = logging.getLogger(__name__)
+    run_report.start_run("publication_counts_subfields", profile)
+    client = OpenAlexClient(use_cache=use_cache)
 
     try:
         email = read_email_from_json()
@@ -86,54 +141,31 @@ def main():
             logger.error("No subfields loaded from unique_subfields.csv. Exiting.")
             return
 
-        results_list = []
-
-        # Iterate over each publication year and each subfield.
-        for year in PUBLICATION_YEAR:
-            for _, row in subfields_df.iterrows():
-                subfield_id = row["subfield_id"]
-                subfield_display_name = row["subfield_display_name"]
-
-                # Build filter query string.
-                # Adjust the filter as needed. Here, we assume primary_topic.field.id is 17.
-                filter_query = (
-                    f"type:types/article|types/book-chapter,"
-                    f"institutions.country_code:{COUNTRY_CODE},"
-                    f"primary_topic.field.id:17,"
-                    f"primary_topic.subfield.id:{subfield_id},"
-                    f"publication_year:{year}"
+        for country_code in country_codes or [COUNTRY_CODE]:
+            with run_report.stage("collect_counts"):
+                results_list = collect_counts_per_cell(
+                    subfields_df, email, logger, session=client, country_code=country_code
                 )
-                params = {
-                    "select": "id",  # Only need the id field
-                    "filter": filter_query,
-                    "per_page": 1,  # Minimal result; we use the meta for the count,
-                    "cited_by_count_sum": "true",  # Include citation count
-                    "mailto": email,
-                }
-                try:
-                    count, citation_count = fetch_publication_count(params, logger)
-                    logger.info(f"Year {year}, subfield {subfield_id} ({subfield_display_name}): count = {count}, citation_count = {citation_count}")
-                    results_list.append({
-                        "publication_year": year,
-                        "subfield_id": subfield_id,
-                        "subfield_display_name": subfield_display_name,
-                        "count": count,
-                        "citation_count": citation_count,
-                    })
-                    time.sleep(5)  # Delay between requests to be respectful
-                except Exception as e:
-                    logger.error(f"Error fetching count for year {year}, subfield {subfield_id}: {e}")
-
-        # Create DataFrame from results and save to CSV.
-        results_df = pd.DataFrame(results_list)
-        results_df["country_code"] = COUNTRY_CODE
-        output_csv = f"../data/csv/publication_counts_{COUNTRY_CODE}.csv"
-        results_df.to_csv(output_csv, index=False)
-        logger.info(f"Saved publication counts to {output_csv}")
+
+            # Create DataFrame from results and save to CSV.
+            results_df = pd.DataFrame(results_list)
+            results_df["country_code"] = country_code
+            output_csv = f"../data/csv/publication_counts_{country_code}.csv"
+            results_df.to_csv(output_csv, index=False)
+            logger.info(f"Saved publication counts to {output_csv}")
 
     except Exception as e:
         logger.error(f"Script failed: {e}")
         raise
+    finally:
+        client.log_stats(logger)
+        client.close()
+        logger.info(f"Run report written to {run_report.finish_run()}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Fetch publication counts per subfield and year.")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the on-disk response cache")
+    parser.add_argument("--countries", nargs="+", default=[COUNTRY_CODE], help="ISO country codes")
+    parser.add_argument("--profile", choices=run_report.PROFILERS, help="profile the run into the run report")
+    args = parser.parse_args()
+    main(use_cache=not args.no_cache, country_codes=args.countries, profile=args.profile)
@@ -0,0 +1,226 @@
+import datetime
+import xml.etree.ElementTree as ET
+from typing import Iterable, Iterator, Tuple
+
+import networkx as nx
+import numpy as np
+
+from edge_builder import NetworkArrays
+
+GEXF_NAMESPACE = "http://www.gexf.net/1.2draft"
+
+GEXF_HEADER = (
+    "<?xml version='1.0' encoding='utf-8'?>\n"
+    '<gexf xmlns="http://www.gexf.net/1.2draft" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.gexf.net/1.2draft http://www.gexf.net/1.2draft/gexf.xsd" '
+    'version="1.2">\n'
+    '  <meta lastmodifieddate="{date}">\n'
+    "    <creator>br_collaboration_network gexf_stream</creator>\n"
+    "  </meta>\n"
+    '  <graph defaultedgetype="undirected" mode="static" name="">\n'
+)
+
+NODE_ATTRIBUTES = (
+    '    <attributes mode="static" class="node">\n'
+    '      <attribute id="0" title="label1" type="string" />\n'
+    '      <attribute id="1" title="label2" type="string" />\n'
+    "    </attributes>\n"
+)
+
+NODE_TEMPLATE = (
+    '      <node id="{id}" label="{id}">\n'
+    "        <attvalues>\n"
+    '          <attvalue for="0" value="{label1}" />\n'
+    '          <attvalue for="1" value="{label2}" />\n'
+    "        </attvalues>\n"
+    "      </node>\n"
+)
+
+EDGE_TEMPLATE = '      <edge source="{source}" target="{target}" id="{id}" weight="{weight}" />\n'
+
+# Buffered lines are flushed to disk in batches of this many
+WRITE_BATCH = 10000
+
+
+def _escape(value) -> str:
+    """
+    Escapes an XML attribute value the same way ElementTree does.
+    """
+    text = str(value)
+    if any(c in text for c in '&<>"\n\r\t'):
+        text = (
+            text.replace("&", "&amp;")
+            .replace("<", "&lt;")
+            .replace(">", "&gt;")
+            .replace('"', "&quot;")
+            .replace("\r", "&#13;")
+            .replace("\n", "&#10;")
+            .replace("\t", "&#09;")
+        )
+    return text
+
+
+def write_gexf_stream(
+    path: str,
+    nodes: Iterable[Tuple[str, str, str]],
+    edges: Iterable[Tuple[str, str, object]],
+) -> None:
+    """
+    Writes an undirected GEXF 1.2 file from streams of nodes and edges.
+
+    Parameters:
+      nodes: (id, label1, label2) tuples.
+      edges: (source id, target id, weight) tuples.
+
+    Nothing is kept in memory beyond a small write buffer. The layout matches
+    nx.write_gexf for graphs with 'label1'/'label2' node attributes and a
+    'weight' edge attribute, so Gephi and nx.read_gexf read the output as
+    they read the existing files.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(GEXF_HEADER.format(date=datetime.date.today().isoformat()))
+
+        nodes = iter(nodes)
+        first = next(nodes, None)
+        if first is None:
+            f.write("    <nodes />\n")
+        else:
+            f.write(NODE_ATTRIBUTES)
+            f.write("    <nodes>\n")
+            buffer = []
+            for node_id, label1, label2 in _prepend(first, nodes):
+                buffer.append(NODE_TEMPLATE.format(
+                    id=_escape(node_id), label1=_escape(label1), label2=_escape(label2)
+                ))
+                if len(buffer) >= WRITE_BATCH:
+                    f.write("".join(buffer))
+                    buffer = []
+            f.write("".join(buffer))
+            f.write("    </nodes>\n")
+
+        edges = iter(edges)
+        first = next(edges, None)
+        if first is None:
+            f.write("    <edges />\n")
+        else:
+            f.write("    <edges>\n")
+            buffer = []
+            for edge_id, (source, target, weight) in enumerate(_prepend(first, edges)):
+                buffer.append(EDGE_TEMPLATE.format(
+                    source=_escape(source), target=_escape(target), id=edge_id, weight=weight
+                ))
+                if len(buffer) >= WRITE_BATCH:
+                    f.write("".join(buffer))
+                    buffer = []
+            f.write("".join(buffer))
+            f.write("    </edges>\n")
+
+        f.write("  </graph>\n</gexf>\n")
+
+
+def _prepend(first, rest: Iterator) -> Iterator:
+    yield first
+    yield from rest
+
+
+def adjacency_edge_order(arrays: NetworkArrays) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns (source, target, weight) in the order G.edges() iterates the
+    equivalent NetworkX graph: grouped by the endpoint added first as a node,
+    then by edge insertion order, with that endpoint as the source.
+    """
+    first = np.minimum(arrays.source, arrays.target)
+    second = np.maximum(arrays.source, arrays.target)
+    order = np.argsort(first, kind="stable")
+    return first[order], second[order], arrays.weight[order]
+
+
+def write_network_arrays_gexf(arrays: NetworkArrays, path: str) -> None:
+    """
+    Writes network arrays (see edge_builder.build_network_arrays) to GEXF,
+    in the same node and edge order nx.write_gexf would use for the graph.
+    """
+    node_ids = arrays.node_ids
+    source, target, weight = adjacency_edge_order(arrays)
+    write_gexf_stream(
+        path,
+        zip(node_ids, arrays.label1, arrays.label2),
+        zip(node_ids[source], node_ids[target], weight.tolist()),
+    )
+
+
+def write_graph_gexf(G: nx.Graph, path: str) -> None:
+    """
+    Writes a collaboration graph built by construct_network to GEXF.
+    """
+    write_gexf_stream(
+        path,
+        ((node, data.get("label1"), data.get("label2")) for node, data in G.nodes(data=True)),
+        ((u, v, data.get("weight", 1)) for u, v, data in G.edges(data=True)),
+    )
+
+
+def iter_gexf(path: str) -> Iterator[Tuple]:
+    """
+    Incrementally parses a GEXF file, yielding
+      ("node", id, label, attributes) and
+      ("edge", source, target, edge id, weight)
+    tuples in file order. Parsed elements are cleared as soon as they have
+    been yielded, so memory stays bounded on large files.
+    """
+    node_tag = f"{{{GEXF_NAMESPACE}}}node"
+    edge_tag = f"{{{GEXF_NAMESPACE}}}edge"
+    attribute_tag = f"{{{GEXF_NAMESPACE}}}attribute"
+    attvalue_tag = f"{{{GEXF_NAMESPACE}}}attvalue"
+    nodes_tag = f"{{{GEXF_NAMESPACE}}}nodes"
+    edges_tag = f"{{{GEXF_NAMESPACE}}}edges"
+
+    titles = {}
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    parent = root
+    for event, element in context:
+        if event == "start":
+            if element.tag in (nodes_tag, edges_tag):
+                parent = element
+            continue
+        if element.tag == attribute_tag:
+            titles[element.get("id")] = element.get("title")
+        elif element.tag == node_tag:
+            attributes = {
+                titles.get(value.get("for"), value.get("for")): value.get("value")
+                for value in element.iter(attvalue_tag)
+            }
+            yield "node", element.get("id"), element.get("label"), attributes
+            parent.remove(element)
+        elif element.tag == edge_tag:
+            weight = element.get("weight")
+            yield (
+                "edge",
+                element.get("source"),
+                element.get("target"),
+                element.get("id"),
+                float(weight) if weight is not None else None,
+            )
+            parent.remove(element)
+
+
+def read_gexf_stream(path: str) -> nx.Graph:
+    """
+    Loads a collaboration network GEXF file with iterparse. For files in the
+    construct_network schema the graph matches nx.read_gexf: nodes carry
+    'label1', 'label2' and 'label', edges carry 'id' and a float 'weight'.
+    """
+    G = nx.Graph(mode="static", node_default={}, edge_default={})
+    for item in iter_gexf(path):
+        if item[0] == "node":
+            _, node_id, label, attributes = item
+            G.add_node(node_id, **attributes, label=label)
+        else:
+            _, source, target, edge_id, weight = item
+            data = {"id": edge_id}
+            if weight is not None:
+                data["weight"] = weight
+            G.add_edge(source, target, **data)
+    return G
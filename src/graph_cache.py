@@ -0,0 +1,172 @@
+import json
+import os
+from typing import Dict, Optional
+
+import networkx as nx
+import numpy as np
+
+from edge_builder import NetworkArrays
+
+CSR_CACHE_DIR = "../data/graphs/csr"
+
+META_FILE = "meta.json"
+ARRAY_FILES = ("offsets", "indices", "weights", "node_ids", "label1", "label2")
+
+
+def _encode_labels(values: np.ndarray):
+    """
+    Dictionary-encodes an object array of labels into int32 codes and a value list.
+    """
+    codes = {}
+    encoded = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values.tolist()):
+        encoded[i] = codes.setdefault(value, len(codes))
+    return encoded, list(codes)
+
+
+def write_csr_cache(arrays: NetworkArrays, directory: str) -> None:
+    """
+    Writes a network as a symmetric CSR adjacency structure of .npy files:
+
+      offsets.npy   int64, n + 1 row offsets
+      indices.npy   int32, neighbor node indices
+      weights.npy   int64, edge weights
+      node_ids.npy  fixed-width unicode node ids
+      label1.npy / label2.npy  int32 codes into the label lists in meta.json
+
+    Every undirected edge is stored in both rows; self-loops are stored once,
+    on the diagonal, as in nx.to_scipy_sparse_array.
+    """
+    os.makedirs(directory, exist_ok=True)
+    num_nodes = len(arrays.node_ids)
+
+    loops = arrays.source == arrays.target
+    rows = np.concatenate([arrays.source, arrays.target[~loops]])
+    cols = np.concatenate([arrays.target, arrays.source[~loops]])
+    weights = np.concatenate([arrays.weight, arrays.weight[~loops]])
+    order = np.lexsort((cols, rows))
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=offsets[1:])
+
+    label1, label1_values = _encode_labels(arrays.label1)
+    label2, label2_values = _encode_labels(arrays.label2)
+    node_ids = arrays.node_ids.astype(str) if num_nodes else np.empty(0, dtype="<U1")
+
+    np.save(os.path.join(directory, "offsets.npy"), offsets)
+    np.save(os.path.join(directory, "indices.npy"), cols[order].astype(np.int32))
+    np.save(os.path.join(directory, "weights.npy"), weights[order].astype(np.int64))
+    np.save(os.path.join(directory, "node_ids.npy"), node_ids)
+    np.save(os.path.join(directory, "label1.npy"), label1)
+    np.save(os.path.join(directory, "label2.npy"), label2)
+    with open(os.path.join(directory, META_FILE), "w") as f:
+        json.dump({
+            "num_nodes": num_nodes,
+            "num_edges": len(arrays.weight),
+            "label1": label1_values,
+            "label2": label2_values,
+        }, f)
+
+
+class CSRGraph:
+    """
+    Read-only view of a cached collaboration network.
+
+    The arrays are memory-mapped, so loading is nearly free and worker
+    processes reading the same cache share the page cache instead of
+    holding private copies.
+    """
+
+    def __init__(self, directory: str, mmap: bool = True):
+        mmap_mode = "r" if mmap else None
+        for name in ARRAY_FILES:
+            setattr(self, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode))
+        with open(os.path.join(directory, META_FILE), "r") as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.label1_values = meta["label1"]
+        self.label2_values = meta["label2"]
+        self._num_edges = meta["num_edges"]
+
+    def number_of_nodes(self) -> int:
+        return len(self.offsets) - 1
+
+    def number_of_edges(self) -> int:
+        return self._num_edges
+
+    def neighbors(self, node: int) -> np.ndarray:
+        """
+        Returns the neighbor indices of the node at index `node`.
+        """
+        return self.indices[self.offsets[node]:self.offsets[node + 1]]
+
+    def degree(self) -> np.ndarray:
+        """
+        Returns the degree of every node, counting self-loops twice as NetworkX does.
+        """
+        degree = np.diff(self.offsets)
+        rows = np.repeat(np.arange(self.number_of_nodes()), degree)
+        loops = rows[rows == self.indices]
+        np.add.at(degree, loops, 1)
+        return degree
+
+    def labels(self, attribute: str) -> np.ndarray:
+        """
+        Decodes the 'label1' or 'label2' node attribute into an object array.
+        """
+        values = np.array(getattr(self, f"{attribute}_values"), dtype=object)
+        return values[getattr(self, attribute)] if len(values) else np.empty(0, dtype=object)
+
+    def to_scipy(self):
+        """
+        Returns the weighted adjacency matrix as a scipy.sparse CSR matrix
+        sharing the memory-mapped buffers.
+        """
+        from scipy.sparse import csr_matrix
+
+        n = self.number_of_nodes()
+        return csr_matrix((self.weights, self.indices, self.offsets), shape=(n, n))
+
+    def to_networkx(self) -> nx.Graph:
+        """
+        Builds the equivalent NetworkX graph (node order is preserved).
+        """
+        G = nx.Graph()
+        node_ids = self.node_ids.tolist()
+        G.add_nodes_from(
+            (node_id, {"label1": label1, "label2": label2})
+            for node_id, label1, label2 in zip(
+                node_ids, self.labels("label1").tolist(), self.labels("label2").tolist()
+            )
+        )
+        rows = np.repeat(np.arange(self.number_of_nodes()), np.diff(self.offsets))
+        upper = rows <= self.indices
+        G.add_edges_from(
+            (node_ids[u], node_ids[v], {"weight": w})
+            for u, v, w in zip(
+                rows[upper].tolist(), self.indices[upper].tolist(), self.weights[upper].tolist()
+            )
+        )
+        return G
+
+
+def load_csr_cache(directory: str, mmap: bool = True) -> CSRGraph:
+    """
+    Loads a graph written by write_csr_cache.
+    """
+    return CSRGraph(directory, mmap=mmap)
+
+
+def load_all_csr_caches(root: str = CSR_CACHE_DIR, mmap: bool = True) -> Dict[str, CSRGraph]:
+    """
+    Loads every cached graph under `root`, keyed by directory name
+    (e.g. 'Software_2019').
+    """
+    return {
+        name: CSRGraph(os.path.join(root, name), mmap=mmap)
+        for name in sorted(os.listdir(root))
+        if os.path.exists(os.path.join(root, name, META_FILE))
+    }
+
+
+def csr_cache_path(subfield: str, year: int, root: Optional[str] = None) -> str:
+    return os.path.join(root or CSR_CACHE_DIR, f"{subfield}_{year}")
@@ -0,0 +1,197 @@
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from construct_network import SUBFIELDS, YEARS
+from gexf_stream import read_gexf_stream
+from graph_cache import csr_cache_path, load_csr_cache
+
+GRAPHS_DIR = "../data/graphs/subfields"
+# Checked-in table; some of its graphs are not in the tree, so it is never overwritten
+CENTRALIZATION_CSV = "../data/csv/centralization.csv"
+
+# Where regenerated tables are written by default
+OUTPUT_DIR = "../data/csv/computed"
+
+# Failure probability used when deriving the sample size from an error bound
+DEFAULT_DELTA = 0.1
+
+
+def betweenness_sample_size(num_nodes: int, epsilon: float, delta: float = DEFAULT_DELTA) -> int:
+    """
+    Number of source nodes to sample so every normalized betweenness value is
+    within `epsilon` of the exact one with probability at least 1 - delta
+    (Hoeffding bound with a union bound over all nodes).
+    """
+    if num_nodes <= 2:
+        return num_nodes
+    return math.ceil(math.log(2 * num_nodes / delta) / (2 * epsilon ** 2))
+
+
+def betweenness_centralization(G, epsilon: Optional[float] = None, delta: float = DEFAULT_DELTA, seed: int = 0):
+    """
+    Calculate the betweenness centralization of a graph: the sum of differences
+    between the maximum normalized betweenness and every node's betweenness,
+    divided by its star-graph maximum (n - 1).
+
+    When epsilon is given and the derived sample size is smaller than the
+    graph, betweenness is approximated from that many sampled source nodes.
+    """
+    n = G.number_of_nodes()
+    k = betweenness_sample_size(n, epsilon, delta) if epsilon else None
+    if k is not None and k < n:
+        betweenness_dict = nx.betweenness_centrality(G, k=k, normalized=True, seed=seed)
+    else:
+        betweenness_dict = nx.betweenness_centrality(G, normalized=True)
+
+    max_centrality = max(betweenness_dict.values()) if betweenness_dict else 0
+    sum_of_differences = sum(
+        max_centrality - centrality for centrality in betweenness_dict.values()
+    )
+
+    if n <= 2:
+        return 0.0  # Centralization is undefined for graphs with 1 or 2 nodes
+
+    return sum_of_differences / (n - 1)
+
+
+def load_graph(subfield: str, year: int, source: str = "gexf") -> nx.Graph:
+    """
+    Loads a subfield/year network from its GEXF file or from the CSR cache.
+    """
+    if source == "csr":
+        return load_csr_cache(csr_cache_path(subfield, year)).to_networkx()
+    return read_gexf_stream(os.path.join(GRAPHS_DIR, f"{subfield}_{year}.gexf"))
+
+
+def graph_metrics(G: nx.Graph, epsilon: Optional[float] = None, delta: float = DEFAULT_DELTA) -> Dict:
+    """
+    Computes degree, betweenness centralization, clustering and component
+    statistics of one graph, with the time spent on each.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    degrees = np.array([d for _, d in G.degree()], dtype=float)
+    timings["degree_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    centralization = betweenness_centralization(G, epsilon=epsilon, delta=delta)
+    timings["betweenness_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    clustering = nx.average_clustering(G) if len(G) else 0.0
+    timings["clustering_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    components = [len(c) for c in nx.connected_components(G)]
+    timings["components_seconds"] = time.perf_counter() - start
+
+    return {
+        "nodes": G.number_of_nodes(),
+        "edges": G.number_of_edges(),
+        "avg_degree": degrees.mean() if len(degrees) else 0.0,
+        "max_degree": int(degrees.max()) if len(degrees) else 0,
+        "betweenness_centralization": centralization,
+        "avg_clustering": clustering,
+        "components": len(components),
+        "largest_component": max(components) if components else 0,
+        **timings,
+    }
+
+
+def _compute_task(task):
+    subfield, year, source, epsilon, delta = task
+    start = time.perf_counter()
+    try:
+        G = load_graph(subfield, year, source)
+    except (FileNotFoundError, IOError) as e:
+        print(f"Warning: Could not load {subfield}_{year}: {e}")
+        return {"subfield": subfield, "year": year}
+    load_seconds = time.perf_counter() - start
+    metrics = graph_metrics(G, epsilon=epsilon, delta=delta)
+    metrics["load_seconds"] = load_seconds
+    metrics["total_seconds"] = time.perf_counter() - start
+    return {"subfield": subfield, "year": year, **metrics}
+
+
+def compute_all_metrics(
+    subfields: List[str] = SUBFIELDS,
+    years: List[int] = YEARS,
+    source: str = "gexf",
+    epsilon: Optional[float] = None,
+    delta: float = DEFAULT_DELTA,
+    workers: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Computes graph_metrics for every subfield/year network, spreading the
+    graphs over a process pool when `workers` is set. Returns one row per graph.
+    """
+    tasks = [(subfield, year, source, epsilon, delta) for subfield in subfields for year in years]
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(_compute_task, tasks))
+    else:
+        rows = [_compute_task(task) for task in tasks]
+
+    for row in rows:
+        if "total_seconds" in row:
+            print(
+                f"{row['subfield']} {row['year']}: {row['nodes']} nodes, {row['edges']} edges "
+                f"in {row['total_seconds']:.2f}s (betweenness {row['betweenness_seconds']:.2f}s)"
+            )
+    metrics_df = pd.DataFrame(rows)
+    # Graphs that could not be loaded leave NaNs; keep the counts as integers
+    for column in ("nodes", "edges", "max_degree", "components", "largest_component"):
+        if column in metrics_df:
+            metrics_df[column] = metrics_df[column].astype("Int64")
+    return metrics_df
+
+
+def centralization_table(metrics_df: pd.DataFrame, subfields: List[str] = SUBFIELDS, years: List[int] = YEARS) -> pd.DataFrame:
+    """
+    Pivots the metrics into the centralization.csv layout: one row per
+    subfield, one column per year and an 'Average' column (ignoring NaN values).
+    """
+    df = metrics_df.pivot(index="subfield", columns="year", values="betweenness_centralization")
+    df = df.reindex(index=subfields, columns=years)
+    df.index.name = "subfield"
+    df.columns.name = None
+    df["Average"] = df[years].mean(axis=1)
+    return df
+
+
+def main(source="gexf", epsilon=None, delta=DEFAULT_DELTA, workers=None, output_dir: str = OUTPUT_DIR):
+    """
+    Computes the metrics of every subfield/year network and writes
+    network_metrics.csv and a regenerated centralization.csv to `output_dir`.
+    """
+    centralization_csv = os.path.join(output_dir, os.path.basename(CENTRALIZATION_CSV))
+    if os.path.abspath(centralization_csv) == os.path.abspath(CENTRALIZATION_CSV):
+        raise ValueError(f"Refusing to overwrite the checked-in {CENTRALIZATION_CSV}; choose another --output-dir")
+    metrics_df = compute_all_metrics(source=source, epsilon=epsilon, delta=delta, workers=workers)
+    os.makedirs(output_dir, exist_ok=True)
+    metrics_csv = os.path.join(output_dir, "network_metrics.csv")
+    metrics_df.to_csv(metrics_csv, index=False)
+    print(f"Metrics written to {metrics_csv}")
+
+    centralization_table(metrics_df).to_csv(centralization_csv)
+    print(f"Centralization written to {centralization_csv}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute metrics of the subfield/year networks.")
+    parser.add_argument("--source", choices=["gexf", "csr"], default="gexf", help="where to load the graphs from")
+    parser.add_argument("--epsilon", type=float, default=None, help="approximate betweenness within this error")
+    parser.add_argument("--delta", type=float, default=DEFAULT_DELTA, help="failure probability of the error bound")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="directory of the regenerated tables")
+    args = parser.parse_args()
+    main(source=args.source, epsilon=args.epsilon, delta=args.delta, workers=args.workers, output_dir=args.output_dir)
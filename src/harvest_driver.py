@@ -0,0 +1,181 @@
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from collect_publications_open_alex import harvest, read_email_from_json, setup_logging
+from dedup_index import WorkIndex
+from get_publication_counts_country import COUNTRY_CODES
+from openalex_client import OpenAlexClient
+from openalex_fetcher import OPENALEX_WORKS_URL, REQUESTS_PER_SECOND, TokenBucket
+from page_journal import JOURNAL_DIR
+
+HARVEST_DIR = "../data/csv/openalex/harvest"
+
+# (country, year) harvests running at the same time
+MAX_JOBS = 4
+
+# Pages in flight per harvest; MAX_JOBS * PAGES_IN_FLIGHT requests share the rate limit
+PAGES_IN_FLIGHT = 2
+
+
+def harvest_output_path(country_code: str, year: str, root: str = HARVEST_DIR) -> str:
+    """
+    Returns the CSV partition of one country and year:
+    {root}/{country}/open_alex_publications_{year}.csv
+    """
+    return os.path.join(root, country_code, f"open_alex_publications_{year}.csv")
+
+
+def parse_years(years: str) -> List[str]:
+    """
+    Parses a year range such as '2019-2024' (or a single year) into a list
+    of years, newest first like PUBLICATION_YEAR.
+    """
+    start, _, end = years.partition("-")
+    return [str(year) for year in range(int(end or start), int(start) - 1, -1)]
+
+
+def run_harvest(
+    countries: List[str],
+    years: List[str],
+    logger: logging.Logger,
+    email: Optional[str] = None,
+    max_jobs: int = MAX_JOBS,
+    pages_in_flight: int = PAGES_IN_FLIGHT,
+    rate: float = REQUESTS_PER_SECOND,
+    session=None,
+    url: str = OPENALEX_WORKS_URL,
+    output_root: str = HARVEST_DIR,
+    journal_root: str = JOURNAL_DIR,
+    index: Optional[WorkIndex] = None,
+) -> List[Dict]:
+    """
+    Harvests every (country, year) pair on a pool of `max_jobs` workers.
+
+    All jobs share one token bucket, so together they stay under `rate`
+    requests per second however many run at once. Each job writes its own
+    partition (see harvest_output_path) and is journaled, so a rerun only
+    fetches what is missing. With a dedup index, a work shared by several
+    countries is kept only in the first partition that ingests it; which
+    one that is depends on job scheduling, so partitions are complete by
+    default and merge_partitions drops duplicates deterministically instead.
+    Returns one summary row per job.
+    """
+    rate_limiter = TokenBucket(rate)
+    jobs = [(country, year) for country in countries for year in years]
+    logger.info(f"Harvesting {len(jobs)} jobs ({len(countries)} countries x {len(years)} years) with {max_jobs} workers")
+
+    def run_job(job):
+        country, year = job
+        output_file = harvest_output_path(country, year, output_root)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        start = time.perf_counter()
+        try:
+            num_works = harvest(
+                country,
+                year,
+                output_file,
+                logger,
+                email=email,
+                rate_limiter=rate_limiter,
+                session=session,
+                max_workers=pages_in_flight,
+                url=url,
+                journal_root=journal_root,
+                index=index,
+            )
+            status = "skipped" if num_works is None else "done"
+        except Exception as e:
+            logger.error(f"{country} {year} failed: {e}")
+            num_works, status = None, "failed"
+        return {
+            "country": country,
+            "year": year,
+            "status": status,
+            "works": num_works or 0,
+            "seconds": time.perf_counter() - start,
+            "output_file": output_file,
+        }
+
+    summary = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_jobs) as executor:
+        futures = [executor.submit(run_job, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            row = future.result()
+            summary.append(row)
+            throughput = row["works"] / row["seconds"] if row["seconds"] > 0 else 0.0
+            logger.info(
+                f"[{done}/{len(jobs)}] {row['country']} {row['year']} {row['status']}: "
+                f"{row['works']} works in {row['seconds']:.1f}s ({throughput:.0f} works/s)"
+            )
+
+    elapsed = time.perf_counter() - start
+    total_works = sum(row["works"] for row in summary)
+    failed = [f"{row['country']} {row['year']}" for row in summary if row["status"] == "failed"]
+    logger.info(
+        f"Harvested {total_works} works in {elapsed:.1f}s ({total_works / elapsed if elapsed else 0:.0f} works/s)"
+    )
+    if failed:
+        logger.error(f"{len(failed)} jobs failed: {', '.join(failed)}")
+    summary.sort(key=lambda row: jobs.index((row["country"], row["year"])))
+    return summary
+
+
+def main(
+    countries: List[str],
+    years: List[str],
+    max_jobs: int = MAX_JOBS,
+    pages_in_flight: int = PAGES_IN_FLIGHT,
+    rate: float = REQUESTS_PER_SECOND,
+    dedup: bool = False,
+    use_cache: bool = False,
+):
+    """
+    Harvests the given countries and years into per-country, per-year CSV
+    files. With `dedup`, works already ingested by another partition are
+    dropped at ingest through the persistent WorkIndex. Jobs are journaled,
+    so the response cache is off unless `use_cache` is set.
+    """
+    setup_logging("harvest_driver.log")
+    logger = logging.getLogger(__name__)
+    client = OpenAlexClient(use_cache=use_cache)
+    index = WorkIndex() if dedup else None
+
+    try:
+        email = read_email_from_json()
+        run_harvest(
+            countries,
+            years,
+            logger,
+            email=email,
+            max_jobs=max_jobs,
+            pages_in_flight=pages_in_flight,
+            rate=rate,
+            session=client,
+            index=index,
+        )
+    finally:
+        if index is not None:
+            logger.info(f"Dedup index: {len(index)} works, {index.duplicates} duplicates dropped")
+            index.close()
+        client.log_stats(logger)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Harvest OpenAlex works for several countries and years.")
+    parser.add_argument("--countries", nargs="+", default=COUNTRY_CODES, help="ISO country codes")
+    parser.add_argument("--years", default="2019-2024", help="year or year range, e.g. 2019-2024")
+    parser.add_argument("--jobs", type=int, default=MAX_JOBS, help="harvests running at the same time")
+    parser.add_argument("--pages-in-flight", type=int, default=PAGES_IN_FLIGHT, help="concurrent page requests per harvest")
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND, help="requests per second shared by all jobs")
+    parser.add_argument(
+        "--dedup", action="store_true", help="drop works already ingested by another partition (order depends on scheduling)"
+    )
+    parser.add_argument("--cache", action="store_true", help="also keep responses in the on-disk response cache")
+    args = parser.parse_args()
+    main(args.countries, parse_years(args.years), args.jobs, args.pages_in_flight, args.rate, args.dedup, args.cache)
@@ -0,0 +1,365 @@
+import argparse
+import json
+import os
+import shutil
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from construct_network import SUBFIELDS, YEARS, iter_csv_publications, write_network
+from edge_builder import NetworkArrays, build_network_arrays, explode_publications, primary_subfields
+
+NETWORK_STATE_DIR = "../data/graphs/state"
+
+META_FILE = "meta.json"
+
+# Arrays of one segment; node indices in edge_* and author_subfield_node are local to it,
+# work_ids holds the segment's distinct work ids sorted, as a lookup index
+SEGMENT_FILES = (
+    "work_ids",
+    "node_ids",
+    "label1",
+    "edge_source",
+    "edge_target",
+    "edge_weight",
+    "author_subfield_node",
+    "author_subfield_name",
+    "author_subfield_count",
+)
+
+# Segments kept before they are compacted into one
+MAX_SEGMENTS = 16
+
+
+def _strings(values) -> np.ndarray:
+    """
+    Converts an object array of strings to a fixed-width unicode array, so it
+    is saved as plain .npy (no pickle) and loads memory-mapped.
+    """
+    return np.asarray(values).astype(str) if len(values) else np.empty(0, dtype="<U1")
+
+
+def author_subfield_counts(exploded: pd.DataFrame, node_ids: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Counts the publications of every (author, subfield) pair of an exploded
+    authorship table, in order of first appearance. Authors are given as
+    indices into `node_ids`.
+    """
+    counts = exploded.groupby(["author_id", "subfield"], sort=False, dropna=False).size()
+    node_index = pd.Series(np.arange(len(node_ids), dtype=np.int64), index=node_ids)
+    return {
+        "author_subfield_node": node_index.reindex(counts.index.get_level_values(0)).to_numpy(dtype=np.int64),
+        "author_subfield_name": counts.index.get_level_values(1).to_numpy(dtype=object),
+        "author_subfield_count": counts.to_numpy(dtype=np.int64),
+    }
+
+
+def merge_segments(segments: List[Dict[str, np.ndarray]]) -> Tuple[NetworkArrays, Dict[str, np.ndarray]]:
+    """
+    Merges segments, in the order their works were applied, into the network
+    a full rebuild over the same works gives: nodes and edges in order of
+    first appearance, first-seen countries, summed edge weights and primary
+    subfields from the summed (author, subfield) counts, ties going to the
+    subfield the author was first seen in (see edge_builder.primary_subfields).
+
+    Returns the network and its (author, subfield) counts, which together
+    form a single segment equivalent to all of them.
+    """
+    def concat(name, dtype):
+        parts = [np.asarray(segment[name]) for segment in segments]
+        return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+    # Global node codes, in order of first appearance over all segments
+    node_codes, node_ids = pd.factorize(concat("node_ids", object))
+    node_codes = node_codes.astype(np.int64)
+    node_ids = np.asarray(node_ids, dtype=object)
+    _, first_rows = np.unique(node_codes, return_index=True)
+    label1 = concat("label1", object)[first_rows]
+
+    offsets = np.cumsum([0] + [len(segment["node_ids"]) for segment in segments])
+    to_global = [node_codes[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def global_nodes(name):
+        parts = [codes[np.asarray(segment[name])] for codes, segment in zip(to_global, segments)]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    # Edges keep the smaller author id as source in every segment, so equal
+    # pairs have equal keys; weights are summed in order of first occurrence
+    source = global_nodes("edge_source")
+    target = global_nodes("edge_target")
+    keys = source * max(len(node_ids), 1) + target
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    weight = np.bincount(inverse, weights=concat("edge_weight", np.int64), minlength=len(first)).astype(np.int64)
+    by_first = np.argsort(first, kind="stable")
+
+    # Summed (author, subfield) counts, in order of first appearance
+    author = global_nodes("author_subfield_node")
+    subfield, subfield_names = pd.factorize(concat("author_subfield_name", object), use_na_sentinel=False)
+    subfield = subfield.astype(np.int64)
+    subfield_names = np.asarray(subfield_names, dtype=object)
+    pair_keys = author * max(len(subfield_names), 1) + subfield
+    _, pair_first, pair_inverse = np.unique(pair_keys, return_index=True, return_inverse=True)
+    pair_counts = np.bincount(
+        pair_inverse, weights=concat("author_subfield_count", np.int64), minlength=len(pair_first)
+    ).astype(np.int64)
+    pair_order = np.argsort(pair_first, kind="stable")
+    pair_author = author[pair_first[pair_order]]
+    pair_subfield = subfield[pair_first[pair_order]]
+    pair_counts = pair_counts[pair_order]
+
+    # One row per counted publication, so primary_subfields sees the same
+    # counts and first appearances as on the full exploded table
+    primary = primary_subfields(
+        np.repeat(pair_author, pair_counts), np.repeat(pair_subfield, pair_counts), len(node_ids)
+    )
+    arrays = NetworkArrays(
+        node_ids,
+        label1,
+        subfield_names[primary] if len(node_ids) else np.empty(0, dtype=object),
+        source[first[by_first]],
+        target[first[by_first]],
+        weight[by_first],
+    )
+    counts = {
+        "author_subfield_node": pair_author,
+        "author_subfield_name": subfield_names[pair_subfield],
+        "author_subfield_count": pair_counts,
+    }
+    return arrays, counts
+
+
+class NetworkState:
+    """
+    Persistent state of one collaboration network, kept between runs so new
+    works can be applied as deltas instead of rebuilding from the corpus.
+
+    The state is a list of append-only segments, one per batch of applied
+    works, each holding the batch's network (edge_builder.build_network_arrays),
+    its per-author subfield counts and its sorted work ids as .npy arrays.
+    Applying works looks their ids up in the segments' id indexes
+    (memory-mapped, by binary search) and writes one new segment, so state
+    I/O scales with the delta. The current network is the merge of all
+    segments (see merge_segments), which equals a full rebuild over the same
+    works in the same order. Segments are only merged when the network is
+    read or once more than `max_segments` accumulate; either way the merge
+    replaces them, so each segment is merged once.
+
+    Deltas are append-only: a work whose id was applied in an earlier batch
+    is skipped, so corrections to existing works need a full rebuild. Rows
+    repeating an id within one batch are all counted, as a full rebuild
+    counts every row of the corpus.
+    """
+
+    def __init__(self, directory: str, max_segments: int = MAX_SEGMENTS):
+        self.directory = directory
+        self.max_segments = max_segments
+        self.segments: List[str] = []
+        self.next_segment = 0
+        meta_file = os.path.join(directory, META_FILE)
+        if os.path.exists(meta_file):
+            with open(meta_file, "r") as f:
+                meta = json.load(f)
+            self.segments = meta["segments"]
+            self.next_segment = meta["next_segment"]
+
+    def _load_segment(self, name: str, files=SEGMENT_FILES) -> Dict[str, np.ndarray]:
+        path = os.path.join(self.directory, name)
+        return {file: np.load(os.path.join(path, f"{file}.npy"), mmap_mode="r") for file in files}
+
+    def load_segments(self) -> List[Dict[str, np.ndarray]]:
+        return [self._load_segment(name) for name in self.segments]
+
+    def applied(self, work_ids: np.ndarray) -> np.ndarray:
+        """
+        Returns a boolean mask of the `work_ids` (a unicode array) applied
+        by an earlier batch.
+        """
+        applied = np.zeros(len(work_ids), dtype=bool)
+        for name in self.segments:
+            index = self._load_segment(name, ["work_ids"])["work_ids"]
+            if len(index) and len(work_ids):
+                found = index[np.minimum(np.searchsorted(index, work_ids), len(index) - 1)]
+                applied |= found == work_ids
+        return applied
+
+    def _write_segment(self, segment: Dict[str, np.ndarray]) -> str:
+        name = f"segment_{self.next_segment:05d}"
+        self.next_segment += 1
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for file in SEGMENT_FILES:
+            values = segment[file]
+            if values.dtype == object:
+                values = _strings(values)
+            np.save(os.path.join(tmp_path, f"{file}.npy"), values)
+        os.replace(tmp_path, path)
+        return name
+
+    def _commit(self, segments: List[str]) -> None:
+        """
+        Makes `segments` the current state by replacing meta.json, then
+        removes the segments it no longer lists.
+        """
+        tmp_file = os.path.join(self.directory, f"{META_FILE}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump({"segments": segments, "next_segment": self.next_segment}, f)
+        os.replace(tmp_file, os.path.join(self.directory, META_FILE))
+        for name in set(self.segments) - set(segments):
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        self.segments = segments
+
+    def apply(self, works: Iterable[Tuple[str, List[dict], Optional[str]]]) -> Tuple[int, int]:
+        """
+        Applies the (work id, authors, subfield_name) triples whose ids no
+        earlier batch applied as a new segment. Returns the number of new
+        works and of the authors they touched.
+        """
+        works = list(works)
+        work_ids = _strings([str(work_id) for work_id, _, _ in works])
+        applied = self.applied(work_ids)
+        new_works = [work for work, done in zip(works, applied) if not done]
+        if not new_works:
+            return 0, 0
+
+        exploded = explode_publications((authors, subfield_name) for _, authors, subfield_name in new_works)
+        delta = build_network_arrays(exploded)
+        segment = {
+            "work_ids": np.unique(work_ids[~applied]),
+            "node_ids": delta.node_ids,
+            "label1": delta.label1,
+            "edge_source": delta.source,
+            "edge_target": delta.target,
+            "edge_weight": delta.weight,
+            **author_subfield_counts(exploded, delta.node_ids),
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        self._commit(self.segments + [self._write_segment(segment)])
+        if len(self.segments) > self.max_segments:
+            self.compact()
+        return len(new_works), len(delta.node_ids)
+
+    def compact(self) -> None:
+        """
+        Replaces all segments by their merge.
+        """
+        if len(self.segments) <= 1:
+            return
+        segments = self.load_segments()
+        arrays, counts = merge_segments(segments)
+        work_ids = np.concatenate([np.asarray(segment["work_ids"]) for segment in segments])
+        self._commit([self._write_segment({
+            "work_ids": np.unique(work_ids),
+            "node_ids": arrays.node_ids,
+            "label1": arrays.label1,
+            "edge_source": arrays.source,
+            "edge_target": arrays.target,
+            "edge_weight": arrays.weight,
+            **counts,
+        })])
+
+    def to_arrays(self) -> NetworkArrays:
+        """
+        Returns the network in edge_builder.NetworkArrays form, compacting
+        the segments first so the next read does not merge them again.
+        """
+        self.compact()
+        return merge_segments(self.load_segments())[0]
+
+
+def network_state_path(subfield: str, year: int, root: Optional[str] = None) -> str:
+    return os.path.join(root or NETWORK_STATE_DIR, f"{subfield}_{year}")
+
+
+def iter_csv_works(df: pd.DataFrame):
+    """
+    Yields ((subfield_name, publication_year), (work id, authors, subfield_name))
+    for every row of a publications dataframe.
+    """
+    publications = iter_csv_publications(df)
+    for work_id, year, (authors, subfield_name) in zip(df["id"], df["publication_year"], publications):
+        if pd.isna(year):
+            continue
+        yield (subfield_name, int(year)), (work_id, authors, subfield_name)
+
+
+def partition_works(df: pd.DataFrame, subfields=SUBFIELDS, years=YEARS) -> Dict[Tuple[str, int], List]:
+    """
+    Groups the works of a dataframe by (subfield, year), keeping row order.
+    """
+    wanted = {(subfield, year) for subfield in subfields for year in years}
+    partitions = defaultdict(list)
+    for key, work in iter_csv_works(df):
+        if key in wanted:
+            partitions[key].append(work)
+    return partitions
+
+
+def build_states(
+    df: pd.DataFrame, subfields=SUBFIELDS, years=YEARS, root: Optional[str] = None, write: bool = True
+) -> None:
+    """
+    Builds and persists the state of every (subfield, year) network from the
+    full corpus, replacing any previous state, and writes the networks
+    unless `write` is False.
+    """
+    partitions = partition_works(df, subfields, years)
+    for subfield in subfields:
+        for year in years:
+            path = network_state_path(subfield, year, root)
+            shutil.rmtree(path, ignore_errors=True)
+            state = NetworkState(path)
+            state.apply(partitions.get((subfield, year), []))
+            if write:
+                write_network(state.to_arrays(), subfield, year)
+
+
+def apply_new_works(
+    df: pd.DataFrame,
+    subfields=SUBFIELDS,
+    years=YEARS,
+    root: Optional[str] = None,
+    write: bool = True,
+    max_segments: int = MAX_SEGMENTS,
+) -> List[Tuple[str, int]]:
+    """
+    Applies newly harvested works to the persisted network states. Only the
+    partitions that receive new works get a new segment and are rewritten;
+    the others are left untouched. Returns the updated (subfield, year) keys.
+    """
+    updated = []
+    for (subfield, year), works in partition_works(df, subfields, years).items():
+        state = NetworkState(network_state_path(subfield, year, root), max_segments)
+        new_works, touched = state.apply(works)
+        if not new_works:
+            continue
+        print(f"{subfield} {year}: {new_works} new works, {touched} authors updated")
+        if write:
+            write_network(state.to_arrays(), subfield, year)
+        updated.append((subfield, year))
+    return updated
+
+
+def main(command: str, csv_file: str):
+    df = pd.read_csv(csv_file)
+    if command == "init":
+        build_states(df)
+    else:
+        updated = apply_new_works(df)
+        print(f"{len(updated)} networks updated")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or incrementally update the subfield/year networks.")
+    parser.add_argument("command", choices=["init", "apply"], help="build states from the corpus, or apply new works")
+    parser.add_argument(
+        "csv_file",
+        nargs="?",
+        default="../data/csv/openalex/br_publications.csv",
+        help="full corpus (init) or newly harvested works (apply)",
+    )
+    args = parser.parse_args()
+    main(args.command, args.csv_file)
@@ -0,0 +1,110 @@
+import json
+import os
+from typing import Any, Callable, Dict, Optional, Union
+
+# Force a decoder ("orjson", "msgspec" or "stdlib") instead of the fastest installed one
+CODEC_ENV = "JSON_CODEC"
+
+JSONDecodeError = json.JSONDecodeError
+
+
+def _stdlib_decoder() -> Callable:
+    return json.loads
+
+
+def _orjson_decoder() -> Callable:
+    import orjson
+
+    return orjson.loads
+
+
+def _msgspec_decoder() -> Callable:
+    import msgspec
+
+    decode = msgspec.json.Decoder().decode
+
+    def loads(data: Union[str, bytes]) -> Any:
+        try:
+            return decode(data)
+        except msgspec.DecodeError as e:
+            raise JSONDecodeError(str(e), data if isinstance(data, str) else "", 0) from None
+
+    return loads
+
+
+DECODERS: Dict[str, Callable[[], Callable]] = {
+    "orjson": _orjson_decoder,
+    "msgspec": _msgspec_decoder,
+    "stdlib": _stdlib_decoder,
+}
+
+_name = None
+_loads = None
+
+
+def set_codec(name: Optional[str] = None) -> str:
+    """
+    Selects the JSON decoder: `name`, the JSON_CODEC environment variable, or
+    the first installed of orjson, msgspec and the standard library.
+    Returns the name of the selected decoder.
+    """
+    global _name, _loads
+    name = name or os.environ.get(CODEC_ENV)
+    candidates = [name] if name else list(DECODERS)
+    for candidate in candidates:
+        try:
+            _loads = DECODERS[candidate]()
+        except ImportError:
+            continue
+        _name = candidate
+        return _name
+    raise ImportError(f"JSON codec {name!r} is not installed")
+
+
+def codec_name() -> str:
+    return _name
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Decodes a JSON document with the selected decoder, raising
+    json.JSONDecodeError on invalid input like json.loads.
+
+    The fast decoders are stricter than json.loads (e.g. they reject NaN and
+    Infinity), so documents they reject are decoded again by the standard
+    library before giving up.
+    """
+    try:
+        return _loads(data)
+    except JSONDecodeError:
+        if _loads is json.loads:
+            raise
+        return json.loads(data)
+
+
+def load(f) -> Any:
+    return loads(f.read())
+
+
+def response_json(response) -> Any:
+    """
+    Decodes the body of a requests.Response with the selected decoder, or
+    calls .json() on responses that are already decoded (cache hits).
+    """
+    content = getattr(response, "content", None)
+    if isinstance(content, bytes):
+        return loads(content)
+    return response.json()
+
+
+def dumps(obj: Any) -> str:
+    """
+    Encodes with json.dumps defaults (', ' and ': ' separators, ASCII
+    escapes). The fast encoders write compact UTF-8, so the standard library
+    is always used for the JSON columns of the CSV files to stay byte for
+    byte compatible with the existing ones.
+    """
+    return json.dumps(obj)
+
+
+set_codec()
@@ -0,0 +1,218 @@
+import os
+from collections import defaultdict, deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import run_report
+from construct_network import PUBLICATIONS_CSV, PUBLICATIONS_STORE, parse_json_field, store_is_current
+from edge_builder import NetworkArrays
+from gexf_stream import write_network_arrays_gexf
+
+PROJECTIONS_DIR = "../data/graphs/projections"
+
+# Entities a collaboration network can be projected onto
+PROJECTIONS = ["country", "institution"]
+
+# Rows read from the corpus CSV at a time
+CHUNK_SIZE = 20000
+
+
+def work_countries(authors: List[Dict]) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (id, name) of every country listed by the authorships of a work.
+    """
+    for author in authors:
+        for country in author.get("countries") or []:
+            yield country, country
+
+
+def work_institutions(authors: List[Dict]) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (id, name) of every institution listed by the authorships of a work.
+    """
+    for author in authors:
+        for institution in author.get("institutions") or []:
+            if institution.get("id"):
+                yield institution["id"], institution.get("display_name")
+
+
+ENTITY_EXTRACTORS = {
+    "country": work_countries,
+    "institution": work_institutions,
+}
+
+
+def iter_csv_authors(csv_file: str, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict]]:
+    """
+    Streams the decoded authorships of every work of the corpus CSV, reading
+    only the authorships column, chunk by chunk.
+    """
+    for chunk in pd.read_csv(csv_file, usecols=["authorships"], chunksize=chunk_size):
+        for authorships in chunk["authorships"]:
+            yield (parse_json_field(authorships) if isinstance(authorships, str) else None) or []
+
+
+def iter_store_authors(store_dir: str = PUBLICATIONS_STORE) -> Iterator[List[Dict]]:
+    """
+    Yields the authors of every work of the Parquet publications store in the
+    authorships JSON layout, in store order, with an empty list for works
+    without authorships. A work id repeated in the store gets the authorship
+    rows of the same occurrence (each occurrence starts at position 0).
+    """
+    from publications_store import load_authorships, load_works
+
+    works = load_works(store_dir, columns=["id"])
+    authorships = load_authorships(
+        store_dir, columns=["work_id", "position", "countries", "institution_ids", "institution_names"]
+    )
+    occurrences_by_work = defaultdict(deque)
+    for work_id, position, countries, institution_ids, names in zip(
+        authorships["work_id"],
+        authorships["position"],
+        authorships["countries"],
+        authorships["institution_ids"],
+        authorships["institution_names"],
+    ):
+        if position == 0 or not occurrences_by_work[work_id]:
+            occurrences_by_work[work_id].append([])
+        occurrences_by_work[work_id][-1].append({
+            "countries": list(countries) if countries is not None else [],
+            "institutions": [
+                {"id": institution_id, "display_name": name}
+                for institution_id, name in zip(
+                    institution_ids if institution_ids is not None else [],
+                    names if names is not None else [],
+                )
+            ],
+        })
+    for work_id in works["id"]:
+        occurrences = occurrences_by_work.get(work_id)
+        yield occurrences.popleft() if occurrences else []
+
+
+def incidence_matrix(works: Iterable[Iterable[Tuple[str, str]]]):
+    """
+    Builds the binary works x entities incidence matrix (scipy.sparse CSR)
+    from the (id, name) entities of every work. An entity listed several
+    times by one work (e.g. by two of its authors) counts once.
+
+    Returns (matrix, entity ids, entity names), entities in first-seen order.
+    """
+    from scipy.sparse import coo_matrix
+
+    codes: Dict[str, int] = {}
+    names = []
+    rows = []
+    cols = []
+    num_works = 0
+    for work, entities in enumerate(works):
+        num_works = work + 1
+        for entity_id, name in entities:
+            code = codes.get(entity_id)
+            if code is None:
+                code = codes[entity_id] = len(codes)
+                names.append(name if name is not None else entity_id)
+            rows.append(work)
+            cols.append(code)
+
+    matrix = coo_matrix(
+        (np.ones(len(rows), dtype=np.int64), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+        shape=(num_works, len(codes)),
+    ).tocsr()
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix, np.array(list(codes), dtype=object), np.array(names, dtype=object)
+
+
+def project(matrix, entity_ids: np.ndarray, entity_names: np.ndarray) -> NetworkArrays:
+    """
+    Projects a works x entities incidence matrix M onto the entities: the
+    co-occurrence matrix M^T M holds, off the diagonal, the number of works
+    two entities share (the edge weight) and, on the diagonal, the number of
+    works of each entity.
+
+    Nodes keep the incidence order; label1 is the entity name and label2 its
+    number of works. Edges are sorted by (source, target), source < target.
+    """
+    cooccurrence = (matrix.T @ matrix).tocoo()
+    works = cooccurrence.diagonal() if len(entity_ids) else np.empty(0, dtype=np.int64)
+    upper = cooccurrence.row < cooccurrence.col
+    source = cooccurrence.row[upper].astype(np.int64)
+    target = cooccurrence.col[upper].astype(np.int64)
+    weight = cooccurrence.data[upper].astype(np.int64)
+    order = np.lexsort((target, source))
+    return NetworkArrays(
+        entity_ids,
+        entity_names,
+        np.array([str(count) for count in works.tolist()], dtype=object),
+        source[order],
+        target[order],
+        weight[order],
+    )
+
+
+def build_projection(publications: Iterable[List[Dict]], kind: str) -> NetworkArrays:
+    """
+    Builds the weighted `kind` x `kind` collaboration network (see
+    PROJECTIONS) from the author lists of the works. Two countries or
+    institutions are linked by the number of works they appear on together;
+    no author-level graph is built.
+    """
+    extract = ENTITY_EXTRACTORS[kind]
+    matrix, entity_ids, entity_names = incidence_matrix(extract(authors) for authors in publications)
+    return project(matrix, entity_ids, entity_names)
+
+
+def write_projection_csv(arrays: NetworkArrays, nodes_file: str, edges_file: str) -> None:
+    """
+    Writes a projection as a node list (id, name, works) and an edge list
+    (source, target, weight) keyed by entity id.
+    """
+    pd.DataFrame({
+        "id": arrays.node_ids,
+        "name": arrays.label1,
+        "works": arrays.label2.astype(np.int64),
+    }).to_csv(nodes_file, index=False)
+    pd.DataFrame({
+        "source": arrays.node_ids[arrays.source],
+        "target": arrays.node_ids[arrays.target],
+        "weight": arrays.weight,
+    }).to_csv(edges_file, index=False)
+
+
+def write_projection(arrays: NetworkArrays, kind: str, output_dir: str = PROJECTIONS_DIR) -> List[str]:
+    """
+    Writes a projection to <kind>.gexf, <kind>_nodes.csv and <kind>_edges.csv
+    in `output_dir` and returns the paths written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    gexf_file = os.path.join(output_dir, f"{kind}.gexf")
+    nodes_file = os.path.join(output_dir, f"{kind}_nodes.csv")
+    edges_file = os.path.join(output_dir, f"{kind}_edges.csv")
+    with run_report.stage("gexf_write"):
+        write_network_arrays_gexf(arrays, gexf_file)
+    with run_report.stage("csv_write"):
+        write_projection_csv(arrays, nodes_file, edges_file)
+    return [gexf_file, nodes_file, edges_file]
+
+
+def main(kind: str, csv_file: Optional[str] = None, output_dir: str = PROJECTIONS_DIR):
+    """
+    Builds the `kind` projection of the whole corpus, from the given CSV or
+    from the Parquet publications store when it is current (falling back to
+    the full corpus CSV) by default, and writes it to GEXF and CSV.
+    """
+    report = run_report.current()
+    if csv_file is None and store_is_current():
+        publications = iter_store_authors(PUBLICATIONS_STORE)
+    else:
+        publications = iter_csv_authors(csv_file or PUBLICATIONS_CSV)
+    with report.stage("projection"):
+        arrays = build_projection(publications, kind)
+    report.count("nodes", len(arrays.node_ids))
+    report.count("edges", len(arrays.weight))
+    print(f"Built {kind} network: {len(arrays.node_ids)} nodes, {len(arrays.weight)} edges")
+    for path in write_projection(arrays, kind, output_dir):
+        print(f"Saved {path}")
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import json_codec
+import run_report
+
+HTTP_CACHE_DIR = "../data/http_cache"
+
+# Cached responses older than this are fetched again
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# Least recently used responses are evicted once the cache grows past this,
+# down to CACHE_LOW_WATER of it so eviction does not run again on the next put
+CACHE_MAX_BYTES = 1024 ** 3
+CACHE_LOW_WATER = 0.9
+
+# Connections kept open per host by the pooled session
+POOL_SIZE = 16
+
+# Parameters that do not change the response and are left out of cache keys
+IGNORED_PARAMS = {"mailto"}
+
+
+def normalize_request(url: str, params: Optional[Dict] = None) -> str:
+    """
+    Returns a canonical form of a GET request: lower-cased scheme and host,
+    query parameters from the URL and `params` merged and sorted, and
+    parameters in IGNORED_PARAMS dropped.
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query += [(str(k), str(v)) for k, v in (params or {}).items() if v is not None]
+    query = sorted((k, v) for k, v in query if k not in IGNORED_PARAMS)
+    base = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, "", ""))
+    return base + "?" + "&".join(f"{k}={v}" for k, v in query)
+
+
+class ResponseCache:
+    """
+    On-disk cache of decoded JSON responses with a TTL and a size-bounded
+    LRU eviction policy.
+
+    Every response is one JSON file named by the hash of its normalized
+    request. A file's modification time is its last use: hits touch it.
+    The directory is scanned once, into an in-memory index of entry sizes
+    in least recently used order that hits and puts keep current. When the
+    cache grows past `max_bytes`, the least recently used entries are
+    removed until it fits in `low_water` of it.
+    """
+
+    def __init__(
+        self,
+        directory: str = HTTP_CACHE_DIR,
+        ttl: float = CACHE_TTL_SECONDS,
+        max_bytes: int = CACHE_MAX_BYTES,
+        low_water: float = CACHE_LOW_WATER,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "stored": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._index: "OrderedDict[str, int]" = OrderedDict(
+            (path, size) for path, size, _ in sorted(self._entries(), key=lambda entry: entry[2])
+        )
+        self._size = sum(self._index.values())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _entries(self):
+        """
+        Yields (path, size, last use) for every cached response.
+        """
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, key: str, count_hit: bool = True, count_miss: bool = True) -> Optional[Dict]:
+        """
+        Returns the cached response for a normalized request, or None.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = json_codec.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            if count_miss:
+                self._count("misses")
+            return None
+        if entry.get("key") != key:
+            if count_miss:
+                self._count("misses")
+            return None
+        if time.time() - entry["stored_at"] > self.ttl:
+            self._remove(path)
+            self._count("expired")
+            if count_miss:
+                self._count("misses")
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            if path in self._index:
+                self._index.move_to_end(path)
+        if count_hit:
+            self._count("hits")
+        return entry["body"]
+
+    def put(self, key: str, body: Dict) -> None:
+        """
+        Stores a decoded response and evicts old entries if the cache is full.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"key": key, "stored_at": time.time(), "body": body}, f)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.stats["stored"] += 1
+            self._size += size - self._index.pop(path, 0)
+            self._index[path] = size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._size -= self._index.pop(path, 0)
+
+    def _evict(self) -> None:
+        """
+        Removes least recently used entries until the cache fits in its
+        low-water mark. Called with the lock held.
+        """
+        target = self.max_bytes * self.low_water
+        while self._index and self._size > target:
+            path, size = self._index.popitem(last=False)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            self.stats["evicted"] += 1
+
+    def clear(self) -> None:
+        for path in list(self._index):
+            self._remove(path)
+
+
+class CachedResponse:
+    """
+    Minimal stand-in for requests.Response returned on cache hits and for
+    successful responses, whose body the client has already decoded.
+    """
+
+    status_code = 200
+    headers: Dict = {}
+
+    def __init__(self, body: Dict):
+        self._body = body
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> Dict:
+        return self._body
+
+
+class OpenAlexClient:
+    """
+    Shared HTTP client for the OpenAlex collectors: a pooled requests.Session
+    with an optional on-disk response cache in front of it.
+
+    Pass it as the `session` of openalex_fetcher.fetch_page/iter_work_pages;
+    cached responses are then returned without touching the rate limiter.
+    """
+
+    def __init__(self, cache: Optional[ResponseCache] = None, use_cache: bool = True, pool_size: int = POOL_SIZE):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.cache = (cache or ResponseCache()) if use_cache else None
+
+    def cached_json(self, url: str, params: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Returns the cached JSON body of a request, or None. A miss is only
+        counted by the get() that follows it.
+        """
+        if self.cache is None:
+            return None
+        body = self.cache.get(normalize_request(url, params), count_miss=False)
+        if body is not None:
+            run_report.current().count("http_cache_hits")
+        return body
+
+    def is_cached(self, url: str, params: Optional[Dict] = None) -> bool:
+        """
+        Tells whether a request would be served from the cache, without
+        counting it as a hit or a miss.
+        """
+        if self.cache is None:
+            return False
+        key = normalize_request(url, params)
+        return self.cache.get(key, count_hit=False, count_miss=False) is not None
+
+    def get(self, url: str, params: Optional[Dict] = None):
+        """
+        Sends a GET request, serving it from the cache when possible and
+        caching successful JSON responses.
+        """
+        if self.cache is not None:
+            key = normalize_request(url, params)
+            body = self.cache.get(key)
+            if body is not None:
+                run_report.current().count("http_cache_hits")
+                return CachedResponse(body)
+        report = run_report.current()
+        start = time.perf_counter()
+        response = self.session.get(url, params=params)
+        report.sample("http_latency_seconds", time.perf_counter() - start)
+        report.count("http_requests")
+        report.count("http_bytes", len(response.content))
+        if response.status_code != 200:
+            report.count(f"http_status_{response.status_code}")
+            return response
+        try:
+            body = json_codec.response_json(response)
+        except ValueError:
+            return response
+        if self.cache is not None:
+            self.cache.put(normalize_request(url, params), body)
+        # Decoded once here; callers get the body back from .json()
+        return CachedResponse(body)
+
+    def stats(self) -> Tuple[int, int]:
+        """
+        Returns (hits, misses) of the response cache.
+        """
+        if self.cache is None:
+            return 0, 0
+        return self.cache.stats["hits"], self.cache.stats["misses"]
+
+    def log_stats(self, logger: logging.Logger) -> None:
+        if self.cache is None:
+            logger.info("HTTP cache disabled.")
+            return
+        stats = self.cache.stats
+        logger.info(
+            f"HTTP cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['expired']} expired), {stats['stored']} stored, {stats['evicted']} evicted"
+        )
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,228 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+import requests
+
+import json_codec
+import run_report
+from page_journal import PageJournal
+
+OPENALEX_WORKS_URL = "https://api.openalex.org/works"
+
+# OpenAlex allows up to 200 results per page
+PER_PAGE = 200
+
+# Basic (page=N) paging only reaches the first 10,000 results of a query;
+# anything deeper has to be walked with cursor paging.
+MAX_PAGED_RESULTS = 10000
+
+# Polite-pool limit is 10 requests per second; stay below it by default
+REQUESTS_PER_SECOND = 8.0
+MAX_IN_FLIGHT = 4
+
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 1.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens are refilled continuously at `rate` tokens per second up to
+    `capacity`. Each call to acquire() consumes one token, blocking until
+    one is available.
+    """
+
+    def __init__(self, rate: float = REQUESTS_PER_SECOND, capacity: Optional[int] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Blocks until a token is available and consumes it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _retry_delay(response: Optional[requests.Response], attempt: int, backoff: float) -> float:
+    """
+    Returns how long to wait before the next attempt, honouring Retry-After when present.
+    """
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return backoff * (2 ** attempt)
+
+
+def fetch_page(
+    params: Dict,
+    logger: logging.Logger,
+    url: str = OPENALEX_WORKS_URL,
+    rate_limiter: Optional[TokenBucket] = None,
+    session=None,
+    max_retries: int = MAX_RETRIES,
+    backoff: float = BACKOFF_SECONDS,
+) -> Dict:
+    """
+    Fetches a single page from the OpenAlex API and returns the decoded JSON.
+
+    Requests that fail with a connection error or a retryable status code
+    (429 or 5xx) are retried with exponential backoff. Other HTTP errors are
+    raised immediately. When `session` is an openalex_client.OpenAlexClient,
+    responses it has cached are returned without waiting for a rate token.
+    """
+    http = session or requests
+    cached_json = getattr(http, "cached_json", None)
+    if cached_json is not None:
+        body = cached_json(url, params)
+        if body is not None:
+            return body
+    attempt = 0
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        response = None
+        try:
+            response = http.get(url, params=params)
+            if response.status_code not in RETRY_STATUS_CODES:
+                response.raise_for_status()
+                return json_codec.response_json(response)
+            error = f"HTTP {response.status_code}"
+        except requests.exceptions.HTTPError:
+            raise
+        except requests.exceptions.RequestException as e:
+            error = str(e)
+
+        if attempt >= max_retries:
+            raise requests.exceptions.RetryError(
+                f"Giving up on {url} after {attempt + 1} attempts: {error}"
+            )
+        delay = _retry_delay(response, attempt, backoff)
+        run_report.current().count("http_retries")
+        logger.warning(f"Request failed ({error}), retrying in {delay:.1f}s...")
+        time.sleep(delay)
+        attempt += 1
+
+
+def iter_work_pages(
+    params: Dict,
+    logger: logging.Logger,
+    url: str = OPENALEX_WORKS_URL,
+    rate_limiter: Optional[TokenBucket] = None,
+    max_workers: int = MAX_IN_FLIGHT,
+    session=None,
+    journal: Optional[PageJournal] = None,
+) -> Iterator[List[Dict]]:
+    """
+    Yields the results of every page of a works query, in page order.
+
+    The first page is requested with per_page=200 and page=1 to learn the
+    result count. When the query fits in the first 10,000 results that
+    page is kept and the remaining pages are requested by page number
+    through a bounded pool of `max_workers` in-flight requests, so every
+    page comes from the same ordering. Deeper queries are walked with
+    cursor pagination from cursor=* instead, which costs one more request
+    and is sequential by nature since each cursor comes from the previous
+    page.
+
+    When a journal is given, every page is written to disk as it arrives
+    and pages already journaled by an earlier run are read back instead of
+    being requested again. The journal is not marked complete here: the
+    caller does that once the pages are safely stored (see harvest).
+    """
+    params = {k: v for k, v in params.items() if k not in ("page", "cursor")}
+    params["per_page"] = PER_PAGE
+    rate_limiter = rate_limiter or TokenBucket()
+
+    def get(extra: Dict) -> Dict:
+        return fetch_page(
+            {**params, **extra}, logger, url=url, rate_limiter=rate_limiter, session=session
+        )
+
+    first = None
+    if journal is not None and journal.total_count is not None:
+        total_count = journal.total_count
+        mode = journal.mode
+        logger.info(f"Resuming from journal {journal.directory}")
+    else:
+        first = get({"page": 1})
+        total_count = first["meta"]["count"]
+        mode = "page" if total_count <= MAX_PAGED_RESULTS else "cursor"
+        if journal is not None:
+            journal.start(mode, total_count)
+    total_pages = (total_count + PER_PAGE - 1) // PER_PAGE  # Ceiling division
+    logger.info(f"Total publications found: {total_count}")
+    logger.info(f"Total pages to fetch: {total_pages}")
+
+    if mode == "page":
+        def fetch_numbered(page: int) -> List[Dict]:
+            if journal is not None and journal.has_page(page):
+                return journal.read_page(page)
+            data = first if page == 1 and first is not None else get({"page": page})
+            results = data.get("results", [])
+            if journal is not None:
+                journal.write_page(page, results)
+            return results
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            pages = iter(range(1, total_pages + 1))
+            for page in pages:
+                pending.append((page, executor.submit(fetch_numbered, page)))
+                if len(pending) >= max_workers:
+                    break
+            while pending:
+                page, future = pending.popleft()
+                results = future.result()
+                logger.info(f"Fetched page {page}/{total_pages}")
+                next_page = next(pages, None)
+                if next_page is not None:
+                    pending.append((next_page, executor.submit(fetch_numbered, next_page)))
+                yield results
+        return
+
+    # Too deep for page numbers: walk the query with cursor paging
+    logger.info("Result set exceeds paging limit, using cursor pagination...")
+    cursor = "*"
+    page = 0
+    if journal is not None:
+        page = journal.last_contiguous_page()
+        for done in range(1, page + 1):
+            yield journal.read_page(done)
+        if page:
+            cursor = journal.next_cursor(page)
+    while cursor:
+        data = get({"cursor": cursor})
+        results = data.get("results", [])
+        if not results:
+            break
+        page += 1
+        next_cursor = data["meta"].get("next_cursor")
+        if journal is not None:
+            journal.write_page(page, results, cursor=cursor, next_cursor=next_cursor)
+        logger.info(f"Fetched page {page}/{total_pages}")
+        yield results
+        cursor = next_cursor
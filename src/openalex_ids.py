@@ -0,0 +1,46 @@
+from typing import Iterable, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+OPENALEX_PREFIX = "https://openalex.org/"
+DOI_PREFIX = "https://doi.org/"
+
+
+def process_doi(doi: str) -> str:
+    """
+    Removes the 'https://doi.org/' prefix from a DOI string.
+    """
+    if doi and doi.startswith(DOI_PREFIX):
+        return doi.replace(DOI_PREFIX, "")
+    return doi
+
+
+def process_openalex_id(openalex_id: str) -> str:
+    """
+    Removes the 'https://openalex.org/' prefix from an OpenAlex ID string.
+    """
+    if openalex_id and openalex_id.startswith(OPENALEX_PREFIX):
+        return openalex_id.replace(OPENALEX_PREFIX, "")
+    return openalex_id
+
+
+def strip_prefix(values: Iterable, prefixes: Union[str, Tuple[str, ...]]) -> pd.Series:
+    """
+    Column-wise process_openalex_id/process_doi: removes the first of
+    `prefixes` that starts each string of `values`, with vectorized string
+    operations. Other values (missing ones included) are returned unchanged.
+    """
+    values = pd.Series(values, dtype=object)
+    result = values.copy()
+    pending = np.ones(len(values), dtype=bool)
+    for prefix in (prefixes,) if isinstance(prefixes, str) else prefixes:
+        starts = pending & np.array(values.str.startswith(prefix, na=False), dtype=bool)
+        if starts.any():
+            result[starts] = values[starts].str.slice(len(prefix))
+        pending &= ~starts
+    return result
+
+
+def strip_openalex_ids(values: Iterable) -> pd.Series:
+    return strip_prefix(values, OPENALEX_PREFIX)
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Optional
+
+import json_codec
+
+JOURNAL_DIR = "../data/journal"
+
+
+def _write_json_atomic(path: str, data) -> None:
+    """
+    Writes JSON to a temporary file and renames it over `path`, so a crash
+    never leaves a half-written file behind.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class PageJournal:
+    """
+    On-disk journal of the pages fetched for one (country, year, filter) harvest.
+
+    Every page is stored as its own JSON file as soon as it arrives, and a
+    small manifest records which pages (and the cursors used to fetch them)
+    are done. A restarted harvest reads finished pages back from disk and
+    only requests the missing ones.
+
+    Layout:
+      {root}/{country}/{year}/{filter hash}/manifest.json
+      {root}/{country}/{year}/{filter hash}/page_00001.json
+    """
+
+    def __init__(self, country: str, year: str, filter_query: str, root: str = JOURNAL_DIR):
+        filter_hash = hashlib.sha1(filter_query.encode("utf-8")).hexdigest()[:12]
+        self.directory = os.path.join(root, str(country), str(year), filter_hash)
+        self.manifest_path = os.path.join(self.directory, "manifest.json")
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {
+                "country": str(country),
+                "year": str(year),
+                "filter": filter_query,
+                "mode": None,
+                "total_count": None,
+                "pages": {},
+                "complete": False,
+            }
+
+    @property
+    def is_complete(self) -> bool:
+        return self.manifest["complete"]
+
+    @property
+    def mode(self) -> Optional[str]:
+        return self.manifest["mode"]
+
+    @property
+    def total_count(self) -> Optional[int]:
+        return self.manifest["total_count"]
+
+    def _page_path(self, page: int) -> str:
+        return os.path.join(self.directory, f"page_{page:05d}.json")
+
+    def start(self, mode: str, total_count: int) -> None:
+        """
+        Records the pagination mode and result count of the harvest.
+        Switching mode discards pages journaled under the previous one,
+        since page-number and cursor orderings are not interchangeable.
+        """
+        with self._lock:
+            if self.manifest["mode"] != mode:
+                for page in self.manifest["pages"]:
+                    path = self._page_path(int(page))
+                    if os.path.exists(path):
+                        os.remove(path)
+                self.manifest["pages"] = {}
+                self.manifest["complete"] = False
+            self.manifest["mode"] = mode
+            self.manifest["total_count"] = total_count
+            _write_json_atomic(self.manifest_path, self.manifest)
+
+    def has_page(self, page: int) -> bool:
+        return str(page) in self.manifest["pages"]
+
+    def write_page(
+        self,
+        page: int,
+        results: List[Dict],
+        cursor: Optional[str] = None,
+        next_cursor: Optional[str] = None,
+    ) -> None:
+        """
+        Stores a page of results and marks it as done in the manifest.
+        Safe to call from several fetcher threads.
+        """
+        _write_json_atomic(self._page_path(page), results)
+        with self._lock:
+            self.manifest["pages"][str(page)] = {
+                "cursor": cursor,
+                "next_cursor": next_cursor,
+                "count": len(results),
+            }
+            _write_json_atomic(self.manifest_path, self.manifest)
+
+    def read_page(self, page: int) -> List[Dict]:
+        with open(self._page_path(page), "rb") as f:
+            return json_codec.load(f)
+
+    def last_contiguous_page(self) -> int:
+        """
+        Returns the highest page number N such that pages 1..N are all journaled.
+        """
+        page = 0
+        while self.has_page(page + 1):
+            page += 1
+        return page
+
+    def next_cursor(self, page: int) -> Optional[str]:
+        return self.manifest["pages"][str(page)]["next_cursor"]
+
+    def iter_pages(self) -> Iterator[List[Dict]]:
+        """
+        Yields the journaled pages in page order.
+        """
+        for page in sorted(int(p) for p in self.manifest["pages"]):
+            yield self.read_page(page)
+
+    def mark_complete(self) -> None:
+        with self._lock:
+            self.manifest["complete"] = True
+            _write_json_atomic(self.manifest_path, self.manifest)
@@ -0,0 +1,229 @@
+import ast
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import json_codec
+from construct_network import PUBLICATIONS_STORE
+
+WORKS_FILE = "works.parquet"
+AUTHORSHIPS_FILE = "authorships.parquet"
+
+WORKS_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("doi", pa.string()),
+    ("title", pa.string()),
+    ("publication_year", pa.int64()),
+    ("cited_by_count", pa.int64()),
+    ("subfield_id", pa.string()),
+    ("subfield_name", pa.string()),
+    ("primary_topic_id", pa.string()),
+    ("primary_topic_name", pa.string()),
+    ("counts_by_year", pa.list_(pa.struct([
+        ("offset", pa.int64()),
+        ("cited_by_count", pa.int64()),
+    ]))),
+])
+
+AUTHORSHIPS_SCHEMA = pa.schema([
+    ("work_id", pa.string()),
+    ("position", pa.int32()),
+    ("author_id", pa.string()),
+    ("author_name", pa.string()),
+    ("country", pa.string()),
+    ("countries", pa.list_(pa.string())),
+    ("institution_ids", pa.list_(pa.string())),
+    ("institution_names", pa.list_(pa.string())),
+])
+
+
+def _missing(value) -> bool:
+    return value is None or (isinstance(value, float) and pd.isna(value))
+
+
+def _decode(value, parser=json_codec.loads):
+    """
+    Decodes a JSON-in-CSV cell; values that are already decoded pass through.
+    """
+    if _missing(value):
+        return None
+    if isinstance(value, str):
+        return parser(value) if value else None
+    return value
+
+
+def _int_or_none(value) -> Optional[int]:
+    return None if _missing(value) else int(value)
+
+
+def _str_or_none(value) -> Optional[str]:
+    return None if _missing(value) else value
+
+
+def processed_work_to_rows(work: Dict) -> Tuple[Dict, List[Dict]]:
+    """
+    Splits a work as produced by process_work (or read back from its CSV)
+    into one row of the works table and one row per authorship.
+    """
+    subfield = _decode(work.get("subfield")) or {}
+    # primary_topic is written to the CSV as a Python dict repr, not JSON
+    primary_topic = _decode(work.get("primary_topic"), ast.literal_eval) or {}
+    counts_by_year = _decode(work.get("counts_by_year")) or {}
+    authorships = _decode(work.get("authorships")) or []
+
+    work_id = _str_or_none(work.get("id"))
+    work_row = {
+        "id": work_id,
+        "doi": _str_or_none(work.get("doi")),
+        "title": _str_or_none(work.get("title")),
+        "publication_year": _int_or_none(work.get("publication_year")),
+        "cited_by_count": _int_or_none(work.get("cited_by_count")),
+        "subfield_id": subfield.get("id"),
+        "subfield_name": subfield.get("display_name"),
+        "primary_topic_id": primary_topic.get("id"),
+        "primary_topic_name": primary_topic.get("display_name"),
+        "counts_by_year": [
+            {"offset": int(key.split("_")[0]), "cited_by_count": count}
+            for key, count in counts_by_year.items()
+        ],
+    }
+
+    authorship_rows = []
+    for position, author in enumerate(authorships):
+        countries = author.get("countries") or []
+        institutions = author.get("institutions") or []
+        authorship_rows.append({
+            "work_id": work_id,
+            "position": position,
+            "author_id": author.get("id"),
+            "author_name": author.get("name"),
+            "country": countries[0] if countries else None,
+            "countries": countries,
+            "institution_ids": [inst.get("id") for inst in institutions],
+            "institution_names": [inst.get("display_name") for inst in institutions],
+        })
+    return work_row, authorship_rows
+
+
+class PublicationsStoreWriter:
+    """
+    Appends processed works to the works and authorships Parquet tables of
+    a store directory, one row group per call to write().
+    """
+
+    def __init__(self, store_dir: str = PUBLICATIONS_STORE):
+        os.makedirs(store_dir, exist_ok=True)
+        self._works = pq.ParquetWriter(os.path.join(store_dir, WORKS_FILE), WORKS_SCHEMA)
+        self._authorships = pq.ParquetWriter(
+            os.path.join(store_dir, AUTHORSHIPS_FILE), AUTHORSHIPS_SCHEMA
+        )
+
+    def write(self, processed_works: Iterable[Dict]) -> int:
+        work_rows = []
+        authorship_rows = []
+        for work in processed_works:
+            work_row, rows = processed_work_to_rows(work)
+            work_rows.append(work_row)
+            authorship_rows.extend(rows)
+        self._works.write_table(pa.Table.from_pylist(work_rows, schema=WORKS_SCHEMA))
+        self._authorships.write_table(
+            pa.Table.from_pylist(authorship_rows, schema=AUTHORSHIPS_SCHEMA)
+        )
+        return len(work_rows)
+
+    def close(self) -> None:
+        self._works.close()
+        self._authorships.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def convert_csv_to_store(
+    csv_file: str, store_dir: str = PUBLICATIONS_STORE, chunk_size: int = 10000
+) -> int:
+    """
+    Converts a publications CSV (JSON-in-CSV columns) into a Parquet store,
+    reading the CSV in chunks. Returns the number of works written.
+    """
+    total = 0
+    with PublicationsStoreWriter(store_dir) as writer:
+        for chunk in pd.read_csv(csv_file, chunksize=chunk_size):
+            total += writer.write(chunk.to_dict("records"))
+    return total
+
+
+def load_works(
+    store_dir: str = PUBLICATIONS_STORE,
+    columns: Optional[List[str]] = None,
+    subfields: Optional[List[str]] = None,
+    years: Optional[List[int]] = None,
+) -> pd.DataFrame:
+    """
+    Loads the works table, optionally restricted to some columns, subfields
+    and publication years. Filters are pushed down to the Parquet scan.
+    """
+    filters = []
+    if subfields is not None:
+        filters.append(("subfield_name", "in", list(subfields)))
+    if years is not None:
+        filters.append(("publication_year", "in", [int(year) for year in years]))
+    table = pq.read_table(
+        os.path.join(store_dir, WORKS_FILE), columns=columns, filters=filters or None
+    )
+    return table.to_pandas()
+
+
+def load_authorships(
+    store_dir: str = PUBLICATIONS_STORE,
+    columns: Optional[List[str]] = None,
+    work_ids: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """
+    Loads the authorships table, optionally restricted to some columns and works.
+    """
+    filters = None
+    if work_ids is not None:
+        filters = [("work_id", "in", list(work_ids))]
+    table = pq.read_table(
+        os.path.join(store_dir, AUTHORSHIPS_FILE), columns=columns, filters=filters
+    )
+    return table.to_pandas()
+
+
+def load_publications(
+    store_dir: str = PUBLICATIONS_STORE,
+    subfields: Optional[List[str]] = None,
+    years: Optional[List[int]] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Loads the columns construct_network needs: the works table (id, year,
+    subfield name) and the authorships of those works.
+    """
+    works = load_works(
+        store_dir,
+        columns=["id", "publication_year", "subfield_name"],
+        subfields=subfields,
+        years=years,
+    )
+    work_ids = works["id"] if subfields is not None or years is not None else None
+    authorships = load_authorships(
+        store_dir, columns=["work_id", "position", "author_id", "country"], work_ids=work_ids
+    )
+    return works, authorships
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python publications_store.py <publications.csv> [store_dir]")
+        sys.exit(1)
+    store_dir = sys.argv[2] if len(sys.argv) == 3 else PUBLICATIONS_STORE
+    num_works = convert_csv_to_store(sys.argv[1], store_dir)
+    print(f"Wrote {num_works} works to {store_dir}")
@@ -0,0 +1,198 @@
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+REPORT_DIR = "../data/reports"
+
+PROFILERS = ["cprofile", "tracemalloc"]
+
+# Opt-in profiler (one of PROFILERS) when a script is not given one
+PROFILE_ENV = "RUN_PROFILE"
+
+# Functions / allocation sites listed in the report by the profilers
+PROFILE_TOP = 25
+
+
+def _peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class RunReport:
+    """
+    Thread-safe timings and counters of one pipeline run.
+
+      stages     name -> total seconds and number of calls
+      counters   name -> integer count (works processed, bytes, retries, ...)
+      samples    name -> individual measurements summarized as percentiles
+                 (e.g. HTTP latency)
+
+    to_dict() returns the machine-readable JSON report written by finish_run.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.datetime.now().isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict] = {}
+        self.counters: Dict[str, int] = {}
+        self.samples: Dict[str, List[float]] = {}
+        self.profile: Optional[Dict] = None
+
+    def add_time(self, stage: str, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["calls"] += calls
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def sample(self, name: str, value: float) -> None:
+        with self._lock:
+            self.samples.setdefault(name, []).append(value)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Times the enclosed block as one call of stage `name`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            samples = {}
+            for name, values in self.samples.items():
+                values = np.asarray(values, dtype=float)
+                samples[name] = {
+                    "count": int(len(values)),
+                    "mean": float(values.mean()),
+                    "p50": float(np.percentile(values, 50)),
+                    "p90": float(np.percentile(values, 90)),
+                    "p99": float(np.percentile(values, 99)),
+                    "max": float(values.max()),
+                }
+            report = {
+                "name": self.name,
+                "started_at": self.started_at,
+                "wall_seconds": time.perf_counter() - self._start,
+                "peak_rss_mb": _peak_rss_mb(),
+                "stages": {name: dict(entry) for name, entry in self.stages.items()},
+                "counters": dict(self.counters),
+                "samples": samples,
+            }
+        if self.profile is not None:
+            report["profile"] = self.profile
+        return report
+
+
+_current = RunReport("default")
+_profiler = None
+
+
+def current() -> RunReport:
+    """
+    Returns the report of the running pipeline. Instrumented functions record
+    into it, so they need no extra parameter.
+    """
+    return _current
+
+
+def stage(name: str):
+    return _current.stage(name)
+
+
+def timed_iter(iterable: Iterable, name: str) -> Iterator:
+    """
+    Yields the items of `iterable`, timing the production of each one as a
+    call of stage `name` (e.g. partitions built lazily by a generator).
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        _current.add_time(name, time.perf_counter() - start)
+        yield item
+
+
+def start_run(name: str, profile: Optional[str] = None) -> RunReport:
+    """
+    Starts a new run report, and the opt-in profiler when `profile` (or the
+    RUN_PROFILE environment variable) is 'cprofile' or 'tracemalloc'.
+    """
+    global _current, _profiler
+    _current = RunReport(name)
+    profile = profile or os.environ.get(PROFILE_ENV)
+    if profile == "cprofile":
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    elif profile == "tracemalloc":
+        tracemalloc.start()
+        _profiler = "tracemalloc"
+    elif profile:
+        raise ValueError(f"Unknown profiler {profile!r}")
+    return _current
+
+
+def _stop_profiler(report_path: str) -> Optional[Dict]:
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return None
+    if profiler == "tracemalloc":
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            "kind": "tracemalloc",
+            "peak_traced_mb": peak / (1024 * 1024),
+            "top_allocations": [
+                {"site": str(stat.traceback), "size_mb": stat.size / (1024 * 1024), "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:PROFILE_TOP]
+            ],
+        }
+
+    profiler.disable()
+    profile_path = report_path.replace(".json", ".prof")
+    profiler.dump_stats(profile_path)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    return {"kind": "cprofile", "stats_file": profile_path, "top_cumulative": text.getvalue().splitlines()}
+
+
+def finish_run(report_dir: str = REPORT_DIR) -> str:
+    """
+    Stops the profiler, writes the current report to
+    {report_dir}/{name}_{timestamp}.json and returns its path.
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(report_dir, f"{_current.name}_{timestamp}.json")
+    _current.profile = _stop_profiler(path)
+    with open(path, "w") as f:
+        json.dump(_current.to_dict(), f, indent=2)
+    return path
@@ -0,0 +1,283 @@
+import argparse
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+AUTHORS_METRICS_CSV = "../data/csv/openalex/authors_metrics.csv"
+DOM_INT_CSV = "../data/csv/openalex/summary_dom_int.csv"
+COUNTRIES_COLLABS_CSV = "../data/csv/countries_collabs.csv"
+COUNTRIES_SUBFIELDS_CSV = "../data/csv/openalex/countries_subfields.csv"
+SUBFIELDS_CSV = "../data/csv/openalex/unique_subfields.csv"
+
+HOME_COUNTRY = "BR"
+
+PAGE_SIZE = 200
+
+# Works generated from one random stream; pages of any size are cut from these blocks
+BLOCK_SIZE = 200
+
+# Distinct authors per work; the BR corpus has roughly one new author per work
+AUTHORS_PER_WORK = 1.0
+
+# Author productivity skew: author index = pool size * u ** AUTHOR_SKEW for a
+# uniform u, so a few authors appear on many works (Lotka-like heavy tail)
+AUTHOR_SKEW = 3.0
+
+INSTITUTIONS_PER_COUNTRY = 400
+
+# Share of the foreign authors of an international work beyond the first one
+FOREIGN_AUTHOR_SHARE = 0.3
+
+# Authorships without an author id, as OpenAlex returns for some works
+MISSING_AUTHOR_RATE = 0.002
+
+# Foreign countries outside the top collaborators of countries_collabs.csv
+OTHER_COUNTRIES = ["AR", "CL", "MX", "CO", "NL", "CH", "AU", "JP", "KR", "SE"]
+
+# Share of foreign authorships that are not from the countries_collabs.csv top list
+OTHER_COUNTRIES_SHARE = 0.37
+
+
+def load_profile(home_country: str = HOME_COUNTRY) -> Dict:
+    """
+    Loads the corpus statistics the generator reproduces from the checked-in
+    tables:
+
+      subfields       display name -> OpenAlex subfield id
+      subfield_share  share of works per subfield (summary_dom_int.csv)
+      international   share of international works per subfield
+      authors_mean    mean authors per work per subfield (authors_metrics.csv)
+      authors_std     standard deviation of authors per work per subfield
+      years           publication years and their share (countries_subfields.csv)
+      countries       foreign countries and their share of foreign authorships
+                      (countries_collabs.csv plus OTHER_COUNTRIES)
+    """
+    subfield_ids = pd.read_csv(SUBFIELDS_CSV)
+    metrics = pd.read_csv(AUTHORS_METRICS_CSV).set_index("subfield")
+    dom_int = pd.read_csv(DOM_INT_CSV).set_index("subfield_display")
+    counts = pd.read_csv(COUNTRIES_SUBFIELDS_CSV)
+    collabs = pd.read_csv(COUNTRIES_COLLABS_CSV)
+
+    names = [name for name in subfield_ids["subfield_display_name"] if name in dom_int.index]
+    totals = dom_int.loc[names, "total_publications"].to_numpy(dtype=float)
+    years = counts[counts["country_code"] == home_country].groupby("publication_year")["count"].sum()
+    top_share = collabs["percentage"].to_numpy(dtype=float)
+    country_share = np.concatenate([
+        top_share / top_share.sum() * (1 - OTHER_COUNTRIES_SHARE),
+        np.full(len(OTHER_COUNTRIES), OTHER_COUNTRIES_SHARE / len(OTHER_COUNTRIES)),
+    ])
+
+    return {
+        "subfields": dict(zip(subfield_ids["subfield_display_name"], subfield_ids["subfield_id"])),
+        "subfield_names": names,
+        "subfield_share": totals / totals.sum(),
+        "international": dom_int.loc[names, "international_percentage"].to_numpy(dtype=float) / 100,
+        "authors_mean": metrics.loc[names, "avg_authors"].to_numpy(dtype=float),
+        "authors_std": metrics.loc[names, "stdv_authors"].to_numpy(dtype=float),
+        "years": years.index.to_numpy(dtype=int),
+        "year_share": years.to_numpy(dtype=float) / years.sum(),
+        "home_country": home_country,
+        "countries": list(collabs["authors_country"]) + OTHER_COUNTRIES,
+        "country_share": country_share,
+    }
+
+
+def sample_author_counts(rng: np.random.Generator, mean: np.ndarray, std: np.ndarray) -> np.ndarray:
+    """
+    Samples authors per work as 1 + a negative binomial with the given mean
+    and standard deviation per work, which reproduces the long tail of
+    hyper-authored papers (a Poisson would be far too thin).
+    """
+    excess = np.maximum(mean - 1, 1e-6)
+    variance = np.maximum(std ** 2, excess * 1.01)
+    p = excess / variance
+    n = excess * p / (1 - p)
+    return 1 + rng.negative_binomial(n, p)
+
+
+def _hashed(values: np.ndarray, salt: int) -> np.ndarray:
+    """
+    Deterministic pseudo-random floats in [0, 1) per integer, so an author
+    keeps the same country and institution in every work.
+    """
+    mixed = (values.astype(np.uint64) + np.uint64(salt)) * np.uint64(0x9E3779B97F4A7C15)
+    return (mixed >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+class SyntheticCorpus:
+    """
+    Deterministic generator of raw OpenAlex-shaped works with the
+    distributions of the BR corpus (see load_profile): subfield and year
+    mix, authors per work with a heavy tail, domestic/international share
+    per subfield, foreign countries of collaborators and skewed author
+    productivity, so the generated co-authorship networks have hubs.
+
+    Works are generated in blocks of BLOCK_SIZE with numpy, each block from
+    its own random stream, so corpora of millions of works stream in
+    constant memory. The same (num_works, seed) always yields the same
+    works, whatever page size they are read with.
+    """
+
+    def __init__(self, num_works: int, seed: int = 0, profile: Optional[Dict] = None):
+        self.num_works = int(num_works)
+        self.seed = seed
+        self.profile = profile or load_profile()
+        self.domestic_authors = max(1, int(self.num_works * AUTHORS_PER_WORK))
+        self.foreign_authors = max(1, self.domestic_authors // 2)
+        self._country_bins = np.cumsum(self.profile["country_share"])
+        self._last_block = (None, [])
+
+    def _pick_authors(self, rng: np.random.Generator, pool: int, size: int) -> np.ndarray:
+        return (pool * rng.random(size) ** AUTHOR_SKEW).astype(np.int64)
+
+    def _foreign_countries(self, authors: np.ndarray) -> np.ndarray:
+        """
+        Returns the index in profile["countries"] of each foreign author.
+        """
+        codes = np.searchsorted(self._country_bins, _hashed(authors, 1) * self._country_bins[-1], side="right")
+        return np.minimum(codes, len(self.profile["countries"]) - 1)
+
+    def _work(self, i: int, year: int, subfield: str, cited_by: int, authorships: List[Dict], counts: List[int]) -> Dict:
+        subfield_id = self.profile["subfields"][subfield].split("/")[-1]
+        return {
+            "id": f"https://openalex.org/W{i}",
+            "doi": f"https://doi.org/10.5555/synthetic.{i}",
+            "title": f"Synthetic work {i}",
+            "publication_year": year,
+            "authorships": authorships,
+            "primary_topic": {
+                "id": f"https://openalex.org/T{subfield_id}0",
+                "display_name": f"{subfield} topic",
+                "subfield": {
+                    "id": f"https://openalex.org/subfields/{subfield_id}",
+                    "display_name": subfield,
+                },
+            },
+            "cited_by_count": cited_by,
+            "counts_by_year": [
+                {"year": y, "cited_by_count": count} for y, count in zip(range(2024, year - 1, -1), counts)
+            ],
+        }
+
+    def page(self, start: int, size: int) -> List[Dict]:
+        """
+        Returns works start .. start + size - 1, cut from the blocks that
+        cover them, so pages can be generated independently and in any order.
+        """
+        works = []
+        end = min(start + size, self.num_works)
+        for block in range(start // BLOCK_SIZE, (end - 1) // BLOCK_SIZE + 1):
+            block_start = block * BLOCK_SIZE
+            works.extend(self._block(block)[max(start - block_start, 0):end - block_start])
+        return works
+
+    def _block(self, block: int) -> List[Dict]:
+        """
+        Generates the works of one block from the (seed, block start) stream.
+        The last block generated is kept, for pages that share it.
+        """
+        if self._last_block[0] == block:
+            return self._last_block[1]
+        start = block * BLOCK_SIZE
+        size = min(BLOCK_SIZE, self.num_works - start)
+        profile = self.profile
+        rng = np.random.default_rng([self.seed, start])
+        subfield_codes = rng.choice(len(profile["subfield_names"]), size=size, p=profile["subfield_share"])
+        years = rng.choice(profile["years"], size=size, p=profile["year_share"])
+        num_authors = sample_author_counts(
+            rng, profile["authors_mean"][subfield_codes], profile["authors_std"][subfield_codes]
+        )
+        international = (rng.random(size) < profile["international"][subfield_codes]) & (num_authors > 1)
+        num_foreign = np.where(
+            international, 1 + rng.binomial(np.maximum(num_authors - 2, 0), FOREIGN_AUTHOR_SHARE), 0
+        )
+        cited_by = rng.geometric(0.08, size=size) - 1
+
+        total = int(num_authors.sum())
+        domestic = self._pick_authors(rng, self.domestic_authors, total)
+        foreign = self._pick_authors(rng, self.foreign_authors, total)
+        missing = rng.random(total) < MISSING_AUTHOR_RATE
+        foreign_countries = self._foreign_countries(foreign)
+        # Institution ids are blocks of INSTITUTIONS_PER_COUNTRY, the home country first
+        institutions = (_hashed(domestic, 2) * INSTITUTIONS_PER_COUNTRY).astype(np.int64)
+        foreign_institutions = (
+            (foreign_countries + 1) * INSTITUTIONS_PER_COUNTRY
+            + (_hashed(foreign, 3) * INSTITUTIONS_PER_COUNTRY).astype(np.int64)
+        )
+        yearly = rng.geometric(0.3, size=size * 6) - 1
+
+        works = []
+        offset = 0
+        for j in range(size):
+            authorships = []
+            n = int(num_authors[j])
+            first_foreign = n - int(num_foreign[j])
+            for k in range(offset, offset + n):
+                # Even author ids are domestic, odd ones foreign
+                if k - offset >= first_foreign:
+                    author = f"https://openalex.org/A{2 * int(foreign[k]) + 1}"
+                    country = profile["countries"][foreign_countries[k]]
+                    institution = int(foreign_institutions[k])
+                else:
+                    author = f"https://openalex.org/A{2 * int(domestic[k])}"
+                    country = profile["home_country"]
+                    institution = int(institutions[k])
+                authorships.append({
+                    "author": {} if missing[k] else {"id": author, "display_name": f"Author {author[22:]}"},
+                    "institutions": [{
+                        "id": f"https://openalex.org/I{institution}",
+                        "display_name": f"Institution {institution}",
+                    }],
+                    "countries": [country],
+                })
+            offset += n
+            year = int(years[j])
+            works.append(self._work(
+                start + j,
+                year,
+                profile["subfield_names"][subfield_codes[j]],
+                int(cited_by[j]),
+                authorships,
+                [int(count) for count in yearly[6 * j: 6 * j + 2025 - year]],
+            ))
+        self._last_block = (block, works)
+        return works
+
+    def pages(self, page_size: int = PAGE_SIZE) -> Iterator[List[Dict]]:
+        """
+        Yields pages of works, like iter_work_pages does for the API.
+        """
+        for start in range(0, self.num_works, page_size):
+            yield self.page(start, min(page_size, self.num_works - start))
+
+
+def author_count_stats(pages) -> pd.DataFrame:
+    """
+    Summarizes authors per work by subfield, in the layout of authors_metrics.csv.
+    """
+    rows = [
+        (work["primary_topic"]["subfield"]["display_name"], len(work["authorships"]))
+        for results in pages
+        for work in results
+    ]
+    df = pd.DataFrame(rows, columns=["subfield", "authors"])
+    stats = df.groupby("subfield")["authors"].agg(["mean", "median", "std"])
+    stats.loc["All Subfields"] = [df["authors"].mean(), df["authors"].median(), df["authors"].std()]
+    return stats.rename(columns={"mean": "avg_authors", "median": "median_authors", "std": "stdv_authors"})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic OpenAlex corpus.")
+    parser.add_argument("num_works", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the processed works to this CSV (as the collector does)")
+    args = parser.parse_args()
+    corpus = SyntheticCorpus(args.num_works, args.seed)
+    if args.output:
+        from collect_publications_open_alex import iter_processed_works, write_works_csv
+
+        print(f"Wrote {write_works_csv(iter_processed_works(corpus.pages()), args.output)} works to {args.output}")
+    else:
+        expected = pd.read_csv(AUTHORS_METRICS_CSV).set_index("subfield")
+        print(author_count_stats(corpus.pages()).join(expected, rsuffix="_br").round(2).to_string())
@@ -0,0 +1,321 @@
+import argparse
+import json
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from construct_network import SUBFIELDS, YEARS, iter_subfield_year_arrays, load_exploded_corpus
+from edge_builder import NetworkArrays
+from gexf_stream import write_network_arrays_gexf
+from graph_cache import _encode_labels
+
+TEMPORAL_DIR = "../data/graphs/temporal"
+
+META_FILE = "meta.json"
+ARRAY_FILES = (
+    "node_ids",
+    "edge_source",
+    "edge_target",
+    "node_year_offsets",
+    "node_year_node",
+    "node_year_label1",
+    "node_year_label2",
+    "edge_year_offsets",
+    "edge_year_edge",
+    "edge_year_weight",
+)
+
+
+class NetworkDiff(NamedTuple):
+    """
+    Differences between two snapshots of a temporal network. Nodes are
+    indices into node_ids, edges indices into edge_source/edge_target.
+    """
+    added_nodes: np.ndarray
+    removed_nodes: np.ndarray
+    added_edges: np.ndarray
+    dropped_edges: np.ndarray
+    continued_edges: np.ndarray
+
+
+class TemporalNetwork:
+    """
+    Collaboration network of one subfield over several years.
+
+    Instead of one graph per year, every distinct author and edge is stored
+    once, and the years are sparse tables over them:
+
+      node_ids                       every author that appears in some year
+      edge_source / edge_target      every distinct edge, as node indices;
+                                     the source has the smaller author id
+      node_year_*                    (node, label1, label2) of each author
+                                     active in a year
+      edge_year_edge / _weight       (edge, weight) of each edge active in
+                                     a year
+
+    Rows of the year tables are grouped by year (the *_offsets arrays give
+    each year's range) and, within a year, in the node and edge order of
+    that year's network, so snapshot(year) is the exact NetworkArrays
+    build_network_arrays returns for it. Storage grows with the distinct
+    edges plus the active (edge, year) pairs, not with edges x years.
+    """
+
+    def __init__(self, years: List[int], arrays: Dict[str, np.ndarray], label1_values: List, label2_values: List):
+        self.years = [int(year) for year in years]
+        for name in ARRAY_FILES:
+            setattr(self, name, arrays[name])
+        self.label1_values = np.array(label1_values, dtype=object)
+        self.label2_values = np.array(label2_values, dtype=object)
+
+    @classmethod
+    def from_snapshots(cls, snapshots: Iterable[Tuple[int, NetworkArrays]]) -> "TemporalNetwork":
+        """
+        Merges yearly networks (see edge_builder.build_network_arrays), given
+        as (year, NetworkArrays) in year order, into one temporal network.
+        """
+        years = []
+        node_index: Dict[str, int] = {}
+        edge_index: Dict[Tuple[int, int], int] = {}
+        node_years, label1, label2, edge_years, weights = [], [], [], [], []
+        node_offsets, edge_offsets = [0], [0]
+        for year, arrays in snapshots:
+            years.append(year)
+            nodes = np.fromiter(
+                (node_index.setdefault(node_id, len(node_index)) for node_id in arrays.node_ids.tolist()),
+                dtype=np.int64,
+                count=len(arrays.node_ids),
+            )
+            node_years.append(nodes)
+            label1.append(arrays.label1)
+            label2.append(arrays.label2)
+            edges = np.fromiter(
+                (
+                    edge_index.setdefault(pair, len(edge_index))
+                    for pair in zip(nodes[arrays.source].tolist(), nodes[arrays.target].tolist())
+                ),
+                dtype=np.int64,
+                count=len(arrays.weight),
+            )
+            edge_years.append(edges)
+            weights.append(arrays.weight)
+            node_offsets.append(node_offsets[-1] + len(nodes))
+            edge_offsets.append(edge_offsets[-1] + len(edges))
+
+        def concat(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+        label1_codes, label1_values = _encode_labels(concat(label1, object))
+        label2_codes, label2_values = _encode_labels(concat(label2, object))
+        pairs = np.array(list(edge_index), dtype=np.int64).reshape(-1, 2)
+        arrays = {
+            "node_ids": np.array(list(node_index), dtype=object),
+            "edge_source": pairs[:, 0].astype(np.int32),
+            "edge_target": pairs[:, 1].astype(np.int32),
+            "node_year_offsets": np.array(node_offsets, dtype=np.int64),
+            "node_year_node": concat(node_years, np.int32),
+            "node_year_label1": label1_codes,
+            "node_year_label2": label2_codes,
+            "edge_year_offsets": np.array(edge_offsets, dtype=np.int64),
+            "edge_year_edge": concat(edge_years, np.int32),
+            "edge_year_weight": concat(weights, np.int64),
+        }
+        return cls(years, arrays, label1_values, label2_values)
+
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    def number_of_edges(self) -> int:
+        return len(self.edge_source)
+
+    def _year_position(self, year: int) -> int:
+        try:
+            return self.years.index(int(year))
+        except ValueError:
+            raise KeyError(f"year {year} is not in the temporal network ({self.years})") from None
+
+    def _rows(self, offsets: np.ndarray, start: int, end: int) -> slice:
+        """
+        Row range of the year tables covering years[start..end].
+        """
+        return slice(int(offsets[start]), int(offsets[end + 1]))
+
+    def _arrays(self, node_rows: slice, edge_rows: slice) -> NetworkArrays:
+        """
+        Builds NetworkArrays from ranges of the year tables. Nodes and edges
+        listed in several years keep their first row: the first year's labels
+        and position, and the summed weight.
+        """
+        nodes = np.asarray(self.node_year_node[node_rows], dtype=np.int64)
+        _, first = np.unique(nodes, return_index=True)
+        first = np.sort(first)
+        nodes = nodes[first]
+        position = np.full(len(self.node_ids), -1, dtype=np.int64)
+        position[nodes] = np.arange(len(nodes))
+
+        edges = np.asarray(self.edge_year_edge[edge_rows], dtype=np.int64)
+        weights = np.asarray(self.edge_year_weight[edge_rows], dtype=np.int64)
+        unique_edges, first_edge, inverse = np.unique(edges, return_index=True, return_inverse=True)
+        summed = np.bincount(inverse, weights=weights, minlength=len(unique_edges)).astype(np.int64)
+        order = np.argsort(first_edge, kind="stable")
+        edges = unique_edges[order]
+        return NetworkArrays(
+            np.asarray(self.node_ids[nodes], dtype=object),
+            self.label1_values[self.node_year_label1[node_rows][first]] if len(nodes) else np.empty(0, dtype=object),
+            self.label2_values[self.node_year_label2[node_rows][first]] if len(nodes) else np.empty(0, dtype=object),
+            position[self.edge_source[edges]],
+            position[self.edge_target[edges]],
+            summed[order],
+        )
+
+    def snapshot(self, year: int) -> NetworkArrays:
+        """
+        Returns the network of a single year.
+        """
+        i = self._year_position(year)
+        return self._arrays(self._rows(self.node_year_offsets, i, i), self._rows(self.edge_year_offsets, i, i))
+
+    def window(self, start_year: int, end_year: int) -> NetworkArrays:
+        """
+        Returns the network of the works published from start_year to
+        end_year (inclusive): edge weights are summed over the years, and
+        each author keeps the labels of their first year in the window.
+        """
+        start, end = self._year_position(start_year), self._year_position(end_year)
+        if start > end:
+            raise ValueError(f"window start {start_year} is after its end {end_year}")
+        return self._arrays(
+            self._rows(self.node_year_offsets, start, end), self._rows(self.edge_year_offsets, start, end)
+        )
+
+    def _year_nodes(self, year: int) -> np.ndarray:
+        i = self._year_position(year)
+        return np.asarray(self.node_year_node[self._rows(self.node_year_offsets, i, i)], dtype=np.int64)
+
+    def _year_edges(self, year: int) -> np.ndarray:
+        i = self._year_position(year)
+        return np.asarray(self.edge_year_edge[self._rows(self.edge_year_offsets, i, i)], dtype=np.int64)
+
+    def diff(self, year_from: int, year_to: int) -> NetworkDiff:
+        """
+        Compares the networks of two years.
+        """
+        nodes_from, nodes_to = self._year_nodes(year_from), self._year_nodes(year_to)
+        edges_from, edges_to = self._year_edges(year_from), self._year_edges(year_to)
+        return NetworkDiff(
+            np.setdiff1d(nodes_to, nodes_from),
+            np.setdiff1d(nodes_from, nodes_to),
+            np.setdiff1d(edges_to, edges_from),
+            np.setdiff1d(edges_from, edges_to),
+            np.intersect1d(edges_from, edges_to),
+        )
+
+    def deltas(self) -> pd.DataFrame:
+        """
+        Per-year changes: authors and collaborations active in the year, new
+        authors (never seen in an earlier year), returning authors (seen
+        before, but not the year before), and collaborations that are new,
+        dropped or continued relative to the previous year.
+        """
+        seen = np.zeros(len(self.node_ids), dtype=bool)
+        rows = []
+        for i, year in enumerate(self.years):
+            nodes = self._year_nodes(year)
+            row = {
+                "year": year,
+                "authors": len(nodes),
+                "collaborations": len(self._year_edges(year)),
+                "new_authors": int((~seen[nodes]).sum()),
+            }
+            if i:
+                diff = self.diff(self.years[i - 1], year)
+                row["returning_authors"] = int(seen[diff.added_nodes].sum())
+                row["new_collaborations"] = len(diff.added_edges)
+                row["dropped_collaborations"] = len(diff.dropped_edges)
+                row["continued_collaborations"] = len(diff.continued_edges)
+            rows.append(row)
+            seen[nodes] = True
+        return pd.DataFrame(rows).fillna(0).astype(int)
+
+    def save(self, directory: str) -> None:
+        """
+        Writes the network as .npy arrays plus meta.json (years and label values).
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_FILES:
+            values = getattr(self, name)
+            if name == "node_ids":
+                values = values.astype(str) if len(values) else np.empty(0, dtype="<U1")
+            np.save(os.path.join(directory, f"{name}.npy"), values)
+        with open(os.path.join(directory, META_FILE), "w") as f:
+            json.dump({
+                "years": self.years,
+                "num_nodes": self.number_of_nodes(),
+                "num_edges": self.number_of_edges(),
+                "label1": self.label1_values.tolist(),
+                "label2": self.label2_values.tolist(),
+            }, f)
+
+
+def load_temporal_network(directory: str, mmap: bool = True) -> TemporalNetwork:
+    """
+    Loads a network written by TemporalNetwork.save. The year tables are
+    memory-mapped, so only the years that are queried are read from disk.
+    """
+    mmap_mode = "r" if mmap else None
+    arrays = {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAY_FILES
+    }
+    arrays["node_ids"] = np.asarray(arrays["node_ids"]).astype(object)
+    with open(os.path.join(directory, META_FILE), "r") as f:
+        meta = json.load(f)
+    return TemporalNetwork(meta["years"], arrays, meta["label1"], meta["label2"])
+
+
+def temporal_network_path(subfield: str, root: Optional[str] = None) -> str:
+    return os.path.join(root or TEMPORAL_DIR, subfield)
+
+
+def build_temporal_networks(exploded, pub_years, subfields=SUBFIELDS, years=YEARS) -> Dict[str, TemporalNetwork]:
+    """
+    Builds the temporal network of every subfield from an exploded authorship
+    table (see construct_network.load_exploded_corpus).
+    """
+    by_subfield = {subfield: [] for subfield in subfields}
+    for (subfield, year), arrays in iter_subfield_year_arrays(exploded, pub_years, subfields, years):
+        by_subfield[subfield].append((year, arrays))
+    return {subfield: TemporalNetwork.from_snapshots(snapshots) for subfield, snapshots in by_subfield.items()}
+
+
+def main(command: str, window: Optional[Tuple[int, int]] = None, root: str = TEMPORAL_DIR):
+    if command == "build":
+        exploded, pub_years = load_exploded_corpus()
+        for subfield, network in build_temporal_networks(exploded, pub_years).items():
+            network.save(temporal_network_path(subfield, root))
+            print(f"{subfield}: {network.number_of_nodes()} authors, {network.number_of_edges()} distinct edges")
+        return
+
+    for subfield in SUBFIELDS:
+        network = load_temporal_network(temporal_network_path(subfield, root))
+        if command == "deltas":
+            print(f"\n{subfield}\n{network.deltas().to_string(index=False)}")
+        else:
+            start, end = window
+            output_file = os.path.join(root, f"{subfield}_{start}-{end}.gexf")
+            write_network_arrays_gexf(network.window(start, end), output_file)
+            print(f"Graph successfully written to {output_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the per-subfield temporal networks.")
+    parser.add_argument(
+        "command",
+        choices=["build", "deltas", "window"],
+        help="build from the corpus, print per-year deltas, or export a window of years to GEXF",
+    )
+    parser.add_argument("--years", nargs=2, type=int, metavar=("START", "END"), help="window of years to export")
+    args = parser.parse_args()
+    if args.command == "window" and not args.years:
+        parser.error("window needs --years START END")
+    main(args.command, args.years)
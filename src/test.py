@@ -1,9 +1,62 @@
 import requests
+import numpy as np
 import pandas as pd
+import networkx as nx
+import functools
 import json
 import logging
+import os
+import random
+import sys
+import tempfile
+import threading
 import time
-from typing import Dict, List
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import collect_publications_open_alex
+import corpus_metrics
+import get_publication_counts_country
+import get_publication_counts_subfields
+import incremental_network
+import run_report
+from construct_network import (
+    SUBFIELDS,
+    YEARS,
+    build_collaboration_network,
+    build_collaboration_network_from_tables,
+    build_network_from_publications,
+    filter_publications_by_year,
+    filter_subfielf_publications,
+    get_author_country,
+    iter_csv_publications,
+    iter_subfield_year_arrays,
+    store_is_current,
+)
+from author_disambiguation import disambiguate, load_author_remap
+from dedup_index import (
+    WorkIndex,
+    merge_partitions,
+    normalize_doi,
+    normalize_doi_column,
+    normalize_work_id,
+    normalize_work_id_column,
+)
+from edge_builder import NetworkArrays, build_network_arrays, explode_publications, explode_tables, network_arrays_to_graph, remap_authors
+from external_network import build_network_arrays_external
+from gexf_stream import read_gexf_stream, write_graph_gexf, write_network_arrays_gexf
+from graph_cache import load_csr_cache, write_csr_cache
+from graph_metrics import betweenness_centralization, graph_metrics
+from harvest_driver import run_harvest
+from network_projections import ENTITY_EXTRACTORS, PROJECTIONS, build_projection, iter_csv_authors, iter_store_authors
+from openalex_client import OpenAlexClient, ResponseCache
+from openalex_fetcher import MAX_PAGED_RESULTS, TokenBucket, iter_work_pages
+from openalex_ids import DOI_PREFIX, OPENALEX_PREFIX, process_doi, process_openalex_id, strip_openalex_ids, strip_prefix
+from page_journal import PageJournal
+from publications_store import convert_csv_to_store, load_publications, processed_work_to_rows
+from synthetic_corpus import SyntheticCorpus
+from temporal_network import build_temporal_networks, load_temporal_network
 
 PUBLICATION_YEAR = [
     # "2024",
@@ -53,22 +106,6 @@ def setup_logging(log_file: str = "open_alex_publications.log") -> None:
     console_handler.setFormatter(console_formatter)
     logger.addHandler(console_handler)
 
-def process_doi(doi: str) -> str:
-    """
-    Removes the 'https://doi.org/' prefix from a DOI string.
-    """
-    if doi and doi.startswith("https://doi.org/"):
-        return doi.replace("https://doi.org/", "")
-    return doi
-
-def process_openalex_id(openalex_id: str) -> str:
-    """
-    Removes the 'https://openalex.org/' prefix from an OpenAlex ID string.
-    """
-    if openalex_id and openalex_id.startswith("https://openalex.org/"):
-        return openalex_id.replace("https://openalex.org/", "")
-    return openalex_id
-
 def load_local_data(file_path: str = "data.json") -> List[Dict]:
     """
     Loads test data from a local JSON file.
@@ -83,79 +120,1160 @@ def load_local_data(file_path: str = "data.json") -> List[Dict]:
         logging.error(f"Error loading local data from {file_path}: {e}")
         return []
 
-def process_work(work: Dict) -> Dict:
-    """
-    Processes a single work to extract and flatten required fields,
-    while removing DOI and OpenAlex URL prefixes.
-    
-    For the counts_by_year field, instead of keeping the original years,
-    the citations are saved with keys representing the offset relative to the publication year.
-    For example, if a work was published in 2020:
-      - The number of citations in 2020 will be stored as "0_year"
-      - The number of citations in 2021 will be stored as "1_year", etc.
-    """
-    processed = {
-        "id": process_openalex_id(work.get("id")),
-        "doi": process_doi(work.get("doi")),
-        "title": work.get("title"),
-        "publication_year": work.get("publication_year"),
-        "authorships": [],
-        "subfield": {},
-        "cited_by_count": work.get("cited_by_count"),
-        "counts_by_year": ""  # will update below
-    }
+def make_stub_handler(template_works: List[Dict], total_count: int, fail_every: int = 0):
+    """
+    Builds a request handler that replays the template works as an OpenAlex
+    /works endpoint with `total_count` results. Both page=N and cursor
+    pagination are supported. When fail_every > 0, every Nth request is
+    answered with a 429 to exercise the retry path. Once state["fail_after"]
+    pages have been served, further requests get a 400, which the fetcher
+    does not retry.
+    """
+    lock = threading.Lock()
+    state = {"requests": 0, "served": 0, "cursor_served": 0, "fail_after": 0}
 
-    # Process authorships
-    authorships = work.get("authorships", [])
-    for authorship in authorships:
-        author_info = authorship.get("author", {})
-        institutions = [
-            {
-                "id": process_openalex_id(inst.get("id")),
-                "display_name": inst.get("display_name"),
-            }
-            for inst in authorship.get("institutions", [])
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            with lock:
+                state["requests"] += 1
+                request_number = state["requests"]
+            if fail_every and request_number % fail_every == 0:
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+                return
+
+            if state["fail_after"] and state["served"] >= state["fail_after"]:
+                self.send_response(400)
+                self.end_headers()
+                return
+
+            per_page = int(query.get("per_page", 25))
+            if "cursor" in query:
+                cursor = query["cursor"]
+                offset = 0 if cursor == "*" else int(cursor)
+            else:
+                offset = (int(query.get("page", 1)) - 1) * per_page
+            end = min(offset + per_page, total_count)
+
+            with lock:
+                state["served"] += 1
+                state["cursor_served"] += "cursor" in query
+            results = []
+            for i in range(offset, end):
+                work = dict(template_works[i % len(template_works)])
+                work["id"] = f"https://openalex.org/W{i}"
+                work["doi"] = f"https://doi.org/10.5555/stub.{i}"
+                results.append(work)
+            body = json.dumps({
+                "meta": {
+                    "count": total_count,
+                    "per_page": per_page,
+                    "next_cursor": str(end) if end < total_count else None,
+                },
+                "results": results,
+            }).encode()
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler, state
+
+
+def run_stub_fetch(
+    file_path: str = "../open_alex/data.json",
+    total_count: int = 8000,
+    fail_every: int = 7,
+    rate: float = 200.0,
+) -> None:
+    """
+    Runs the concurrent page fetcher against a local stub server replaying
+    `file_path` and reports pages per second.
+    """
+    setup_logging()
+    logger = logging.getLogger(__name__)
+
+    template_works = load_local_data(file_path)
+    if not template_works:
+        logger.error(f"No works found in {file_path}.")
+        return
+
+    handler, state = make_stub_handler(template_works, total_count, fail_every)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/works"
+
+    try:
+        start = time.perf_counter()
+        pages = 0
+        ids = set()
+        for results in iter_work_pages({"filter": "stub"}, logger, url=url, rate_limiter=TokenBucket(rate)):
+            pages += 1
+            ids.update(work["id"] for work in results)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert len(ids) == total_count, f"Expected {total_count} works, got {len(ids)}"
+    # Cursor paging re-requests page 1 after the page=1 probe; page paging never uses a cursor
+    cursor_mode = total_count > MAX_PAGED_RESULTS
+    assert state["served"] == pages + cursor_mode, f"{state['served']} pages served for {pages} pages"
+    assert state["cursor_served"] == (pages if cursor_mode else 0), "Page and cursor paging were mixed"
+    logger.info(
+        f"Fetched {len(ids)} works in {pages} pages ({state['requests']} requests) "
+        f"in {elapsed:.2f}s: {pages / elapsed:.1f} pages/s"
+    )
+
+
+def parse_filter(filter_query: str) -> Dict[str, str]:
+    """
+    Splits an OpenAlex filter string into a {field: value} dict.
+    """
+    fields = {}
+    for part in filter_query.split(","):
+        field, _, value = part.partition(":")
+        fields[field] = value
+    return fields
+
+
+def make_count_stub_handler(records: List[Dict]):
+    """
+    Builds a request handler that answers count queries (per_page=1 with
+    cited_by_count_sum) over `records`, dicts with 'year', 'subfield'
+    ('subfields/<id>'), 'countries' and 'cited' keys. Only the year,
+    subfield and country filters are applied. Requests are counted.
+    """
+    lock = threading.Lock()
+    state = {"requests": 0}
+
+    def matches(record: Dict, fields: Dict[str, str]) -> bool:
+        years = fields.get("publication_year")
+        if years:
+            low, _, high = years.replace(" ", "").partition("-")
+            if not int(low) <= record["year"] <= int(high or low):
+                return False
+        subfield = fields.get("primary_topic.subfield.id")
+        if subfield and record["subfield"] != subfield:
+            return False
+        for field in ("authorships.countries", "institutions.country_code"):
+            if fields.get(field) and fields[field] not in record["countries"]:
+                return False
+        return True
+
+    class CountStubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            selected = [r for r in records if matches(r, parse_filter(query.get("filter", "")))]
+            with lock:
+                state["requests"] += 1
+
+            data = {"meta": {"count": len(selected), "cited_by_count_sum": sum(r["cited"] for r in selected)}}
+            body = json.dumps(data).encode()
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return CountStubHandler, state
+
+
+def run_stub_counts(num_works: int = 5000, seed: int = 0) -> None:
+    """
+    Collects the subfield and country counts against a local stub server,
+    checks them against the stub's records and reports the time taken next
+    to the fixed pauses of the former sequential loops.
+    """
+    setup_logging()
+    logger = logging.getLogger(__name__)
+
+    subfields_df = pd.read_csv("../data/csv/openalex/unique_subfields.csv")
+    rng = random.Random(seed)
+    # The last subfield gets no works, so its cells are zeros
+    subfield_ids = subfields_df["subfield_id"].tolist()[:-1]
+    countries = get_publication_counts_country.COUNTRY_CODES + ["XX"]
+    records = [
+        {
+            "year": rng.randint(2019, 2024),
+            "subfield": rng.choice(subfield_ids),
+            "countries": rng.sample(countries, rng.randint(1, 3)),
+            "cited": rng.randint(0, 50),
+        }
+        for _ in range(num_works)
+    ]
+
+    handler, state = make_count_stub_handler(records)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/works"
+
+    try:
+        start = time.perf_counter()
+        subfield_rows = get_publication_counts_subfields.collect_counts_per_cell(subfields_df, "stub@example.com", logger, url=url)
+        country_rows = get_publication_counts_country.collect_country_counts(url=url)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert len(subfield_rows) == len(subfields_df) * len(get_publication_counts_subfields.PUBLICATION_YEAR)
+    country_code = get_publication_counts_subfields.COUNTRY_CODE
+    for row in subfield_rows:
+        selected = [
+            r for r in records
+            if r["year"] == int(row["publication_year"]) and r["subfield"] == row["subfield_id"] and country_code in r["countries"]
         ]
-        processed_author = {
-            "id": process_openalex_id(author_info.get("id")),
-            "name": author_info.get("display_name"),
-            "institutions": institutions,
-            "countries": authorship.get("countries", []),
+        assert (row["count"], row["citation_count"]) == (len(selected), sum(r["cited"] for r in selected)), f"Mismatch for {row}"
+    assert [row["country"] for row in country_rows] == get_publication_counts_country.COUNTRY_CODES
+    for row in country_rows:
+        selected = [r for r in records if row["country"] in r["countries"]]
+        assert row["total_publications"] == len(selected), f"Mismatch for {row}"
+        assert row["citation_count"] == sum(r["cited"] for r in selected), f"Mismatch for {row}"
+
+    cells = len(subfield_rows) + len(country_rows)
+    assert state["requests"] == cells, f"{state['requests']} requests for {cells} counts"
+    logger.info(
+        f"{cells} counts in {state['requests']} concurrent requests: {elapsed:.2f}s "
+        f"(the sequential loops paused {5 * len(subfield_rows) + len(country_rows)}s)"
+    )
+
+
+def run_stub_cache(num_works: int = 5000, seed: int = 0) -> None:
+    """
+    Collects the subfield counts twice against the count stub through a
+    cached OpenAlexClient and checks that the second run is served from
+    disk. Also exercises TTL expiry and LRU eviction of the cache.
+    """
+    setup_logging()
+    logger = logging.getLogger(__name__)
+
+    subfields_df = pd.read_csv("../data/csv/openalex/unique_subfields.csv")
+    rng = random.Random(seed)
+    records = [
+        {
+            "year": rng.randint(2019, 2024),
+            "subfield": rng.choice(subfields_df["subfield_id"].tolist()),
+            "countries": [get_publication_counts_subfields.COUNTRY_CODE],
+            "cited": rng.randint(0, 50),
         }
-        processed["authorships"].append(processed_author)
+        for _ in range(num_works)
+    ]
+    handler, state = make_count_stub_handler(records)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/works"
+
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            runs = []
+            for _ in range(2):
+                client = OpenAlexClient(cache=ResponseCache(cache_dir))
+                before = state["requests"]
+                start = time.perf_counter()
+                rows = get_publication_counts_subfields.collect_counts_per_cell(
+                    subfields_df, "stub@example.com", logger, url=url, session=client
+                )
+                runs.append((rows, state["requests"] - before, time.perf_counter() - start))
+                client.log_stats(logger)
+            assert runs[0][0] == runs[1][0], "Cached run returned different counts"
+            assert runs[1][1] == 0, f"Cached run sent {runs[1][1]} requests"
+            logger.info(
+                f"First run: {runs[0][1]} requests in {runs[0][2]:.2f}s; "
+                f"cached run: {runs[1][1]} requests in {runs[1][2] * 1000:.0f}ms"
+            )
+
+            # Expired entries are fetched again
+            client = OpenAlexClient(cache=ResponseCache(cache_dir, ttl=0))
+            before = state["requests"]
+            fetch_url = f"{url}?filter=publication_year:2019&per_page=1"
+            client.get(fetch_url)
+            client.get(fetch_url)
+            assert state["requests"] == before + 2 and client.cache.stats["expired"] == 1
+
+            # The least recently used entries go first once the cache is full
+            cache = ResponseCache(cache_dir)
+            cache.clear()
+            for i in range(3):
+                cache.put(f"key{i}", {"value": "x" * 100})
+                os.utime(cache._path(f"key{i}"), (i, i))
+            cache.get("key0")
+            cache.max_bytes = cache._size - 1
+            cache.put("key3", {"value": "x" * 100})
+            assert cache.get("key0") is not None and cache.get("key1") is None
+            assert cache._size <= cache.max_bytes * cache.low_water, "Eviction stopped above the low-water mark"
+            assert ResponseCache(cache_dir)._size == cache._size, "Size index out of step with the directory"
+            logger.info(f"TTL and LRU eviction checks passed ({cache.stats['evicted']} evicted)")
+    finally:
+        server.shutdown()
+
+
+def run_stub_harvest(
+    file_path: str = "../open_alex/data.json",
+    countries: List[str] = ["BR", "AR", "CL"],
+    years: List[str] = ["2024", "2023"],
+    total_count: int = 1000,
+) -> None:
+    """
+    Runs the multi-country harvest driver against the works stub (which
+    answers every country and year with the same `total_count` works),
+    checks every partition, then checks a rerun skips all jobs. A second
+    harvest with a dedup index must keep each work exactly once, and merging
+    the plain partitions must drop the same duplicates.
+    """
+    setup_logging()
+    logger = logging.getLogger(__name__)
+
+    template_works = load_local_data(file_path)
+    if not template_works:
+        logger.error(f"No works found in {file_path}.")
+        return
+
+    handler, state = make_stub_handler(template_works, total_count, fail_every=11)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/works"
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_root = os.path.join(tmp_dir, "harvest")
+            journal_root = os.path.join(tmp_dir, "journal")
+            summary = run_harvest(
+                countries, years, logger, url=url, rate=100.0, output_root=output_root, journal_root=journal_root
+            )
+            for row in summary:
+                assert row["status"] == "done", f"{row['country']} {row['year']} {row['status']}"
+                assert len(pd.read_csv(row["output_file"])) == total_count, row["output_file"]
+            requests_made = state["requests"]
+
+            rerun = run_harvest(
+                countries, years, logger, url=url, rate=100.0, output_root=output_root, journal_root=journal_root
+            )
+            assert all(row["status"] == "skipped" for row in rerun)
+            assert state["requests"] == requests_made, "Rerun sent requests"
+
+            merged_file = os.path.join(tmp_dir, "merged.csv")
+            merged = merge_partitions([row["output_file"] for row in summary], merged_file)
+            assert merged == total_count, f"Merge kept {merged} of {total_count} unique works"
+
+            index = WorkIndex(os.path.join(tmp_dir, "index.tsv"))
+            deduped = run_harvest(
+                countries,
+                years,
+                logger,
+                url=url,
+                rate=100.0,
+                output_root=os.path.join(tmp_dir, "deduped"),
+                journal_root=os.path.join(tmp_dir, "journal_deduped"),
+                index=index,
+            )
+            index.close()
+            kept = sum(row["works"] for row in deduped)
+            assert kept == total_count, f"Dedup kept {kept} of {total_count} unique works"
+            logger.info(f"Dedup index dropped {index.duplicates} duplicates across {len(deduped)} partitions")
+    finally:
+        server.shutdown()
+    logger.info(f"{len(summary)} partitions harvested with {requests_made} requests; rerun skipped all of them")
+
+
+def run_stub_resume(
+    file_path: str = "../open_alex/data.json",
+    total_counts: List[int] = [1000, 10200],
+    fail_after: int = 3,
+) -> None:
+    """
+    Interrupts a harvest after `fail_after` pages, checks it left neither
+    the CSV nor a complete journal behind, resumes it and checks the rows
+    equal an uninterrupted harvest. Runs once in page mode and once deep
+    enough for cursor pagination.
+    """
+    setup_logging()
+    logger = logging.getLogger(__name__)
+
+    template_works = load_local_data(file_path)
+    if not template_works:
+        logger.error(f"No works found in {file_path}.")
+        return
+
+    for total_count in total_counts:
+        handler, state = make_stub_handler(template_works, total_count)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/works"
+
+        def run(output_file: str, journal_root: str) -> Optional[int]:
+            return collect_publications_open_alex.harvest(
+                "BR", "2024", output_file, logger, url=url, rate_limiter=TokenBucket(200.0), journal_root=journal_root
+            )
+
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                expected_file = os.path.join(tmp_dir, "expected.csv")
+                run(expected_file, os.path.join(tmp_dir, "expected_journal"))
+                full_requests = state["requests"]
+
+                output_file = os.path.join(tmp_dir, "resumed.csv")
+                journal_root = os.path.join(tmp_dir, "journal")
+                state["fail_after"] = state["served"] + fail_after
+                try:
+                    run(output_file, journal_root)
+                except requests.exceptions.HTTPError:
+                    pass
+                else:
+                    raise AssertionError("Harvest was not interrupted")
+                assert not os.path.exists(output_file), "Interrupted harvest left its CSV behind"
+                journal = PageJournal("BR", "2024", collect_publications_open_alex.build_params("BR", "2024")["filter"], root=journal_root)
+                assert not journal.is_complete, "Interrupted harvest marked its journal complete"
+                mode = journal.mode
+
+                state["fail_after"] = 0
+                before = state["requests"]
+                num_works = run(output_file, journal_root)
+                resumed_requests = state["requests"] - before
+                assert num_works == total_count, f"Resumed harvest wrote {num_works} of {total_count} works"
+                assert resumed_requests < full_requests, "Resumed harvest fetched journaled pages again"
+                pd.testing.assert_frame_equal(pd.read_csv(output_file), pd.read_csv(expected_file))
+                assert run(output_file, journal_root) is None, "Finished harvest was not skipped"
+        finally:
+            server.shutdown()
+        logger.info(
+            f"{total_count} works ({mode} mode): resumed with {resumed_requests} of {full_requests} requests, "
+            "rows match an uninterrupted harvest"
+        )
+
+
+def run_process_pool_check(num_works: int = 20000, seed: int = 0) -> None:
+    """
+    Processes a synthetic corpus serially and through process and thread
+    pools of several sizes and chunk sizes, and checks every pooled run
+    returns the same works in the same order as the serial one.
+    """
+    setup_logging()
+    logger = logging.getLogger(__name__)
+
+    works = [work for page in SyntheticCorpus(num_works, seed).pages() for work in page]
+    start = time.perf_counter()
+    serial = [collect_publications_open_alex.process_work(work) for work in works]
+    logger.info(f"Serial: {len(serial)} works in {time.perf_counter() - start:.2f}s")
+    for executor in ["process", "thread"]:
+        for workers, chunk_size in [(2, 500), (4, 333), (3, 1)]:
+            if chunk_size == 1 and executor == "process":
+                continue  # one work per task only adds pickling overhead
+            start = time.perf_counter()
+            pooled = collect_publications_open_alex.process_works(works, workers, executor, chunk_size)
+            assert pooled == serial, f"{executor} pool ({workers} workers, chunks of {chunk_size}) differs"
+            logger.info(
+                f"{executor} pool, {workers} workers, chunks of {chunk_size}: identical "
+                f"({time.perf_counter() - start:.2f}s)"
+            )
+
+    # Chunks that straddle page boundaries
+    corpus = SyntheticCorpus(1234, seed)
+    streamed = collect_publications_open_alex.iter_processed_works(corpus.pages(page_size=100), workers=2, chunk_size=64)
+    expected = collect_publications_open_alex.iter_processed_works(corpus.pages(page_size=100))
+    assert list(streamed) == list(expected), "Pooled page stream differs"
+    logger.info("Pooled page stream identical")
+
+
+def synthetic_publications(num_works: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Returns a synthetic corpus as the publications dataframe the collector
+    writes (one processed work per row, JSON columns as strings).
+    """
+    works = [work for page in SyntheticCorpus(num_works, seed).pages() for work in page]
+    return pd.DataFrame(collect_publications_open_alex.process_works(works))
+
+
+def with_repeats_and_null_subfields(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns a publications dataframe with some works repeated (as in a corpus
+    harvested without dedup) and some subfields without a display name.
+    """
+    df = pd.concat([df, df.iloc[:50], df.iloc[10:20]], ignore_index=True)
+    df.loc[df.index[::97], "subfield"] = json.dumps({"id": "subfields/0", "display_name": None})
+    return df
+
+
+def same_arrays(a: NetworkArrays, b: NetworkArrays) -> bool:
+    """
+    True if two networks have the same nodes, labels and edges in the same order.
+    """
+    return all(
+        len(x) == len(y) and np.array_equal(np.asarray(x), np.asarray(y)) for x, y in zip(a, b)
+    )
+
+
+def full_rebuild(df: pd.DataFrame) -> Dict:
+    """
+    Builds every subfield/year network of a publications dataframe in one
+    pass, as construct_network.main does. Returns {(subfield, year): NetworkArrays}.
+    """
+    exploded = explode_publications(iter_csv_publications(df))
+    return dict(iter_subfield_year_arrays(exploded, df["publication_year"].to_numpy()))
+
+
+def corpus_check(num_works: Optional[int] = None, seed: int = 0):
+    """
+    Decorates a test.py check: the check is run with logging set up and is
+    passed its logger and, when `num_works` is given, first a synthetic
+    publications dataframe of that size (see synthetic_publications).
+    """
+    def decorate(check):
+        @functools.wraps(check)
+        def run() -> None:
+            setup_logging()
+            logger = logging.getLogger(__name__)
+            if num_works is None:
+                check(logger)
+            else:
+                check(synthetic_publications(num_works, seed), logger)
+        return run
+    return decorate
+
+
+def same_graph(G1, G2) -> bool:
+    """
+    True if two graphs have the same nodes and edges, with the same
+    attributes, in the same iteration order.
+    """
+    return (
+        list(G1.nodes(data=True)) == list(G2.nodes(data=True))
+        and list(G1.edges(data=True)) == list(G2.edges(data=True))
+    )
+
+
+@corpus_check(num_works=1000)
+def run_csv_chunks_check(df: pd.DataFrame, logger: logging.Logger) -> None:
+    """
+    Writes works whose citation counts go missing only in later chunks and
+    checks the chunked CSV has the same bytes as one DataFrame written at once.
+    """
+    works = df.to_dict("records")
+    for work in works[750::3]:
+        work["cited_by_count"] = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_file = os.path.join(tmp_dir, "works.csv")
+        num_works = collect_publications_open_alex.write_works_csv(works, output_file, chunk_size=100)
+        with open(output_file, "r", newline="") as f:
+            written = f.read()
+    assert num_works == len(works)
+    assert written == collect_publications_open_alex.works_frame(works).to_csv(index=False), "Chunked CSV differs"
+    logger.info(f"Chunked CSV of {num_works} works matches a single DataFrame write")
+
+
+@corpus_check(num_works=5000)
+def run_network_check(df: pd.DataFrame, logger: logging.Logger) -> None:
+    """
+    Builds the collaboration network of a synthetic corpus (as is, and with
+    repeated works and null subfields) with the vectorized builder, from the
+    works and authorships tables, and with the dict-based
+    build_network_from_publications, and checks the graphs are identical,
+    node and edge order included.
+    """
+    for name, corpus in [("synthetic", df), ("repeats and null subfields", with_repeats_and_null_subfields(df))]:
+        start = time.perf_counter()
+        expected = build_network_from_publications(iter_csv_publications(corpus))
+        baseline_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        G = build_collaboration_network(corpus)
+        vectorized_seconds = time.perf_counter() - start
+        assert G.number_of_edges() > 0, "Synthetic corpus produced no edges"
+        assert same_graph(G, expected), f"Vectorized network ({name}) differs from build_network_from_publications"
+
+        rows = [processed_work_to_rows(work) for work in corpus.to_dict("records")]
+        works = pd.DataFrame([work_row for work_row, _ in rows])
+        authorships = pd.DataFrame([row for _, authorship_rows in rows for row in authorship_rows])
+        G = build_collaboration_network_from_tables(works, authorships)
+        assert same_graph(G, expected), f"Table network ({name}) differs from build_network_from_publications"
+        logger.info(
+            f"Vectorized and table networks identical ({name}: {G.number_of_nodes()} nodes, "
+            f"{G.number_of_edges()} edges; {vectorized_seconds:.2f}s vs {baseline_seconds:.2f}s)"
+        )
+
+
+@corpus_check(num_works=5000)
+def run_partition_check(df: pd.DataFrame, logger: logging.Logger) -> None:
+    """
+    Builds every subfield/year network of a synthetic corpus from one parse
+    (serially and on a process pool) and checks each equals the network
+    built by filtering the dataframe per partition and re-parsing it.
+    """
+    expected = {}
+    start = time.perf_counter()
+    for subfield in SUBFIELDS:
+        df_subfield = filter_subfielf_publications(df, subfield)
+        for year in YEARS:
+            df_year = filter_publications_by_year(df_subfield, year)
+            expected[(subfield, year)] = build_network_from_publications(iter_csv_publications(df_year))
+    baseline_seconds = time.perf_counter() - start
+
+    exploded = explode_publications(iter_csv_publications(df))
+    pub_years = df["publication_year"].to_numpy()
+    for workers in [None, 2]:
+        start = time.perf_counter()
+        built = dict(iter_subfield_year_arrays(exploded, pub_years, workers=workers))
+        seconds = time.perf_counter() - start
+        assert list(built) == list(expected), "Partitions yielded in a different order"
+        for key, arrays in built.items():
+            assert same_graph(network_arrays_to_graph(arrays), expected[key]), f"{key} differs from the filtered build"
+        logger.info(
+            f"{len(built)} partition networks identical (workers={workers}; "
+            f"{seconds:.2f}s vs {baseline_seconds:.2f}s filtering per partition)"
+        )
+    assert any(G.number_of_edges() for G in expected.values()), "Synthetic corpus produced no edges"
+
+
+def gexf_body(path: str) -> str:
+    """
+    Returns a GEXF file from its <graph> element on, skipping the header and
+    <meta> block (creator and date differ between writers).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().split("<graph", 1)[1]
+
 
-    # Process primary topic and subfield
-    primary_topic = work.get("primary_topic", {})
-    processed_topic = {
-        "id": process_openalex_id(primary_topic.get("id")),
-        "display_name": primary_topic.get("display_name"),
+@corpus_check(num_works=5000)
+def run_gexf_check(df: pd.DataFrame, logger: logging.Logger) -> None:
+    """
+    Writes synthetic subfield/year networks (and one with attribute values
+    that need escaping) with the streaming GEXF writers and with
+    nx.write_gexf, checks the files are identical past the header, and that
+    read_gexf_stream loads them as nx.read_gexf does.
+    """
+    networks = full_rebuild(df)
+    escaped = NetworkArrays(
+        np.array(["A1", "A&2", "A<3>"], dtype=object),
+        np.array(["BR", 'U"S', "R&D"], dtype=object),
+        np.array(["Artificial Intelligence", "Signal <Processing>", "Line\tBreak"], dtype=object),
+        np.array([0, 1], dtype=np.int64),
+        np.array([1, 2], dtype=np.int64),
+        np.array([3, 1], dtype=np.int64),
+    )
+    networks[("escaped", 0)] = escaped
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        streamed_file = os.path.join(tmp_dir, "streamed.gexf")
+        graph_file = os.path.join(tmp_dir, "graph.gexf")
+        nx_file = os.path.join(tmp_dir, "networkx.gexf")
+        for key, arrays in networks.items():
+            G = network_arrays_to_graph(arrays)
+            write_network_arrays_gexf(arrays, streamed_file)
+            write_graph_gexf(G, graph_file)
+            nx.write_gexf(G, nx_file)
+            assert gexf_body(streamed_file) == gexf_body(nx_file), f"{key}: streamed GEXF differs from nx.write_gexf"
+            assert gexf_body(graph_file) == gexf_body(nx_file), f"{key}: write_graph_gexf differs from nx.write_gexf"
+            expected = nx.read_gexf(nx_file)
+            assert same_graph(read_gexf_stream(nx_file), expected), f"{key}: read_gexf_stream differs from nx.read_gexf"
+            assert expected.graph == read_gexf_stream(nx_file).graph, f"{key}: graph attributes differ"
+    logger.info(f"Streamed GEXF of {len(networks)} networks identical to nx.write_gexf/nx.read_gexf")
+
+
+def edge_weights(G) -> Dict:
+    """
+    Returns {frozenset of endpoints: weight} for every edge of a graph.
+    """
+    return {frozenset((u, v)): data.get("weight") for u, v, data in G.edges(data=True)}
+
+
+@corpus_check(num_works=5000)
+def run_csr_check(df: pd.DataFrame, logger: logging.Logger) -> None:
+    """
+    Writes synthetic subfield/year networks (plus one with a self-loop and a
+    missing label) to the CSR cache, loads them back memory-mapped and in
+    memory, and checks nodes, labels, edges, weights, degrees and the sparse
+    adjacency matrix against the original arrays and their NetworkX graph.
+    """
+    networks = full_rebuild(df)
+    networks[("self-loop", 0)] = NetworkArrays(
+        np.array(["A1", "A2", "A3"], dtype=object),
+        np.array(["BR", None, "US"], dtype=object),
+        np.array(["Software", "Software", None], dtype=object),
+        np.array([0, 1, 2], dtype=np.int64),
+        np.array([1, 1, 0], dtype=np.int64),
+        np.array([2, 5, 1], dtype=np.int64),
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for (subfield, year), arrays in networks.items():
+            directory = os.path.join(tmp_dir, f"{subfield}_{year}")
+            write_csr_cache(arrays, directory)
+            G = network_arrays_to_graph(arrays)
+            for mmap in [True, False]:
+                cached = load_csr_cache(directory, mmap=mmap)
+                key = f"{subfield} {year} (mmap={mmap})"
+                assert cached.node_ids.tolist() == arrays.node_ids.tolist(), f"{key}: node ids differ"
+                assert cached.labels("label1").tolist() == arrays.label1.tolist(), f"{key}: label1 differs"
+                assert cached.labels("label2").tolist() == arrays.label2.tolist(), f"{key}: label2 differs"
+                assert cached.number_of_nodes() == G.number_of_nodes(), f"{key}: node count differs"
+                assert cached.number_of_edges() == G.number_of_edges(), f"{key}: edge count differs"
+                assert cached.degree().tolist() == [d for _, d in G.degree()], f"{key}: degrees differ"
+
+                loaded = cached.to_networkx()
+                assert list(loaded.nodes(data=True)) == list(G.nodes(data=True)), f"{key}: node attributes differ"
+                assert edge_weights(loaded) == edge_weights(G), f"{key}: edges or weights differ"
+                if len(G):
+                    difference = cached.to_scipy() != nx.to_scipy_sparse_array(G, nodelist=list(G))
+                    assert difference.nnz == 0, f"{key}: adjacency matrix differs"
+    logger.info(f"CSR cache round trip of {len(networks)} networks matches the arrays")
+
+
+def freeman_centralization(G) -> float:
+    """
+    Reference betweenness centralization from unnormalized NetworkX
+    betweenness: sum(max - b) over the star-graph maximum (n - 1)^2 (n - 2) / 2.
+    """
+    n = G.number_of_nodes()
+    if n <= 2:
+        return 0.0
+    betweenness = nx.betweenness_centrality(G, normalized=False).values()
+    top = max(betweenness)
+    return sum(top - b for b in betweenness) / ((n - 1) ** 2 * (n - 2) / 2)
+
+
+# Error bound of the sampled betweenness; large enough to sample on small graphs
+METRICS_EPSILON = 0.2
+
+
+@corpus_check(num_works=2000)
+def run_metrics_check(df: pd.DataFrame, logger: logging.Logger) -> None:
+    """
+    Computes graph_metrics of synthetic subfield/year networks loaded from
+    GEXF and from the CSR cache, and checks them against values computed
+    directly with NetworkX; also checks the sampled betweenness stays within
+    the error bound and the star and complete graph extremes.
+    """
+    assert abs(betweenness_centralization(nx.star_graph(9)) - 1.0) < 1e-12, "Star graph centralization is not 1"
+    assert betweenness_centralization(nx.complete_graph(10)) == 0.0, "Complete graph centralization is not 0"
+
+    networks = full_rebuild(df)
+    columns = ["nodes", "edges", "avg_degree", "max_degree", "betweenness_centralization",
+               "avg_clustering", "components", "largest_component"]
+    sampled = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for (subfield, year), arrays in networks.items():
+            gexf_file = os.path.join(tmp_dir, f"{subfield}_{year}.gexf")
+            csr_dir = os.path.join(tmp_dir, f"{subfield}_{year}")
+            write_network_arrays_gexf(arrays, gexf_file)
+            write_csr_cache(arrays, csr_dir)
+            G = network_arrays_to_graph(arrays)
+
+            degrees = [d for _, d in G.degree()]
+            components = [len(c) for c in nx.connected_components(G)]
+            expected = {
+                "nodes": G.number_of_nodes(),
+                "edges": G.number_of_edges(),
+                "avg_degree": sum(degrees) / len(degrees) if degrees else 0.0,
+                "max_degree": max(degrees, default=0),
+                "betweenness_centralization": freeman_centralization(G),
+                "avg_clustering": nx.average_clustering(G) if len(G) else 0.0,
+                "components": len(components),
+                "largest_component": max(components, default=0),
+            }
+            for source, loaded in [("gexf", read_gexf_stream(gexf_file)), ("csr", load_csr_cache(csr_dir).to_networkx())]:
+                metrics = graph_metrics(loaded)
+                for column in columns:
+                    assert np.isclose(metrics[column], expected[column], rtol=1e-9, atol=1e-12), (
+                        f"{subfield} {year} ({source}): {column} is {metrics[column]}, expected {expected[column]}"
+                    )
+
+            n = G.number_of_nodes()
+            approximate = betweenness_centralization(G, epsilon=METRICS_EPSILON)
+            if n > 2 and approximate != expected["betweenness_centralization"]:
+                sampled += 1
+                # Every normalized betweenness is within epsilon, so centralization is within 2 epsilon n / (n - 1)
+                bound = 2 * METRICS_EPSILON * n / (n - 1)
+                error = abs(approximate - expected["betweenness_centralization"])
+                assert error <= bound, f"{subfield} {year}: sampled centralization off by {error:.4f} > {bound:.4f}"
+    assert sampled, "No network was large enough to sample betweenness"
+    logger.info(f"Metrics of {len(networks)} networks match NetworkX ({sampled} sampled within the error bound)")
+
+
+@corpus_check(num_works=3000)
+def run_corpus_metrics_check(df: pd.DataFrame, logger: logging.Logger) -> None:
+    """
+    Computes the corpus summary tables of a synthetic corpus (with repeated
+    works, null subfields and citation counts, and authors whose country
+    changes between works) with corpus_metrics and checks each against
+    plain pandas over the decoded rows.
+    """
+    df = with_repeats_and_null_subfields(df)
+    df.loc[df.index[::50], "cited_by_count"] = np.nan
+    # A moves from AR to US, B lists no country, D lists BR first and AR second
+    df = pd.concat([df, pd.DataFrame([
+        {"publication_year": 2021, "authorships": json.dumps([{"id": "A_moving", "countries": ["AR"]}]),
+         "subfield": df["subfield"].iloc[0], "cited_by_count": 3},
+        {"publication_year": 2022, "authorships": json.dumps([{"id": "A_moving", "countries": ["US"]}, {"id": "B_nowhere"}]),
+         "subfield": df["subfield"].iloc[0], "cited_by_count": 5},
+        {"publication_year": 2023, "authorships": json.dumps([{"id": "C_home", "countries": ["BR"]}, {"id": "D", "countries": ["BR", "AR"]}]),
+         "subfield": df["subfield"].iloc[1], "cited_by_count": None},
+    ])], ignore_index=True)
+    count_countries = ["AR", "BR"]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_file = os.path.join(tmp_dir, "publications.csv")
+        df.to_csv(csv_file, index=False)
+        tables = corpus_metrics.compute_metrics(csv_file, count_countries=count_countries, chunk_size=700)
+
+    subfields = pd.read_csv(corpus_metrics.SUBFIELDS_CSV)
+    names = subfields["subfield_display_name"].tolist()
+    home = corpus_metrics.HOME_COUNTRY
+    authors = df["authorships"].map(json.loads)
+    works = pd.DataFrame({
+        "year": df["publication_year"],
+        "subfield": df["subfield"].map(lambda value: json.loads(value).get("display_name")),
+        "num_authors": authors.map(len),
+        "countries": authors.map(lambda work: {c for author in work for c in author.get("countries", [])}),
+        "cited": df["cited_by_count"].fillna(0).astype(int),
+    })
+
+    # authors_metrics: alphabetical position, then by descending mean
+    stats = works.groupby("subfield")["num_authors"].agg(["mean", "median", "std"])
+    stats = stats.loc[sorted(name for name in names if name in stats.index)]
+    stats.loc[corpus_metrics.ALL_SUBFIELDS] = [works["num_authors"].mean(), works["num_authors"].median(), works["num_authors"].std()]
+    expected = pd.DataFrame({
+        "subfield": stats.index,
+        "avg_authors": stats["mean"].values,
+        "median_authors": stats["median"].values,
+        "stdv_authors": stats["std"].values,
+        "position": np.arange(1, len(stats) + 1),
+    }).sort_values("avg_authors", ascending=False, kind="stable").reset_index(drop=True)
+    pd.testing.assert_frame_equal(tables["authors_metrics"], expected, check_dtype=False)
+
+    # countries_collabs: every author counted once, with the country of the work they were first seen in
+    rows = pd.DataFrame(
+        [(author.get("id"), get_author_country(author)) for work in authors for author in work],
+        columns=["author", "country"],
+    )
+    rows = rows[rows["author"].notna()].drop_duplicates("author")
+    assert rows.set_index("author").loc["A_moving", "country"] == "AR", "First-seen country rule broken"
+    foreign = rows[~rows["country"].isin([home, "Unknown"])].groupby("country", sort=False).size()
+    top = foreign.sort_values(ascending=False, kind="stable").head(corpus_metrics.TOP_COUNTRIES)
+    expected = pd.DataFrame({
+        "authors_country": top.index,
+        "count": top.values,
+        "percentage": top.values / foreign.sum() * 100,
+        "position": np.arange(1, len(top) + 1),
+    })
+    pd.testing.assert_frame_equal(tables["countries_collabs"], expected, check_dtype=False)
+
+    # summary_dom_int: international when any country other than home is listed
+    works["international"] = works["countries"].map(lambda countries: bool(countries - {home}))
+    assert works["international"].iloc[-1], "A foreign secondary country does not make a work international"
+    known = works[works["subfield"].isin(names)]
+    counts = known.groupby("subfield")["international"].agg(["sum", "count"])
+    expected = pd.DataFrame({
+        "subfield_display": counts.index,
+        "international_percentage": counts["sum"].values / counts["count"].values * 100,
+        "international_publications": counts["sum"].values,
+        "domestic_percentage": (counts["count"] - counts["sum"]).values / counts["count"].values * 100,
+        "domestic_publications": (counts["count"] - counts["sum"]).values,
+        "total_publications": counts["count"].values,
+    }).sort_values(["international_percentage", "subfield_display"], ascending=[False, True]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(tables["summary_dom_int"], expected, check_dtype=False)
+
+    # countries_subfields: works and citations per year, subfield and counted country, zeros included
+    cells = works.assign(country=works["countries"].map(sorted)).explode("country")
+    cells = cells[cells["country"].isin(count_countries)]
+    sums = cells.groupby(["country", "year", "subfield"])["cited"].agg(["size", "sum"])
+    grid = pd.MultiIndex.from_product(
+        [count_countries, corpus_metrics.PUBLICATION_YEARS, names], names=["country", "year", "subfield"]
+    )
+    sums = sums.reindex(grid, fill_value=0)
+    table = tables["countries_subfields"]
+    assert table["count"].tolist() == sums["size"].tolist(), "countries_subfields counts differ"
+    assert table["citation_count"].tolist() == sums["sum"].tolist(), "countries_subfields citations differ"
+    assert table["country_code"].tolist() == grid.get_level_values("country").tolist()
+    logger.info(f"Corpus summary tables of {len(df)} works match plain pandas")
+
+
+@corpus_check(num_works=2000)
+def run_external_check(df: pd.DataFrame, logger: logging.Logger) -> None:
+    """
+    Builds the collaboration network of a synthetic corpus out of core at
+    memory budgets small enough to spill many sorted runs, with and without
+    an author remap, and checks it equals build_network_arrays on the
+    exploded table, node and edge order included.
+    """
+    exploded = explode_publications(iter_csv_publications(df))
+    author_ids = sorted(exploded["author_id"].unique())
+    # Merge every 7th author into the previous one; some merged pairs are co-authors
+    author_remap = {author_ids[i]: author_ids[i - 1] for i in range(7, len(author_ids), 7)}
+    assert exploded["pub"].duplicated().any() and len(remap_authors(exploded, author_remap)) < len(exploded), (
+        "Remap merges no co-authors"
+    )
+    expected = {
+        "no remap": build_network_arrays(exploded),
+        "remap": build_network_arrays(remap_authors(exploded, author_remap)),
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for max_memory_mb in [0.05, 0.2, 64]:
+            for name, remap in [("no remap", None), ("remap", author_remap)]:
+                report = run_report.start_run("external_check")
+                start = time.perf_counter()
+                arrays = build_network_arrays_external(
+                    iter_csv_publications(df), max_memory_mb, tmp_dir=tmp_dir, author_remap=remap
+                )
+                seconds = time.perf_counter() - start
+                runs = report.counters.get("pairs_runs", 0)
+                assert same_arrays(arrays, expected[name]), f"{max_memory_mb} MB ({name}) differs from the in-memory build"
+                assert not os.listdir(tmp_dir), "Spilled runs were not removed"
+                if max_memory_mb < 1:
+                    assert runs > 1, f"{max_memory_mb} MB did not spill to disk"
+                logger.info(f"External build at {max_memory_mb} MB ({name}, {runs} pair runs) identical ({seconds:.2f}s)")
+
+
+def make_author(author_id: str, name: str, institution: str) -> Dict:
+    """
+    Returns an author in the authorships JSON layout with one institution.
+    """
+    return {
+        "id": f"{OPENALEX_PREFIX}{author_id}",
+        "name": name,
+        "institutions": [{"id": f"{OPENALEX_PREFIX}{institution}"}],
     }
-    processed["primary_topic"] = processed_topic
 
-    subfield = primary_topic.get("subfield", {})
-    processed["subfield"] = {
-        "id": process_openalex_id(subfield.get("id")),
-        "display_name": subfield.get("display_name"),
+
+@corpus_check()
+def run_disambiguation_check(logger: logging.Logger) -> None:
+    """
+    Checks the merge rules of author_disambiguation on hand-made works:
+    co-authors are never merged (also transitively), merges need the
+    threshold score, incompatible given names never merge, and the remap
+    table loads back as short ids.
+    """
+    publications = [
+        # Same institution and a shared co-author: 2 points
+        [make_author("A1", "João Carlos Silva", "I1"), make_author("X1", "Xavier Costa", "I9")],
+        [make_author("A2", "J. C. Silva", "I1"), make_author("X1", "Xavier Costa", "I9")],
+        [make_author("A1", "João Carlos Silva", "I1")],
+        # Same name and institution, but co-authors of one work
+        [make_author("A3", "Maria Souza", "I2"), make_author("A4", "Maria Souza", "I2")],
+        # A5 and A6 are co-authors; A7 matches both but may join only one
+        [make_author("A5", "Ana Lima", "I3"), make_author("A6", "Ana Lima", "I3")],
+        [make_author("A7", "Ana Lima", "I3")],
+        # Only the institution in common: 1 point
+        [make_author("A8", "Pedro Alves", "I4")],
+        [make_author("A9", "P. Alves", "I4")],
+        # Same block, incompatible given names
+        [make_author("A10", "Carla Dias", "I5")],
+        [make_author("A11", "Clara Dias", "I5")],
+    ]
+
+    def merges(threshold: int) -> Dict[str, str]:
+        remap = disambiguate(publications, threshold=threshold)
+        return dict(zip(strip_openalex_ids(remap["author_id"]), strip_openalex_ids(remap["canonical_id"])))
+
+    assert merges(2) == {"A2": "A1", "A7": "A5"}, f"Unexpected merges at the default threshold: {merges(2)}"
+    assert merges(1) == {"A2": "A1", "A7": "A5", "A9": "A8"}, f"Unexpected merges at threshold 1: {merges(1)}"
+    assert merges(3) == {}, f"Unexpected merges at threshold 3: {merges(3)}"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        remap_file = os.path.join(tmp_dir, "author_id_remap.csv")
+        disambiguate(publications).to_csv(remap_file, index=False)
+        assert load_author_remap(remap_file) == {"A2": "A1", "A7": "A5"}, "Remap table does not load back"
+    logger.info("Disambiguation merges only non-co-authors at or above the threshold")
+
+
+@corpus_check(num_works=5000)
+def run_projection_check(df: pd.DataFrame, logger: logging.Logger) -> None:
+    """
+    Builds the country and institution projections of a synthetic corpus
+    (plus works with repeated, unnamed and no entities) and checks nodes,
+    work counts and edge weights against counting shared works with dicts.
+    """
+    publications = [json.loads(authorships) for authorships in df["authorships"]]
+    publications += [
+        [],
+        [{"countries": ["BR", "US"], "institutions": [{"id": "I1", "display_name": "One"}, {"id": "I2"}]},
+         {"countries": ["US"], "institutions": [{"id": "I1", "display_name": "Other name"}, {"id": None}]}],
+        [{"countries": ["XX"], "institutions": [{"id": "I2"}]}],
+    ]
+    for kind in PROJECTIONS:
+        names = {}
+        positions = {}
+        works = {}
+        shared = {}
+        for authors in publications:
+            entities = {}
+            for entity_id, name in ENTITY_EXTRACTORS[kind](authors):
+                entities.setdefault(entity_id, name)
+                names.setdefault(entity_id, name if name is not None else entity_id)
+                positions.setdefault(entity_id, len(positions))
+            for entity_id in entities:
+                works[entity_id] = works.get(entity_id, 0) + 1
+            # Pairs are keyed in node order, as project() orders source < target
+            members = sorted(entities, key=positions.__getitem__)
+            for i, first in enumerate(members):
+                for second in members[i + 1:]:
+                    shared[(first, second)] = shared.get((first, second), 0) + 1
+
+        arrays = build_projection(publications, kind)
+        node_ids = arrays.node_ids.tolist()
+        assert node_ids == list(names), f"{kind}: nodes differ"
+        assert arrays.label1.tolist() == list(names.values()), f"{kind}: names differ"
+        assert arrays.label2.tolist() == [str(works[entity_id]) for entity_id in names], f"{kind}: work counts differ"
+        edges = list(zip(arrays.source.tolist(), arrays.target.tolist()))
+        assert edges == sorted(edges) and all(u < v for u, v in edges), f"{kind}: edges not sorted by (source, target)"
+        weights = {(node_ids[u], node_ids[v]): w for (u, v), w in zip(edges, arrays.weight.tolist())}
+        assert weights == shared, f"{kind}: edge weights differ"
+        logger.info(f"{kind} projection matches shared-work counts ({len(node_ids)} nodes, {len(edges)} edges)")
+
+
+def network_contents(arrays: NetworkArrays):
+    """
+    Returns ({node id: (label1, label2)}, {(id, id): weight}) of a network,
+    ignoring node and edge order.
+    """
+    node_ids = arrays.node_ids.tolist()
+    nodes = dict(zip(node_ids, zip(arrays.label1.tolist(), arrays.label2.tolist())))
+    edges = {
+        tuple(sorted((node_ids[u], node_ids[v]))): w
+        for u, v, w in zip(arrays.source.tolist(), arrays.target.tolist(), arrays.weight.tolist())
     }
+    return nodes, edges
+
+
+@corpus_check(num_works=3000)
+def run_store_check(df: pd.DataFrame, logger: logging.Logger) -> None:
+    """
+    Round-trips a synthetic corpus (with repeated works and null subfields)
+    through its CSV and the Parquet publications store, and checks the
+    network, every subfield/year network and the projections built from
+    the store equal the ones built from the CSV (one work has no authors,
+    another an author with two countries); also checks a CSV newer than
+    the store makes the store stale.
+    """
+    df = with_repeats_and_null_subfields(df)
+    df.loc[100, "authorships"] = "[]"
+    df.loc[101, "authorships"] = json.dumps([{"id": "A_two_countries", "name": "Two", "countries": ["BR", "US"], "institutions": []}])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_file = os.path.join(tmp_dir, "publications.csv")
+        store_dir = os.path.join(tmp_dir, "store")
+        df.to_csv(csv_file, index=False)
+        csv_df = pd.read_csv(csv_file)
+        # Several row groups per table
+        assert convert_csv_to_store(csv_file, store_dir, chunk_size=700) == len(csv_df)
+        assert store_is_current(store_dir, csv_file), "Freshly converted store is not current"
+
+        works, authorships = load_publications(store_dir)
+        assert works["id"].tolist() == csv_df["id"].tolist(), "Store works are not in CSV order"
+        expected = build_network_arrays(explode_publications(iter_csv_publications(csv_df)))
+        assert same_arrays(build_network_arrays(explode_tables(works, authorships)), expected), (
+            "Network built from the store differs from the CSV"
+        )
+
+        works, authorships = load_publications(store_dir, subfields=SUBFIELDS)
+        built = dict(iter_subfield_year_arrays(explode_tables(works, authorships), works["publication_year"].to_numpy()))
+        for key, arrays in full_rebuild(csv_df).items():
+            assert same_arrays(built[key], arrays), f"{key}: network built from the store differs from the CSV"
+
+        for kind in PROJECTIONS:
+            assert same_arrays(build_projection(iter_store_authors(store_dir), kind), build_projection(iter_csv_authors(csv_file), kind)), (
+                f"{kind} projection built from the store differs from the CSV"
+            )
+
+        later = max(os.path.getmtime(os.path.join(store_dir, name)) for name in os.listdir(store_dir)) + 10
+        os.utime(csv_file, (later, later))
+        assert not store_is_current(store_dir, csv_file), "Store older than the CSV is still current"
+    logger.info(f"Parquet store of {len(csv_df)} works builds the same {len(built)} networks and projections as the CSV")
+
+
+@corpus_check(num_works=5000)
+def run_temporal_check(df: pd.DataFrame, logger: logging.Logger) -> None:
+    """
+    Builds the temporal network of every subfield of a synthetic corpus and
+    checks each snapshot(year), before and after a save/load round trip,
+    equals build_network_arrays on that year's authorships; also checks
+    windows and deltas against the authorships of the window.
+    """
+    exploded = explode_publications(iter_csv_publications(df))
+    pub_years = df["publication_year"].to_numpy()
+    exploded_years = pub_years[exploded["pub"].to_numpy()]
+    networks = build_temporal_networks(exploded, pub_years)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for subfield, temporal in networks.items():
+            directory = os.path.join(tmp_dir, subfield)
+            temporal.save(directory)
+            loaded = load_temporal_network(directory)
+            in_subfield = (exploded["subfield"] == subfield).to_numpy()
+            for year in YEARS:
+                expected = build_network_arrays(exploded[in_subfield & (exploded_years == year)])
+                assert same_arrays(temporal.snapshot(year), expected), f"{subfield} {year}: snapshot differs"
+                assert same_arrays(loaded.snapshot(year), expected), f"{subfield} {year}: loaded snapshot differs"
+
+            start, end = YEARS[1], YEARS[-2]
+            expected = build_network_arrays(exploded[in_subfield & (exploded_years >= start) & (exploded_years <= end)])
+            assert network_contents(loaded.window(start, end)) == network_contents(expected), (
+                f"{subfield} {start}-{end}: window differs"
+            )
+
+            deltas = loaded.deltas()
+            assert deltas["new_authors"].sum() == loaded.number_of_nodes(), f"{subfield}: new authors do not add up"
+            assert deltas["authors"].tolist() == [len(loaded.snapshot(year).node_ids) for year in YEARS], (
+                f"{subfield}: yearly author counts differ"
+            )
+    logger.info(f"Temporal networks of {len(networks)} subfields match build_network_arrays for every year")
+
+
+@corpus_check(num_works=20000)
+def run_incremental_check(df: pd.DataFrame, logger: logging.Logger) -> None:
+    """
+    Builds the network states from part of a synthetic corpus, applies the
+    rest in batches (repeating works of an earlier batch, which are skipped,
+    and works within the last batch, which are counted, and compacting
+    segments along the way), and checks every subfield/year network equals
+    a full rebuild over the rows applied.
+    """
+    batches = [
+        df.iloc[:12000],
+        df.iloc[12000:15000],
+        pd.concat([df.iloc[14000:17000], df.iloc[17000:], df.iloc[17000:17500]]),
+    ]
+    df = pd.concat([df, df.iloc[17000:17500]])
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        incremental_network.build_states(batches[0], root=root, write=False)
+        for batch in batches[1:]:
+            incremental_network.apply_new_works(batch, root=root, write=False, max_segments=2)
+        elapsed = time.perf_counter() - start
+        expected = full_rebuild(df)
+        partitions = incremental_network.partition_works(df)
+        for (subfield, year), arrays in expected.items():
+            state = incremental_network.NetworkState(incremental_network.network_state_path(subfield, year, root))
+            assert same_arrays(state.to_arrays(), arrays), f"{subfield} {year} differs from a full rebuild"
+            assert state.apply(partitions.get((subfield, year), [])) == (0, 0), "Works applied twice"
+    logger.info(f"Incremental build of {len(expected)} networks identical to a full rebuild ({elapsed:.2f}s)")
+
+
+@corpus_check()
+def run_id_checks(logger: logging.Logger) -> None:
+    """
+    Checks that the column-wise id normalization of openalex_ids and
+    dedup_index gives the same values as the per-value helpers, and that
+    stripped ids survive a round trip through their URL form.
+    """
+    ids = [
+        "https://openalex.org/W2741809807", "A5069909033", "https://openalex.org/subfields/1702",
+        "", None, "https://openalex.org/", "W1https://openalex.org/",
+    ]
+    dois = [
+        "https://doi.org/10.1000/ABC", " http://dx.doi.org/10.1/x ", "doi:10.2/Y", "10.3/z", "https://doi.org/", "", None,
+    ]
+    assert strip_openalex_ids(ids).tolist() == [process_openalex_id(value) for value in ids]
+    assert strip_prefix(dois, DOI_PREFIX).tolist() == [process_doi(value) for value in dois]
+    assert normalize_work_id_column(pd.Series(ids)).tolist() == [normalize_work_id(value) for value in ids]
+    assert normalize_doi_column(pd.Series(dois)).tolist() == [normalize_doi(value) for value in dois]
+
+    stripped = strip_openalex_ids(ids[:3])
+    assert strip_openalex_ids(OPENALEX_PREFIX + stripped).tolist() == stripped.tolist()
+    logger.info("Column-wise id and DOI normalization matches the per-value helpers")
 
-    # Process counts_by_year: shift years relative to the publication year
-    publication_year = work.get("publication_year")
-    counts_by_year_data = work.get("counts_by_year", [])
-    offset_citations = {}
-    if counts_by_year_data and publication_year:
-        for item in counts_by_year_data:
-            # Compute offset: citation year minus publication year
-            offset = item["year"] - publication_year
-            if offset >= 0:
-                key = f"{offset}_year"
-                offset_citations[key] = item["cited_by_count"]
-            # If offset is negative, skip the entry as it is likely a data error.
-    processed["counts_by_year"] = json.dumps(offset_citations)
-
-    # Convert complex fields to JSON strings
-    processed["authorships"] = json.dumps(processed["authorships"])
-    processed["subfield"] = json.dumps(processed["subfield"])
-    return processed
 
 def main():
     """
@@ -174,7 +1292,7 @@ def main():
 
         # Process each work
         logger.info("Processing retrieved works...")
-        processed_works = [process_work(work) for work in all_works]
+        processed_works = [collect_publications_open_alex.process_work(work) for work in all_works]
 
         # Create and save DataFrame for testing purposes
         df = pd.DataFrame(processed_works)
@@ -189,5 +1307,38 @@ def main():
         logger.error(f"Script failed: {e}")
         raise
 
+def run_stub_fetch_modes() -> None:
+    # Page-based paging, then cursor paging past the 10,000 result limit
+    run_stub_fetch(total_count=8000)
+    run_stub_fetch(total_count=12000)
+
+
+# test.py subcommands; without one, main() processes the local test data
+CHECKS: Dict[str, Callable[[], None]] = {
+    "stub-fetch": run_stub_fetch_modes,
+    "stub-counts": run_stub_counts,
+    "stub-cache": run_stub_cache,
+    "stub-harvest": run_stub_harvest,
+    "stub-resume": run_stub_resume,
+    "process-pool": run_process_pool_check,
+    "csv-chunks": run_csv_chunks_check,
+    "ids": run_id_checks,
+    "incremental": run_incremental_check,
+    "networks": run_network_check,
+    "partitions": run_partition_check,
+    "gexf": run_gexf_check,
+    "csr": run_csr_check,
+    "metrics": run_metrics_check,
+    "corpus-metrics": run_corpus_metrics_check,
+    "external": run_external_check,
+    "disambiguation": run_disambiguation_check,
+    "projections": run_projection_check,
+    "temporal": run_temporal_check,
+    "store": run_store_check,
+}
+
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) == 2 and sys.argv[1] in CHECKS:
+        CHECKS[sys.argv[1]]()
+    else:
+        main()